@@ -0,0 +1,60 @@
+"""
+无界面代理：在指定工作目录（独立的 config.json / regions.json / 输出目录）中运行截图引擎，
+并连接到中心协调器。不注册热键、不提供HTTP接口
+
+用法（同一台机器上运行多个使用合成画面的代理）:
+    python -m backend.agent --workdir ./agent1 --name agent1 --synthetic --coordinator 127.0.0.1:8765
+    python -m backend.agent --workdir ./agent2 --name agent2 --synthetic --coordinator 127.0.0.1:8765
+"""
+import argparse
+import os
+import signal
+import threading
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LX Multi Capture 截图代理")
+    parser.add_argument("--workdir", default=".", help="工作目录（配置、选区和截图都保存在该目录下）")
+    parser.add_argument("--coordinator", help="协调器地址 host:port")
+    parser.add_argument("--name", help="代理名称")
+    parser.add_argument("--synthetic", action="store_true", help="使用合成画面代替真实屏幕")
+    parser.add_argument("--send-frames", action="store_true", help="同时上传截图文件内容")
+    parser.add_argument("--interval", type=int, help="定时截图间隔（秒）")
+    args = parser.parse_args()
+
+    # 配置和选区文件相对于工作目录，必须在创建服务之前切换
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+
+    from backend.services.capture_engine import CaptureEngine
+    from backend.services.config_service import ConfigService
+
+    overrides = {"agent_enabled": True, "open_browser": False}
+    if args.coordinator:
+        overrides["coordinator_address"] = args.coordinator
+    if args.name:
+        overrides["agent_name"] = args.name
+    if args.synthetic:
+        overrides["capture_backend"] = "synthetic"
+    if args.send_frames:
+        overrides["agent_send_frames"] = True
+    if args.interval is not None:
+        overrides["screenshot_interval"] = args.interval
+    ConfigService().update_config(**overrides)
+
+    engine = CaptureEngine()
+    engine.start(on_ready=lambda components: print(f"[代理] 截图引擎就绪，组件状态: {components}"), hotkeys=False)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    print("[代理] 正在停止...")
+    engine.stop()
+
+
+if __name__ == "__main__":
+    main()
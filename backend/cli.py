@@ -0,0 +1,224 @@
+"""
+命令行截图：不启动FastAPI、不打开浏览器、不注册热键，直接读取工作目录中的 config.json / regions.json，
+通过与API相同的 ScreenshotService 截图保存。每个事件在标准输出上输出一行JSON，日志输出到标准错误
+
+用法:
+    python -m backend.cli once                                  # 截取所有选区一次
+    python -m backend.cli once --region 地图 --region 血条       # 按名称或ID指定选区
+    python -m backend.cli timer --interval 5 --count 100        # 每5秒截取一次，共100次
+    python -m backend.cli burst --frames 60                     # 连拍60帧
+    python -m backend.cli watch --interval 0.5 --threshold 3    # 画面变化时才保存
+    python -m backend.cli --workdir ./exp1 --output ./exp1/shots --synthetic once
+
+退出码: 0 全部成功，1 有截图失败，2 参数错误（如选区不存在）
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+
+def emit(event: str, **fields):
+    """输出一行JSON事件"""
+    sys.__stdout__.write(json.dumps({"event": event, "time": datetime.now().isoformat(), **fields},
+                                    ensure_ascii=False) + "\n")
+    sys.__stdout__.flush()
+
+
+def _result(region, success: bool, message: str, file_path: Optional[str]) -> dict:
+    return {"region_id": region.id, "region_name": region.name, "success": success, "message": message,
+            "file_path": file_path}
+
+
+def select_regions(names: List[str], group_id: Optional[str]):
+    """按名称或ID选择选区（均未指定时为所有图片模式的选区），返回 (选区列表, 分组输出目录)"""
+    from backend.services.region_service import RegionService
+    region_service = RegionService()
+    output_dir = None
+    if group_id:
+        from backend.services.group_service import GroupService
+        group = GroupService().get_group_by_id(group_id)
+        if group is None:
+            raise ValueError(f"分组不存在: {group_id}")
+        regions = [r for r in (region_service.get_region_by_id(i) for i in group.region_ids) if r is not None]
+        output_dir = group.output_dir or None
+    elif names:
+        regions = []
+        for name in names:
+            region = region_service.get_region_by_id(name) or next(
+                (r for r in region_service.get_all_regions() if r.name == name), None)
+            if region is None:
+                raise ValueError(f"选区不存在: {name}")
+            regions.append(region)
+    else:
+        regions = region_service.get_image_regions()
+    if not regions:
+        raise ValueError("没有可用的选区")
+    return regions, output_dir
+
+
+class Runner:
+    """命令行各模式的执行"""
+
+    def __init__(self, args, stop_event: threading.Event):
+        from backend.services.screenshot_service import ScreenshotService
+        self.args = args
+        self.stop_event = stop_event
+        self.screenshot_service = ScreenshotService()
+        self.regions, self.output_dir = select_regions(args.region or [], args.group)
+        self.output_dir = args.output or self.output_dir
+        self.failed = 0
+
+    def _capture(self, tick: int) -> bool:
+        start = time.perf_counter()
+        results = self.screenshot_service.capture_and_save_regions(self.regions, self.output_dir)
+        failed = sum(1 for result in results if not result[1])
+        self.failed += failed
+        emit("capture", tick=tick, elapsed_ms=round((time.perf_counter() - start) * 1000, 2),
+             results=[_result(*result) for result in results])
+        return failed == 0
+
+    def _ticks(self, interval: float):
+        """按固定节拍产生序号（不累积误差，落后时跳过错过的节拍），直到达到次数、时长或收到停止信号"""
+        start = time.monotonic()
+        deadline = start + self.args.duration if self.args.duration > 0 else None
+        tick = 0
+        while not self.stop_event.is_set():
+            if self.args.count > 0 and tick >= self.args.count:
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            yield tick
+            tick += 1
+            next_time = start + tick * interval
+            now = time.monotonic()
+            if now > next_time:
+                skipped = int((now - next_time) // interval) + 1 if interval > 0 else 0
+                if skipped:
+                    emit("skipped", ticks=skipped)
+                tick += skipped
+                next_time = start + tick * interval
+            self.stop_event.wait(max(next_time - time.monotonic(), 0))
+
+    def once(self):
+        self._capture(0)
+
+    def timer(self):
+        for tick in self._ticks(self.args.interval):
+            self._capture(tick)
+
+    def burst(self):
+        result = self.screenshot_service.capture_burst(self.regions, frames=self.args.frames,
+                                                       duration=self.args.duration, output_dir=self.output_dir,
+                                                       stop_event=self.stop_event)
+        if not result.get("success"):
+            self.failed += 1
+        emit("burst", **result)
+
+    def watch(self):
+        """定期截图，与各选区上次保存的画面比较，平均像素差超过阈值时才保存"""
+        import numpy as np
+        signatures = {}  # 选区ID -> 上次保存时画面的缩略灰度图
+        for tick in self._ticks(self.args.interval):
+            captured = self.screenshot_service.capture_regions(self.regions)
+            changed_regions, changed_images, diffs = [], [], []
+            for region, img in captured:
+                if img is None:
+                    continue
+                # 缩小后比较，忽略噪点并降低计算量
+                signature = np.asarray(img.reduce(max(min(img.width, img.height) // 32, 1)).convert("L"),
+                                       dtype=np.int16)
+                previous = signatures.get(region.id)
+                diff = None if previous is None or previous.shape != signature.shape else float(
+                    np.abs(signature - previous).mean())
+                if diff is None or diff >= self.args.threshold:
+                    signatures[region.id] = signature
+                    changed_regions.append(region)
+                    changed_images.append(img)
+                    diffs.append(diff)
+            missing = [region for region, img in captured if img is None]
+            if missing:
+                self.failed += len(missing)
+                emit("capture_failed", tick=tick, regions=[region.name for region in missing])
+            if changed_regions:
+                results = self.screenshot_service.save_region_images(changed_regions, changed_images, self.output_dir)
+                self.failed += sum(1 for result in results if not result[1])
+                emit("change", tick=tick, results=[dict(_result(*result), diff=None if diff is None else round(diff, 2))
+                                                   for result, diff in zip(results, diffs)])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LX Multi Capture 命令行截图")
+    parser.add_argument("--workdir", default=".", help="工作目录（读取其中的 config.json 和 regions.json）")
+    parser.add_argument("--output", help="输出目录（默认为配置中的 output_dir，不修改配置文件）")
+    parser.add_argument("--synthetic", action="store_true", help="使用合成画面代替真实屏幕")
+    parser.add_argument("--region", action="append", help="选区名称或ID（可重复，默认所有选区）")
+    parser.add_argument("--group", help="分组ID（截取分组的成员选区）")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    subparsers.add_parser("once", help="截取一次")
+
+    timer = subparsers.add_parser("timer", help="定时截图")
+    timer.add_argument("--interval", type=float, required=True, help="截图间隔（秒）")
+
+    burst = subparsers.add_parser("burst", help="连拍")
+    burst.add_argument("--frames", type=int, default=0, help="帧数（默认为配置中的 burst_frames）")
+
+    watch = subparsers.add_parser("watch", help="画面变化时截图")
+    watch.add_argument("--interval", type=float, default=0.5, help="检查间隔（秒）")
+    watch.add_argument("--threshold", type=float, default=2.0, help="平均灰度差阈值（0-255）")
+
+    for sub in (timer, burst, watch):
+        sub.add_argument("--duration", type=float, default=0, help="持续时间（秒），0表示不限")
+    for sub in (timer, watch):
+        sub.add_argument("--count", type=int, default=0, help="次数，0表示不限")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # 配置和选区文件相对于工作目录，必须在创建服务之前切换
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    # 服务中的日志输出到标准错误，标准输出只有JSON事件
+    with contextlib.redirect_stdout(sys.stderr):
+        from backend.services.config_service import ConfigService
+        overrides = {"capture_backend": "synthetic"} if args.synthetic else {}
+        if overrides:
+            ConfigService().override_config(**overrides)
+        try:
+            runner = Runner(args, stop_event)
+        except ValueError as e:
+            emit("error", message=str(e))
+            return 2
+
+        start = time.perf_counter()
+        emit("start", mode=args.mode, regions=[region.name for region in runner.regions],
+             output_dir=runner.output_dir or ConfigService().get_config().output_dir)
+        try:
+            getattr(runner, args.mode)()
+        finally:
+            from backend.services.encoder_service import EncoderService
+            from backend.services.sink_service import SinkService
+            SinkService().stop(timeout=5)
+            EncoderService().shutdown()
+        emit("done", mode=args.mode, failed=runner.failed, elapsed_s=round(time.perf_counter() - start, 3))
+    return 1 if runner.failed else 0
+
+
+if __name__ == "__main__":
+    # 打包为exe时进程池编码需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
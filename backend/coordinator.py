@@ -0,0 +1,48 @@
+"""
+中心协调器：接收各站点代理的长连接，汇总截图目录和健康状态，并通过HTTP接口向代理下发选区/配置
+
+用法:
+    python -m backend.coordinator --listen 0.0.0.0:8765 --port 8022
+"""
+import argparse
+
+from fastapi import FastAPI
+import uvicorn
+
+from backend.routes import coordinator
+from backend.services.coordinator_service import CoordinatorService
+
+
+def create_app(listen_host: str, listen_port: int, frames_dir: str) -> FastAPI:
+    """创建协调器应用"""
+    app = FastAPI(
+        title="LX Multi Capture Coordinator",
+        description="多选区截图工具中心协调器",
+        version="1.0.0"
+    )
+    app.include_router(coordinator.router)
+
+    @app.on_event("startup")
+    async def startup_event():
+        CoordinatorService().start(listen_host, listen_port, frames_dir)
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        CoordinatorService().stop()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LX Multi Capture 中心协调器")
+    parser.add_argument("--listen", default="0.0.0.0:8765", help="代理连接的监听地址 host:port")
+    parser.add_argument("--port", type=int, default=8022, help="HTTP接口端口")
+    parser.add_argument("--frames-dir", default="coordinator_frames", help="代理上传的截图文件保存目录")
+    args = parser.parse_args()
+
+    host, _, port = args.listen.rpartition(":")
+    uvicorn.run(create_app(host or "0.0.0.0", int(port), args.frames_dir), host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+截图引擎守护进程：独立运行定时截图、热键和截图流水线，通过Unix socket为API提供服务
+
+用法:
+    python -m backend.engine_daemon --socket /tmp/lx_capture_engine.sock
+    LX_ENGINE_SOCKET=/tmp/lx_capture_engine.sock python -m backend.main
+"""
+import argparse
+import os
+import signal
+import tempfile
+import threading
+
+from backend.services.capture_engine import ENGINE_SOCKET_ENV, CaptureEngine
+from backend.services.engine_ipc import serve_engine
+
+
+def default_socket_path() -> str:
+    """默认socket路径（环境变量 LX_ENGINE_SOCKET，否则为临时目录下的固定文件名）"""
+    return os.environ.get(ENGINE_SOCKET_ENV) or os.path.join(tempfile.gettempdir(), "lx_capture_engine.sock")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LX Multi Capture 截图引擎守护进程")
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix socket路径")
+    args = parser.parse_args()
+
+    engine = CaptureEngine()
+    engine.start(on_ready=lambda components: print(f"[引擎] 后台初始化完成，组件状态: {components}"))
+    server = serve_engine(engine, args.socket)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    print("[引擎] 正在停止...")
+    server.shutdown()
+    server.server_close()
+    engine.stop()
+
+
+if __name__ == "__main__":
+    # 打包为exe时进程池编码需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
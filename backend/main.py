@@ -1,25 +1,52 @@
 """
 FastAPI主应用
 """
+import time
+
+# 启动基准时间，用于统计启动各阶段耗时以及首个请求的到达时间
+BOOT_TIME = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
+import os
 import uvicorn
-import threading
-import time
 
-from backend.routes import regions, config, screenshot, mouse
-from backend.services.hotkey_service import HotkeyService
+from backend.routes import regions, config, screenshot, mouse, groups, monitors, jobs, probes, hashes, sinks, admin, sessions, timelapse
+from backend.services.capture_engine import CaptureEngine, EngineError, get_engine, is_remote_engine
 from backend.services.config_service import ConfigService
-from backend.services.region_service import RegionService
-from backend.services.screenshot_service import ScreenshotService
 
-# 全局服务实例
-hotkey_service = HotkeyService()
-config_service = ConfigService()
-region_service = RegionService()
-screenshot_service = ScreenshotService()
+# 启动状态（供 /api/ready 查询），组件状态由截图引擎提供
+startup_state = {
+    "app_loaded_ms": None,  # 模块导入及路由注册完成
+    "startup_ms": None,  # startup事件完成，开始接受请求
+    "ready_ms": None,  # 后台初始化全部完成
+    "first_request_ms": None,  # 首个请求到达
+    "first_request_path": None
+}
+
+
+def elapsed_ms() -> float:
+    """距启动基准时间的毫秒数"""
+    return round((time.perf_counter() - BOOT_TIME) * 1000, 1)
+
+
+class FirstRequestTimer:
+    """记录首个HTTP请求到达时间的ASGI中间件（之后只做一次判断）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and startup_state["first_request_ms"] is None:
+            startup_state["first_request_ms"] = elapsed_ms()
+            startup_state["first_request_path"] = scope.get("path")
+            print(f"[启动] 首个请求到达: {scope.get('path')}，距启动 {startup_state['first_request_ms']}ms")
+        await self.app(scope, receive, send)
+
 
 app = FastAPI(
     title="LX Multi Capture API",
@@ -27,6 +54,15 @@ app = FastAPI(
     version="1.0.0"
 )
 
+app.add_middleware(FirstRequestTimer)
+
+
+@app.exception_handler(EngineError)
+async def engine_error_handler(request, exc: EngineError):
+    """截图引擎错误转换为HTTP错误响应"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+
 # CORS配置
 app.add_middleware(
     CORSMiddleware,
@@ -41,183 +77,64 @@ app.include_router(regions.router)
 app.include_router(config.router)
 app.include_router(screenshot.router)
 app.include_router(mouse.router)
+app.include_router(groups.router)
+app.include_router(monitors.router)
+app.include_router(jobs.router)
+app.include_router(probes.router)
+app.include_router(hashes.router)
+app.include_router(sinks.router)
+app.include_router(admin.router)
+app.include_router(sessions.router)
+app.include_router(timelapse.router)
 
 # 静态文件服务（前端构建后的文件）- 必须在API路由之后挂载
 frontend_path = Path("frontend/dist")
 if frontend_path.exists():
     app.mount("/", StaticFiles(directory=str(frontend_path), html=True), name="static")
 
-# 定时截图相关
-screenshot_timer_running = False
-screenshot_timer_thread = None
-
-
-def screenshot_timer_worker():
-    """定时截图工作线程"""
-    global screenshot_timer_running
-    while screenshot_timer_running:
-        config = config_service.get_config()
-        if config.screenshot_interval > 0:
-            # 每次循环重新加载最新的选区配置，避免使用旧数据
-            try:
-                region_service.load_regions()
-            except Exception as e:
-                print(f"[定时截图] 重新加载选区失败: {e}")
-            regions = region_service.get_all_regions()
-            for region in regions:
-                screenshot_service.capture_and_save_region(region)
-            time.sleep(config.screenshot_interval)
-        else:
-            time.sleep(1)
-
-
-def start_screenshot_timer():
-    """启动定时截图"""
-    global screenshot_timer_running, screenshot_timer_thread
-    if not screenshot_timer_running:
-        screenshot_timer_running = True
-        screenshot_timer_thread = threading.Thread(target=screenshot_timer_worker, daemon=True)
-        screenshot_timer_thread.start()
-
-
-def stop_screenshot_timer():
-    """停止定时截图"""
-    global screenshot_timer_running
-    screenshot_timer_running = False
-
-
-# 热键回调函数
-def on_hotkey_a():
-    """热键A：记录左上角坐标"""
-    print("\n" + "=" * 60)
-    print("[热键A] ========== 触发！==========")
-    try:
-        from backend.utils.platform_utils import get_mouse_position
-        print("[热键A] 正在获取鼠标位置...")
-        pos = get_mouse_position()
-        print(f"[热键A] 获取到坐标: {pos}")
-        
-        hotkey_service.set_captured_coord('top_left', pos[0], pos[1])
-        current_coords = hotkey_service.get_captured_coords()
-        print(f"[热键A] 已保存坐标: {current_coords}")
-        print(f"[热键A] ========== 完成 ==========")
-    except Exception as e:
-        print(f"[热键A] ✗ 错误: {e}")
-        import traceback
-        traceback.print_exc()
-    print("=" * 60 + "\n")
-
-
-def on_hotkey_b():
-    """热键B：记录右下角坐标"""
-    print("\n" + "=" * 60)
-    print("[热键B] ========== 触发！==========")
-    try:
-        from backend.utils.platform_utils import get_mouse_position
-        print("[热键B] 正在获取鼠标位置...")
-        pos = get_mouse_position()
-        print(f"[热键B] 获取到坐标: {pos}")
-        
-        hotkey_service.set_captured_coord('bottom_right', pos[0], pos[1])
-        current_coords = hotkey_service.get_captured_coords()
-        print(f"[热键B] 已保存坐标: {current_coords}")
-        print(f"[热键B] ========== 完成 ==========")
-    except Exception as e:
-        print(f"[热键B] ✗ 错误: {e}")
-        import traceback
-        traceback.print_exc()
-    print("=" * 60 + "\n")
+startup_state["app_loaded_ms"] = elapsed_ms()
 
 
-def on_hotkey_c():
-    """热键C：手动截图"""
-    print("\n" + "=" * 60)
-    print("[热键C] ========== 触发！执行截图 ==========")
+def open_browser():
+    """自动打开浏览器 访问 http://localhost:8021"""
     try:
-        # 每次热键触发时重新加载选区，确保使用最新配置
-        try:
-            region_service.load_regions()
-        except Exception as e:
-            print(f"[热键C] ⚠ 重新加载选区失败: {e}")
-
-        regions = region_service.get_all_regions()
-        if not regions:
-            print("[热键C] ⚠ 警告: 没有可用的选区")
-            return
-        
-        print(f"[热键C] 找到 {len(regions)} 个选区，开始截图...")
-        success_count = 0
-        for region in regions:
-            try:
-                success, message, file_path = screenshot_service.capture_and_save_region(region)
-                if success:
-                    success_count += 1
-                    print(f"[热键C] ✓ {region.name}: {file_path}")
-                else:
-                    print(f"[热键C] ✗ {region.name}: {message}")
-            except Exception as e:
-                print(f"[热键C] ✗ {region.name}: 错误 - {e}")
-        
-        print(f"[热键C] 完成！成功: {success_count}/{len(regions)}")
-        print("=" * 60 + "\n")
+        import webbrowser
+        webbrowser.open('http://localhost:8021')
+        print("浏览器已自动打开")
     except Exception as e:
-        print(f"[热键C] ✗ 错误: {e}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 60 + "\n")
+        print(f"打开浏览器失败: {e}")
 
 
-def setup_hotkeys():
-    """设置热键"""
-    try:
-        config = config_service.get_config()
-        # 先清除旧热键
-        hotkey_service.unregister_hotkey(config.hotkey_a)
-        hotkey_service.unregister_hotkey(config.hotkey_b)
-        hotkey_service.unregister_hotkey(config.hotkey_c)
-        
-        # 注册新热键
-        success_a = hotkey_service.register_hotkey(config.hotkey_a, on_hotkey_a)
-        success_b = hotkey_service.register_hotkey(config.hotkey_b, on_hotkey_b)
-        success_c = hotkey_service.register_hotkey(config.hotkey_c, on_hotkey_c)
-        
-        print(f"热键注册结果: A={success_a}, B={success_b}, C={success_c}")
-        print(f"热键配置: A={config.hotkey_a}, B={config.hotkey_b}, C={config.hotkey_c}")
-        
-        # 启动监听
-        hotkey_service.start_listening()
-        print("热键监听已启动")
-    except Exception as e:
-        print(f"设置热键失败: {e}")
-        import traceback
-        traceback.print_exc()
+def on_engine_ready(components: dict):
+    """本地引擎后台初始化（截图预热、热键注册）完成"""
+    startup_state["ready_ms"] = elapsed_ms()
+    print(f"[启动] 后台初始化完成，距启动 {startup_state['ready_ms']}ms，组件状态: {components}")
+    if CaptureEngine().config_service.get_config().open_browser:
+        open_browser()
 
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
     print("应用启动中...")
-    # 启动定时截图
-    start_screenshot_timer()
-    # 设置热键（注意：在某些系统上可能需要管理员权限）
-    try:
-        setup_hotkeys()
-        print("热键注册成功")
-
-        # 自动打开浏览器 访问 http://localhost:8021
-        import webbrowser
-        webbrowser.open('http://localhost:8021')
-        print("浏览器已自动打开")
-    except Exception as e:
-        print(f"热键注册失败: {e}")
+    if is_remote_engine():
+        # 截图引擎在独立进程中运行，这里只提供HTTP接口；多worker时不在每个worker中打开浏览器
+        print(f"[启动] 使用独立运行的截图引擎: {get_engine().socket_path}")
+        if os.environ.get("LX_API_WORKERS", "1") == "1" and ConfigService().get_config().open_browser:
+            open_browser()
+    else:
+        # 启动定时截图；耗时的初始化放到后台线程，应用可立即开始处理请求
+        CaptureEngine().start(on_ready=on_engine_ready)
+    startup_state["startup_ms"] = elapsed_ms()
+    print(f"[启动] 开始接受请求，距启动 {startup_state['startup_ms']}ms")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
     print("应用关闭中...")
-    stop_screenshot_timer()
-    hotkey_service.stop_listening()
+    if not is_remote_engine():
+        CaptureEngine().stop()
 
 
 @app.get("/api/health")
@@ -226,11 +143,49 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/ready")
+async def ready_check():
+    """就绪检查：截图引擎后台初始化（截图预热、热键注册）全部完成后返回200，否则返回503"""
+    try:
+        engine = await run_in_threadpool(get_engine().get_status)
+    except EngineError as e:
+        engine = {"ready": False, "components": {"engine": "unavailable"}, "error": e.detail}
+    content = {
+        "ready": engine["ready"],
+        **startup_state,
+        "components": engine["components"],
+        "engine": dict(engine, mode="remote" if is_remote_engine() else "local")
+    }
+    return JSONResponse(status_code=200 if engine["ready"] else 503, content=content)
+
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "backend.main:app",
-        host="0.0.0.0",
-        port=8021,
-        reload=False
-    )
+    # 打包为exe时进程池编码需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    # LX_API_WORKERS > 1 时截图引擎必须独立运行（否则每个worker都会注册热键、运行定时器），
+    # 未指定 LX_ENGINE_SOCKET 时自动启动引擎守护进程
+    workers = int(os.environ.get("LX_API_WORKERS", "1"))
+    engine_process = None
+    if workers > 1 and not is_remote_engine():
+        import subprocess
+        import sys
+        from backend.engine_daemon import default_socket_path
+        from backend.services.capture_engine import ENGINE_SOCKET_ENV
+        socket_path = default_socket_path()
+        os.environ[ENGINE_SOCKET_ENV] = socket_path
+        engine_process = subprocess.Popen([sys.executable, "-m", "backend.engine_daemon", "--socket", socket_path])
+    try:
+        uvicorn.run(
+            "backend.main:app",
+            host="0.0.0.0",
+            port=8021,
+            reload=False,
+            workers=workers
+        )
+    finally:
+        if engine_process is not None:
+            engine_process.terminate()
+            engine_process.wait()
 
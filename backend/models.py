@@ -2,10 +2,54 @@
 数据模型定义
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime
 
 
+class ProbeColorRange(BaseModel):
+    """探测颜色范围：统计颜色在 [lower, upper]（RGB，含边界）内的像素比例"""
+    name: str
+    lower: List[int]
+    upper: List[int]
+
+
+class ProbeSpec(BaseModel):
+    """选区探测配置：只计算统计值，不保存图片"""
+    interval_ms: int = 200  # 探测间隔（毫秒）
+    histogram_bins: int = 0  # 每个通道的直方图分组数，0表示不统计直方图
+    samples: List[List[int]] = []  # 采样像素坐标 [x, y]（相对选区左上角）
+    color_ranges: List[ProbeColorRange] = []
+
+
+class RegionAnchor(BaseModel):
+    """选区锚点：截图前在屏幕上定位参考图，选区按参考图的位移平移（跟随移动的窗口）"""
+    template: str  # 参考图文件路径
+    x: int  # 设置锚点时参考图左上角的屏幕坐标
+    y: int
+    search_margin: int = 200  # 在上次位置附近未找到时，在周围该范围（像素）内搜索
+    threshold: float = 0.8  # 匹配得分（归一化互相关，-1 到 1）阈值
+
+
+class ImageTransform(BaseModel):
+    """选区图片变换：截图在编码前按变换链依次处理"""
+    op: str  # inset / downscale / grayscale / quantize / threshold
+    left: int = 0  # inset：四边向内裁剪的像素数
+    top: int = 0
+    right: int = 0
+    bottom: int = 0
+    factor: int = 2  # downscale：面积平均缩小的倍数
+    colors: int = 16  # quantize：调色板颜色数（2-256）
+    level: int = 128  # threshold：灰度阈值，大于等于阈值为白色
+
+
+class EncodingBounds(BaseModel):
+    """自适应编码的调节范围：负载升高时依次降低PNG压缩级别、换用后面的格式、缩小图片，负载降低时逐级恢复"""
+    min_compress_level: int = 1  # PNG压缩级别下限（负载高时降到该级别，编码最快）
+    max_compress_level: int = 9  # PNG压缩级别上限（负载低时使用，文件最小）
+    formats: List[str] = ["png"]  # 允许的格式（png / jpeg / webp），第一个为首选，PNG已降到最低级别时依次换用后面的格式
+    max_downscale: int = 1  # 允许的最大缩小倍数，1表示不缩小
+
+
 class Region(BaseModel):
     """选区模型"""
     id: Optional[str] = None
@@ -14,6 +58,12 @@ class Region(BaseModel):
     y1: int
     x2: int
     y2: int
+    hotkey: Optional[str] = None  # 单独截取该选区的热键
+    mode: str = "image"  # image：截图保存图片 / probe：只按 probe 配置定期计算统计值（不参与截取所有选区）
+    probe: Optional[ProbeSpec] = None
+    anchor: Optional[RegionAnchor] = None  # 锚点，为空时选区为固定的屏幕坐标
+    transforms: List[ImageTransform] = []  # 编码前的图片变换链（为空时保存原图）
+    encoding: Optional[EncodingBounds] = None  # 自适应编码的调节范围，为空时使用配置中的范围
     created_at: Optional[str] = None
 
     def normalize(self) -> 'Region':
@@ -27,6 +77,12 @@ class Region(BaseModel):
             y1=y1,
             x2=x2,
             y2=y2,
+            hotkey=self.hotkey,
+            mode=self.mode,
+            probe=self.probe,
+            anchor=self.anchor,
+            transforms=self.transforms,
+            encoding=self.encoding,
             created_at=self.created_at
         )
 
@@ -39,6 +95,15 @@ class Region(BaseModel):
             "y1": self.y1,
             "x2": self.x2,
             "y2": self.y2,
+            "hotkey": self.hotkey,
+            "mode": self.mode,
+            "probe": None if self.probe is None else (
+                self.probe.dict() if hasattr(self.probe, 'dict') else self.probe.model_dump()),
+            "anchor": None if self.anchor is None else (
+                self.anchor.dict() if hasattr(self.anchor, 'dict') else self.anchor.model_dump()),
+            "transforms": [step.dict() if hasattr(step, 'dict') else step.model_dump() for step in self.transforms],
+            "encoding": None if self.encoding is None else (
+                self.encoding.dict() if hasattr(self.encoding, 'dict') else self.encoding.model_dump()),
             "created_at": self.created_at
         }
 
@@ -50,6 +115,11 @@ class RegionCreate(BaseModel):
     y1: int
     x2: int
     y2: int
+    hotkey: Optional[str] = None
+    mode: str = "image"
+    probe: Optional[ProbeSpec] = None
+    transforms: List[ImageTransform] = []
+    encoding: Optional[EncodingBounds] = None
 
 
 class RegionUpdate(BaseModel):
@@ -59,6 +129,52 @@ class RegionUpdate(BaseModel):
     y1: Optional[int] = None
     x2: Optional[int] = None
     y2: Optional[int] = None
+    hotkey: Optional[str] = None  # 空字符串表示清除热键
+    mode: Optional[str] = None
+    probe: Optional[ProbeSpec] = None
+    transforms: Optional[List[ImageTransform]] = None  # 空列表表示清除变换链
+    encoding: Optional[EncodingBounds] = None
+
+
+class RegionGroup(BaseModel):
+    """选区分组模型：一次截取分组外接矩形，再裁剪出各成员选区"""
+    id: Optional[str] = None
+    name: str
+    region_ids: List[str] = []
+    hotkey: Optional[str] = None  # 截取该分组的热键
+    screenshot_interval: int = 0  # 分组定时截图间隔（秒），0表示关闭
+    output_dir: Optional[str] = None  # 分组输出目录，为空时使用全局输出目录
+    created_at: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "region_ids": list(self.region_ids),
+            "hotkey": self.hotkey,
+            "screenshot_interval": self.screenshot_interval,
+            "output_dir": self.output_dir,
+            "created_at": self.created_at
+        }
+
+
+class RegionGroupCreate(BaseModel):
+    """创建分组请求模型"""
+    name: str
+    region_ids: List[str] = []
+    hotkey: Optional[str] = None
+    screenshot_interval: int = 0
+    output_dir: Optional[str] = None
+
+
+class RegionGroupUpdate(BaseModel):
+    """更新分组请求模型"""
+    name: Optional[str] = None
+    region_ids: Optional[List[str]] = None
+    hotkey: Optional[str] = None  # 空字符串表示清除热键
+    screenshot_interval: Optional[int] = None
+    output_dir: Optional[str] = None  # 空字符串表示使用全局输出目录
 
 
 class HotkeyConfig(BaseModel):
@@ -68,6 +184,36 @@ class HotkeyConfig(BaseModel):
     hotkey_c: str = "ctrl+alt+s"  # 手动截图
 
 
+class SinkConfig(BaseModel):
+    """截图输出配置：截图按批直接发送给下游消费者"""
+    name: str
+    type: str  # filesystem / memory / socket / http
+    enabled: bool = True
+    format: str = "png"  # png / raw（原始像素，省去编码；filesystem 始终保存PNG）
+    path: str = ""  # filesystem：输出目录；socket：Unix socket 路径
+    url: str = ""  # http：POST 地址（仅限本机）
+    batch_size: int = 8  # 每批最多发送的帧数
+    batch_ms: int = 50  # 未满一批时最多等待的时间（毫秒）
+    queue_size: int = 256  # 待发送帧上限（memory 同时为内存队列上限）
+    overflow: str = "drop_oldest"  # 待发送队列满时：drop_oldest / drop_new / block（阻塞截图最多 block_ms）
+    block_ms: int = 1000
+    retries: int = 3  # 发送失败后的重试次数
+    retry_backoff_ms: int = 200  # 重试间隔（每次翻倍）
+    timeout: float = 5.0  # socket / http 超时（秒）
+
+
+class AdaptiveEncodingConfig(BaseModel):
+    """自适应编码：按截图保存流水线的负载（保存耗时、等待编码的截图数、CPU使用率）调节各选区的编码参数"""
+    enabled: bool = False
+    target_fps: float = 0  # 目标保存帧率（每秒保存全部选区的次数），0表示不按帧率调节
+    cpu_budget: float = 0  # 进程（含编码子进程）CPU使用率上限（占全部核心的百分比），0表示不按CPU调节
+    max_queue: int = 0  # 等待编码的截图数上限，0表示 process 模式为进程数的2倍、inline 模式不按队列调节
+    interval_ms: int = 2000  # 调节间隔（毫秒）
+    jpeg_quality: int = 85  # 换用 jpeg 时的质量（1-95）
+    webp_quality: int = 80  # 换用 webp 时的质量（1-100）
+    bounds: EncodingBounds = EncodingBounds()  # 默认调节范围（选区可单独设置）
+
+
 class AppConfig(BaseModel):
     """应用配置模型"""
     output_dir: str = "./screenshots"
@@ -75,6 +221,70 @@ class AppConfig(BaseModel):
     hotkey_b: str = "ctrl+alt+2"
     hotkey_c: str = "ctrl+alt+s"
     screenshot_interval: int = 0  # 0表示关闭定时截图
+    open_browser: bool = True  # 启动后自动打开浏览器
+    prewarm_capture: bool = True  # 启动后在后台预热截图组件
+    hotkey_coalesce: bool = True  # 同一热键同时最多执行一次，执行期间的重复按下合并
+    hotkey_debounce_ms: int = 150  # 小于该间隔的重复按下直接丢弃，0表示关闭
+    hotkey_dispatch_workers: int = 2  # 热键回调线程池大小
+    region_hotkeys_enabled: bool = True  # 是否注册选区/分组各自的热键
+    monitor_batching: bool = True  # 按显示器批量截取：每个显示器只截取一次，再裁剪出各选区
+    monitor_refresh_interval: int = 5  # 显示器布局缓存刷新间隔（秒），0表示只在手动刷新时更新
+    hotkey_burst: str = ""  # 连拍热键，为空表示不注册
+    hotkey_session: str = ""  # 开始/结束录制会话的热键，为空表示不注册
+    burst_frames: int = 30  # 连拍热键（或未指定帧数/时长时）的帧数
+    burst_max_memory_mb: int = 512  # 连拍缓冲区内存上限，限制最大帧数
+    encoder_mode: str = "inline"  # 编码方式：inline（当前线程）/ process（进程池 + 共享内存）
+    encoder_workers: int = 0  # process模式的进程数，0表示CPU核心数
+    png_compress_level: int = 6  # PNG压缩级别（0-9）
+    adaptive_encoding: AdaptiveEncodingConfig = AdaptiveEncodingConfig()  # 自适应编码（只用于PNG文件存储）
+    storage_mode: str = "png"  # 截图存储方式：png（每张一个PNG文件）/ delta（关键帧 + 差分帧分段文件）
+    delta_keyframe_interval: int = 300  # 差分存储：每个分段的帧数（每段以关键帧开始）
+    delta_tile_size: int = 32  # 差分存储：比较变化的块大小（像素）
+    singleflight_window_ms: int = 50  # 相同选区集合的截图完成后，该时间内的请求直接复用结果
+    frame_cache_max_age_ms: int = 1000  # 预览使用该时间内截取过的画面，不重新截屏（0为关闭）
+    frame_cache_size: int = 2  # 每个显示器缓存的最近画面数
+    probe_history_size: int = 3600  # 每个探测选区在内存中保留的记录数
+    probe_log: bool = True  # 探测记录追加写入 {output_dir}/probes/{选区名}.jsonl
+    hash_index_enabled: bool = True  # 为保存的截图计算感知哈希，用于查找相似的历史截图
+    hash_index_max_entries: int = 50000  # 感知哈希索引保留的截图数上限，超出时淘汰最早的记录（0为不限）
+    timelapse_enabled: bool = False  # 把保存的截图增量拼接为延时拼图（{output_dir}/timelapse/{选区名}/）
+    timelapse_tile_seconds: int = 60  # 延时拼图每格的时长（秒），每格取该时间段内的第一张截图
+    timelapse_sheet_seconds: int = 3600  # 每张延时拼图的时长（秒），必须是每格时长的整数倍
+    timelapse_tile_width: int = 160  # 延时拼图每格的宽度（像素），高度按截图宽高比
+    timelapse_columns: int = 10  # 延时拼图每行的格数
+    anchor_recheck_ms: int = 100  # 设置了锚点的选区在该时间内只定位一次锚点
+    save_files: bool = True  # 截图保存到输出目录（关闭时只发送到 output_sinks）
+    output_sinks: List[SinkConfig] = []  # 截图输出（filesystem / memory / socket / http）
+    singleflight_share_encode: bool = False  # 并发的相同截图保存请求是否共享同一次编码（返回相同文件）
+    capture_backend: str = "mss"  # 截图后端：mss（真实屏幕）/ synthetic（合成画面，用于测试）
+    agent_enabled: bool = False  # 是否以代理模式连接到中心协调器
+    agent_name: str = ""  # 代理名称（为空时根据主机名和工作目录生成）
+    coordinator_address: str = "127.0.0.1:8765"  # 协调器地址 host:port
+    agent_send_frames: bool = False  # 是否同时上传截图文件内容
+    agent_batch_size: int = 20  # 每批上传的截图记录数
+    agent_flush_interval: float = 2.0  # 未满一批时的最长上传间隔（秒）
+    agent_queue_max: int = 1000  # 待上传记录上限（超出时丢弃最旧的记录）
+    job_max_concurrency: int = 2  # 同时执行的任务数（其余任务排队）
+    job_history_size: int = 200  # 保留的已结束任务数
+
+
+class MonitorInfo(BaseModel):
+    """显示器信息模型"""
+    index: int  # 显示器序号（与mss一致，从1开始）
+    left: int
+    top: int
+    width: int
+    height: int
+    is_primary: bool = False
+    region_ids: List[str] = []  # 分配到该显示器的选区
+    spanning_region_ids: List[str] = []  # 与该显示器重叠、但跨越多个显示器的选区
+
+
+class MonitorLayout(BaseModel):
+    """显示器布局模型"""
+    layout_version: int
+    virtual_screen: MonitorInfo  # 所有显示器组成的虚拟屏幕
+    monitors: List[MonitorInfo]
 
 
 class MousePosition(BaseModel):
@@ -89,3 +299,115 @@ class ScreenshotResponse(BaseModel):
     message: str
     file_path: Optional[str] = None
 
+
+
+class BurstRequest(BaseModel):
+    """连拍请求模型"""
+    region_ids: Optional[List[str]] = None  # 为空表示所有选区
+    frames: int = 0  # 帧数，0表示按duration或配置的burst_frames
+    duration: float = 0  # 持续时间（秒），0表示不限
+    output_dir: Optional[str] = None  # 为空时使用全局输出目录
+
+
+class BurstIntervalStats(BaseModel):
+    """连拍帧间隔统计（毫秒）"""
+    min: float
+    mean: float
+    p50: float
+    p95: float
+    max: float
+    stdev: float
+
+
+class BurstResponse(BaseModel):
+    """连拍响应模型"""
+    success: bool
+    message: str
+    frames: int = 0
+    grabs_per_frame: int = 0
+    capture_seconds: float = 0
+    encode_seconds: float = 0
+    fps: Optional[float] = None
+    interval_ms: Optional[BurstIntervalStats] = None
+    files_saved: int = 0
+    output_dir: Optional[str] = None
+
+
+class SessionCreate(BaseModel):
+    """开始录制会话请求模型"""
+    name: str = ""  # 会话名称，为空时按时间生成
+    note: str = ""  # 备注（写入 manifest）
+
+
+class CaptureRecord(BaseModel):
+    """代理上报的截图记录"""
+    region_id: Optional[str] = None
+    region_name: str
+    file_path: str
+    captured_at: str
+    size: Optional[int] = None  # 文件大小（字节）
+    frame_path: Optional[str] = None  # 协调器保存的截图文件（代理上传截图内容时）
+
+
+class AgentInfo(BaseModel):
+    """协调器中的代理信息"""
+    agent_id: str
+    hostname: str
+    pid: int
+    connected: bool
+    connected_at: Optional[str] = None
+    last_seen: Optional[str] = None
+    capture_count: int = 0
+    frame_count: int = 0
+    region_count: int = 0
+    health: dict = {}
+
+
+class JobCreate(BaseModel):
+    """任务提交模型"""
+    kind: str  # capture / burst / export / reindex / timelapse
+    region_ids: Optional[List[str]] = None  # capture/burst：要截取的选区（默认全部）
+    group_id: Optional[str] = None  # capture：截取分组
+    frames: int = 0  # burst：帧数
+    duration: float = 0  # burst：时长（秒）
+    output_dir: Optional[str] = None  # capture/burst：输出目录；export/reindex/timelapse：要导出/索引/拼接的目录
+    region_name: Optional[str] = None  # export/timelapse：只导出/拼接该选区的截图
+    since: Optional[float] = None  # export/timelapse：起始时间（时间戳）
+    until: Optional[float] = None  # export/timelapse：结束时间（时间戳）
+
+
+class JobInfo(BaseModel):
+    """任务信息模型"""
+    id: str
+    kind: str
+    params: dict
+    status: str  # queued / running / succeeded / failed / cancelled
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    version: int = 0
+
+
+class ProbeRecord(BaseModel):
+    """选区探测记录"""
+    t: float  # 截取时间（时间戳）
+    mean: List[float]  # 平均颜色
+    median: List[float]  # 颜色中位数
+    histogram: Optional[List[List[int]]] = None  # 每个通道的直方图
+    samples: Optional[List[List[int]]] = None  # 采样像素颜色
+    ranges: Optional[dict] = None  # 颜色范围名称 -> 像素比例
+
+
+class AnchorCreate(BaseModel):
+    """设置选区锚点请求模型：截取屏幕上的矩形作为参考图"""
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    search_margin: int = 200
+    threshold: float = 0.8
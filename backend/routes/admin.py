@@ -0,0 +1,37 @@
+"""
+管理路由：截图引擎进程的资源使用情况和内存分配追踪（用于排查长时间运行后的内存、句柄增长）
+"""
+from fastapi import APIRouter
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/resources")
+def get_resources(top: int = 0):
+    """常驻内存、打开的文件描述符/句柄、线程、截图后端实例；tracemalloc 开启时 top 指定返回分配最多的代码位置数"""
+    return get_engine().get_resources(top=top)
+
+
+@router.post("/tracemalloc/start")
+def start_tracemalloc(frames: int = 1):
+    """开启 tracemalloc（开启后内存分配变慢，排查完毕后应关闭）"""
+    return get_engine().set_tracemalloc(enabled=True, frames=frames)
+
+
+@router.post("/tracemalloc/stop")
+def stop_tracemalloc():
+    """关闭 tracemalloc 并丢弃快照"""
+    return get_engine().set_tracemalloc(enabled=False)
+
+
+@router.post("/tracemalloc/snapshots")
+def take_snapshot(limit: int = 10):
+    """保存快照，返回快照ID和分配最多的代码位置"""
+    return get_engine().take_memory_snapshot(limit=limit)
+
+
+@router.get("/tracemalloc/snapshots/{snapshot_id}/diff")
+def diff_snapshot(snapshot_id: int, limit: int = 10):
+    """当前内存分配与快照的差异（按增长量排序）"""
+    return get_engine().diff_memory_snapshot(snapshot_id=snapshot_id, limit=limit)
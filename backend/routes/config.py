@@ -3,7 +3,8 @@
 """
 from fastapi import APIRouter, HTTPException
 from backend.models import AppConfig
-from backend.services.config_service import ConfigService
+from backend.services.capture_engine import get_engine, is_remote_engine
+from backend.services.config_service import ConfigService, validate_app_config
 
 router = APIRouter(prefix="/api/config", tags=["config"])
 
@@ -14,24 +15,28 @@ def get_config_service():
 
 @router.get("", response_model=AppConfig)
 async def get_config():
-    """获取当前配置"""
+    """获取当前配置（多worker时其他worker可能修改了配置文件，因此重新读取）"""
     config_service = get_config_service()
+    if is_remote_engine():
+        return config_service.load_config()
     return config_service.get_config()
 
 
 @router.put("", response_model=AppConfig)
-async def update_config(config: AppConfig):
+def update_config(config: AppConfig):
     """更新配置"""
     config_service = get_config_service()
-    # 验证输出目录
-    if config.output_dir:
-        is_valid, message = config_service.validate_output_dir(config.output_dir)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=message)
+    # 验证输出目录、截图输出、自适应编码、延时拼图和差分存储
+    error = validate_app_config(config)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     # 兼容Pydantic v1和v2
     config_dict = config.dict() if hasattr(config, 'dict') else config.model_dump()
     updated_config = config_service.update_config(**config_dict)
+    if is_remote_engine():
+        # 截图引擎在独立进程中运行，通知其重新读取配置文件
+        get_engine().reload_config()
     return updated_config
 
 
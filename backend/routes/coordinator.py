@@ -0,0 +1,94 @@
+"""
+协调器路由（由 backend.coordinator 启动的协调器应用使用）
+"""
+from fastapi import APIRouter, HTTPException
+from typing import List
+from backend.models import AgentInfo, CaptureRecord, RegionCreate
+from backend.services.coordinator_service import CoordinatorService
+
+router = APIRouter(prefix="/api/coordinator", tags=["coordinator"])
+
+
+def get_agent_or_404(agent_id: str):
+    """获取代理，不存在时返回404"""
+    record = CoordinatorService().get_agent(agent_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="代理不存在")
+    return record
+
+
+@router.get("/health")
+async def get_health():
+    """汇总所有代理的健康状态"""
+    return CoordinatorService().get_health()
+
+
+@router.get("/agents", response_model=List[AgentInfo])
+async def get_agents():
+    """获取所有代理"""
+    return CoordinatorService().get_agents()
+
+
+@router.get("/agents/{agent_id}", response_model=AgentInfo)
+async def get_agent(agent_id: str):
+    """获取代理详情"""
+    return get_agent_or_404(agent_id).to_dict()
+
+
+@router.get("/catalog", response_model=List[CaptureRecord])
+async def get_catalog(limit: int = 100):
+    """所有代理最近的截图记录（按截取时间倒序）"""
+    return CoordinatorService().get_catalog(limit=limit)
+
+
+@router.get("/agents/{agent_id}/catalog", response_model=List[CaptureRecord])
+async def get_agent_catalog(agent_id: str, limit: int = 100):
+    """代理最近的截图记录"""
+    get_agent_or_404(agent_id)
+    return CoordinatorService().get_catalog(agent_id, limit)
+
+
+@router.get("/agents/{agent_id}/regions")
+async def get_agent_regions(agent_id: str):
+    """代理当前的选区（注册时上报，下发后更新）"""
+    return get_agent_or_404(agent_id).regions
+
+
+@router.put("/agents/{agent_id}/regions")
+async def push_agent_regions(agent_id: str, regions: List[RegionCreate]):
+    """向代理下发选区（替换代理的全部选区）"""
+    import uuid
+    get_agent_or_404(agent_id)
+    payload = []
+    for region in regions:
+        data = region.dict() if hasattr(region, 'dict') else region.model_dump()
+        payload.append({"id": str(uuid.uuid4()), **data})
+    if not CoordinatorService().push_regions(agent_id, payload):
+        raise HTTPException(status_code=409, detail="代理未连接")
+    return {"message": "选区已下发", "count": len(payload)}
+
+
+@router.put("/agents/{agent_id}/config")
+async def push_agent_config(agent_id: str, config: dict):
+    """向代理下发配置（只需包含要修改的字段），与代理当前的配置合并后校验"""
+    from pydantic import ValidationError
+    from backend.models import AppConfig
+    from backend.services.config_service import validate_app_config
+    record = get_agent_or_404(agent_id)
+    unknown = set(config) - set(AppConfig.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的配置项: {', '.join(sorted(unknown))}")
+    try:
+        merged = AppConfig(**{**record.config, **config})
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"配置无效: {e}")
+    # 输出目录在代理所在主机上，由代理应用时检查
+    error = validate_app_config(merged, check_output_dir=False)
+    if error:
+        raise HTTPException(status_code=400, detail=f"配置无效: {error}")
+    # 下发校验后的值（如 "5" 转换为 5）
+    merged = merged.dict() if hasattr(merged, 'dict') else merged.model_dump()
+    config = {key: merged[key] for key in config}
+    if not CoordinatorService().push_config(agent_id, config):
+        raise HTTPException(status_code=409, detail="代理未连接")
+    return {"message": "配置已下发"}
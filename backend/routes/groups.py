@@ -0,0 +1,93 @@
+"""
+选区分组路由
+"""
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from backend.models import RegionGroup, RegionGroupCreate, RegionGroupUpdate, ScreenshotResponse
+from backend.services.capture_engine import get_engine
+from backend.services.group_service import GroupService
+from backend.services.region_service import RegionService
+
+router = APIRouter(prefix="/api/groups", tags=["groups"])
+
+
+def get_group_service():
+    """获取服务实例"""
+    return GroupService()
+
+
+def reload_hotkeys():
+    """分组热键变化后通知截图引擎重新注册热键（阻塞调用，调用它的路由为同步函数，在线程池中执行）"""
+    get_engine().reload_hotkeys()
+
+
+def validate_group(region_ids: Optional[List[str]], screenshot_interval: Optional[int]):
+    """验证分组的成员选区和定时截图间隔，不合法时返回400"""
+    if screenshot_interval is not None and screenshot_interval < 0:
+        raise HTTPException(status_code=400, detail="定时截图间隔不能为负数")
+    if region_ids is not None:
+        known = {region.id for region in RegionService().get_all_regions()}
+        unknown = [region_id for region_id in region_ids if region_id not in known]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"选区不存在: {', '.join(unknown)}")
+
+
+@router.get("", response_model=List[RegionGroup])
+async def get_all_groups():
+    """获取所有分组"""
+    group_service = get_group_service()
+    return group_service.get_all_groups()
+
+
+@router.get("/{group_id}", response_model=RegionGroup)
+async def get_group(group_id: str):
+    """根据ID获取分组"""
+    group_service = get_group_service()
+    group = group_service.get_group_by_id(group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="分组不存在")
+    return group
+
+
+@router.post("", response_model=RegionGroup, status_code=201)
+def create_group(group_data: RegionGroupCreate):
+    """创建分组"""
+    validate_group(group_data.region_ids, group_data.screenshot_interval)
+    group_service = get_group_service()
+    group = group_service.create_group(group_data)
+    if group.hotkey:
+        reload_hotkeys()
+    return group
+
+
+@router.put("/{group_id}", response_model=RegionGroup)
+def update_group(group_id: str, group_data: RegionGroupUpdate):
+    """更新分组"""
+    validate_group(group_data.region_ids, group_data.screenshot_interval)
+    group_service = get_group_service()
+    group = group_service.update_group(group_id, group_data)
+    if group is None:
+        raise HTTPException(status_code=404, detail="分组不存在")
+    if group_data.hotkey is not None:
+        reload_hotkeys()
+    return group
+
+
+@router.delete("/{group_id}", status_code=204)
+def delete_group(group_id: str):
+    """删除分组"""
+    group_service = get_group_service()
+    group = group_service.get_group_by_id(group_id)
+    if group is None or not group_service.delete_group(group_id):
+        raise HTTPException(status_code=404, detail="分组不存在")
+    if group.hotkey:
+        reload_hotkeys()
+
+
+@router.post("/{group_id}/capture", response_model=List[ScreenshotResponse])
+def capture_group(group_id: str):
+    """截取分组（每个显示器一次截取成员选区的外接矩形，再裁剪出各选区；同步函数，在线程池中执行）"""
+    return [
+        ScreenshotResponse(success=result["success"], message=result["message"], file_path=result["file_path"])
+        for result in get_engine().capture_group(group_id=group_id)
+    ]
@@ -0,0 +1,29 @@
+"""
+相似截图路由：按感知哈希查找历史截图（"这个选区上次是这个样子是什么时候"）
+"""
+import base64
+from fastapi import APIRouter, File, UploadFile
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/hashes", tags=["hashes"])
+
+
+@router.post("/search")
+async def search_by_image(image: UploadFile = File(...), region_name: Optional[str] = None,
+                          max_distance: int = 10, limit: int = 5):
+    """上传图片，返回各选区最相似的历史截图（按汉明距离，region_name 限定选区）"""
+    data = await image.read()
+    return await run_in_threadpool(
+        get_engine().search_similar, image_b64=base64.b64encode(data).decode("ascii"),
+        region_name=region_name, max_distance=max_distance, limit=limit
+    )
+
+
+@router.get("/search")
+def search_by_capture(capture_id: Optional[int] = None, file_path: Optional[str] = None,
+                      region_name: Optional[str] = None, max_distance: int = 10, limit: int = 5):
+    """按已索引截图的ID或文件路径（截图结果中的 file_path）查找相似的历史截图"""
+    return get_engine().search_similar(capture_id=capture_id, file_path=file_path, region_name=region_name,
+                                       max_distance=max_distance, limit=limit)
@@ -0,0 +1,74 @@
+"""
+任务路由：截图、连拍、导出任务异步执行，立即返回任务ID，可轮询、订阅进度或取消
+"""
+import asyncio
+import json
+import time
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from backend.models import JobCreate, JobInfo
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# 订阅进度的轮询间隔（秒）：在事件循环中等待，不占用线程池
+EVENT_POLL_INTERVAL = 0.25
+# 没有变化时发送保持连接注释的间隔（秒）
+KEEPALIVE_INTERVAL = 15
+
+
+@router.post("", response_model=JobInfo, status_code=202)
+def submit_job(job: JobCreate):
+    """提交任务（立即返回，任务在后台执行）"""
+    params = job.dict() if hasattr(job, 'dict') else job.model_dump()
+    kind = params.pop("kind")
+    return get_engine().submit_job(kind=kind, params=params)
+
+
+@router.get("", response_model=List[JobInfo])
+def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """任务列表（最新的在前，可按状态过滤）"""
+    return get_engine().list_jobs(status=status, limit=limit)
+
+
+@router.get("/{job_id}", response_model=JobInfo)
+def get_job(job_id: str):
+    """获取任务状态和进度"""
+    return get_engine().get_job(job_id=job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=JobInfo)
+def cancel_job(job_id: str):
+    """取消任务（排队中的任务立即取消，执行中的任务在下一个选区/帧处中断）"""
+    return get_engine().cancel_job(job_id=job_id)
+
+
+@router.get("/{job_id}/events")
+async def subscribe_job(job_id: str):
+    """订阅任务进度（Server-Sent Events），任务结束后关闭连接"""
+    engine = get_engine()
+    # 任务不存在时直接返回404
+    job = await run_in_threadpool(engine.get_job, job_id=job_id)
+
+    async def events():
+        current = job
+        yield f"event: progress\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+        last_sent = time.monotonic()
+        while current["status"] not in ("succeeded", "failed", "cancelled"):
+            # 在事件循环中等待后读取一次任务状态（阻塞等待会让每个订阅者占用一个线程池线程）
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            update = await run_in_threadpool(engine.get_job, job_id=job_id)
+            if update["version"] == current["version"]:
+                if time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                    # 没有变化，发送注释保持连接
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+                continue
+            current = update
+            yield f"event: progress\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+            last_sent = time.monotonic()
+        yield f"event: done\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,49 @@
+"""
+显示器路由
+"""
+from fastapi import APIRouter, HTTPException
+from backend.models import MonitorInfo, MonitorLayout
+from backend.services.monitor_service import MonitorService
+from backend.services.region_service import RegionService
+
+router = APIRouter(prefix="/api/monitors", tags=["monitors"])
+
+
+def build_layout(force_refresh: bool = False) -> MonitorLayout:
+    """生成显示器布局及各显示器上的选区"""
+    monitor_service = MonitorService()
+    try:
+        monitors = monitor_service.get_monitors(force_refresh=force_refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取显示器信息失败: {e}")
+    if not monitors:
+        raise HTTPException(status_code=500, detail="未检测到显示器")
+
+    infos = [MonitorInfo(index=index, is_primary=(index == 1), **m) for index, m in enumerate(monitors)]
+    for region in RegionService().get_all_regions():
+        n = region.normalize()
+        index, spans = monitor_service.locate(n.x1, n.y1, n.x2, n.y2)
+        if index == 0:
+            continue
+        if spans:
+            infos[index].spanning_region_ids.append(region.id)
+        else:
+            infos[index].region_ids.append(region.id)
+
+    return MonitorLayout(
+        layout_version=monitor_service.layout_version,
+        virtual_screen=infos[0],
+        monitors=infos[1:]
+    )
+
+
+@router.get("", response_model=MonitorLayout)
+async def get_monitors():
+    """获取显示器布局（缓存）及分配到各显示器的选区"""
+    return build_layout()
+
+
+@router.post("/refresh", response_model=MonitorLayout)
+async def refresh_monitors():
+    """重新枚举显示器"""
+    return build_layout(force_refresh=True)
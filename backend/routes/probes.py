@@ -0,0 +1,27 @@
+"""
+选区探测路由：探测模式的选区只计算统计值（不保存图片），按时间序列查询
+"""
+from fastapi import APIRouter
+from typing import Dict, List, Optional
+from backend.models import ProbeRecord
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/probes", tags=["probes"])
+
+
+@router.get("", response_model=Dict[str, ProbeRecord])
+def get_latest_probes():
+    """各探测选区最新的记录（选区ID -> 记录）"""
+    return get_engine().get_probe_latest()
+
+
+@router.get("/{region_id}", response_model=List[ProbeRecord])
+def get_probe_series(region_id: str, since: Optional[float] = None, limit: int = 1000):
+    """选区的探测记录（按时间顺序，since 为起始时间戳）"""
+    return get_engine().get_probe_series(region_id=region_id, since=since, limit=limit)
+
+
+@router.post("/{region_id}", response_model=ProbeRecord)
+def probe_region(region_id: str):
+    """立即探测一次选区（同步函数，在线程池中执行）"""
+    return get_engine().probe_region(region_id=region_id)
@@ -3,16 +3,26 @@
 """
 from fastapi import APIRouter, HTTPException
 from typing import List
-from backend.models import Region, RegionCreate, RegionUpdate
+from backend.models import AnchorCreate, Region, RegionCreate, RegionUpdate
+from backend.services.capture_engine import get_engine
+from backend.services.adaptive_encoder import validate_bounds
+from backend.services.image_transform import validate_transforms
 from backend.services.region_service import RegionService
-from backend.services.screenshot_service import ScreenshotService
 
 router = APIRouter(prefix="/api/regions", tags=["regions"])
 
+# 选区模式：image 截图保存图片，probe 只计算统计值
+REGION_MODES = ("image", "probe")
+
 # 延迟创建服务实例
 def get_services():
     """获取服务实例"""
-    return RegionService(), ScreenshotService()
+    return RegionService(), get_engine()
+
+
+def reload_hotkeys():
+    """选区热键变化后通知截图引擎重新注册热键（阻塞调用，调用它的路由为同步函数，在线程池中执行）"""
+    get_engine().reload_hotkeys()
 
 
 @router.get("", response_model=List[Region])
@@ -33,70 +43,105 @@ async def get_region(region_id: str):
 
 
 @router.post("", response_model=Region, status_code=201)
-async def create_region(region_data: RegionCreate):
+def create_region(region_data: RegionCreate):
     """创建选区"""
     region_service, _ = get_services()
     # 验证坐标
     if region_data.x1 == region_data.x2 or region_data.y1 == region_data.y2:
         raise HTTPException(status_code=400, detail="选区宽度或高度不能为0")
+    if region_data.mode not in REGION_MODES:
+        raise HTTPException(status_code=400, detail=f"选区模式必须是 {' / '.join(REGION_MODES)}")
+    error = validate_transforms(region_data.transforms) or (
+        region_data.encoding and validate_bounds(region_data.encoding))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
-    return region_service.create_region(region_data)
+    region = region_service.create_region(region_data)
+    if region.hotkey:
+        reload_hotkeys()
+    return region
 
 
 @router.put("/{region_id}", response_model=Region)
-async def update_region(region_id: str, region_data: RegionUpdate):
+def update_region(region_id: str, region_data: RegionUpdate):
     """更新选区"""
     region_service, _ = get_services()
+    if region_data.mode is not None and region_data.mode not in REGION_MODES:
+        raise HTTPException(status_code=400, detail=f"选区模式必须是 {' / '.join(REGION_MODES)}")
+    error = validate_transforms(region_data.transforms or []) or (
+        region_data.encoding and validate_bounds(region_data.encoding))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     region = region_service.update_region(region_id, region_data)
     if region is None:
         raise HTTPException(status_code=404, detail="选区不存在")
+    if region_data.hotkey is not None:
+        reload_hotkeys()
     return region
 
 
 @router.delete("/{region_id}", status_code=204)
-async def delete_region(region_id: str):
+def delete_region(region_id: str):
     """删除选区"""
     region_service, _ = get_services()
+    region = region_service.get_region_by_id(region_id)
     success = region_service.delete_region(region_id)
     if not success:
         raise HTTPException(status_code=404, detail="选区不存在")
+    if region.hotkey:
+        reload_hotkeys()
 
 
 @router.get("/{region_id}/preview")
-async def get_region_preview(region_id: str):
-    """获取选区预览图"""
-    region_service, screenshot_service = get_services()
-    region = region_service.get_region_by_id(region_id)
-    if region is None:
-        raise HTTPException(status_code=404, detail="选区不存在")
-    
-    preview_data = screenshot_service.get_region_preview(region)
-    if preview_data is None:
-        raise HTTPException(status_code=500, detail="生成预览图失败")
+def get_region_preview(region_id: str):
+    """获取选区预览图（同步函数，在线程池中执行，并发请求可合并为一次截图）"""
+    _, engine = get_services()
+    preview_data = engine.preview_region(region_id=region_id)
     
     from fastapi.responses import Response
     return Response(content=preview_data, media_type="image/png")
 
 
 @router.post("/preview-temp")
-async def get_temp_preview(region_data: RegionCreate):
-    """获取临时选区预览图（用于交互式设置）"""
-    from backend.models import Region
-    _, screenshot_service = get_services()
-    
-    # 创建临时选区对象
-    temp_region = Region(
-        name="temp",
+def get_temp_preview(region_data: RegionCreate):
+    """获取临时选区预览图（用于交互式设置，同步函数，在线程池中执行）"""
+    _, engine = get_services()
+    preview_data = engine.preview_rect(
         x1=region_data.x1,
         y1=region_data.y1,
         x2=region_data.x2,
         y2=region_data.y2
     )
     
-    preview_data = screenshot_service.get_region_preview(temp_region)
-    if preview_data is None:
-        raise HTTPException(status_code=500, detail="生成预览图失败")
-    
     from fastapi.responses import Response
     return Response(content=preview_data, media_type="image/png")
 
+
+
+@router.post("/{region_id}/anchor", response_model=Region)
+def set_region_anchor(region_id: str, anchor_data: AnchorCreate):
+    """设置选区锚点：截取屏幕上的矩形作为参考图，之后选区跟随参考图移动"""
+    _, engine = get_services()
+    return engine.set_anchor(
+        region_id=region_id,
+        x1=anchor_data.x1,
+        y1=anchor_data.y1,
+        x2=anchor_data.x2,
+        y2=anchor_data.y2,
+        search_margin=anchor_data.search_margin,
+        threshold=anchor_data.threshold
+    )
+
+
+@router.get("/{region_id}/anchor")
+def get_region_anchor(region_id: str):
+    """获取选区锚点的定位状态（位移、匹配得分、定位方式和耗时）"""
+    _, engine = get_services()
+    return engine.get_anchor_status(region_id=region_id)
+
+
+@router.delete("/{region_id}/anchor", response_model=Region)
+def clear_region_anchor(region_id: str):
+    """清除选区锚点，选区恢复为固定的屏幕坐标"""
+    _, engine = get_services()
+    return engine.clear_anchor(region_id=region_id)
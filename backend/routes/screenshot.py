@@ -1,53 +1,67 @@
 """
-截图路由
+截图路由（截图由截图引擎执行，引擎可在本进程或独立进程中运行）
 """
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import Response
 from typing import List
-from backend.models import ScreenshotResponse
-from backend.services.region_service import RegionService
-from backend.services.screenshot_service import ScreenshotService
+from backend.models import ScreenshotResponse, BurstRequest, BurstResponse
+from backend.services.capture_engine import get_engine
 
 router = APIRouter(prefix="/api/screenshot", tags=["screenshot"])
-region_service = RegionService()
-screenshot_service = ScreenshotService()
+
+
+def to_response(result: dict) -> ScreenshotResponse:
+    """引擎截图结果转换为接口响应"""
+    return ScreenshotResponse(
+        success=result["success"],
+        message=result["message"],
+        file_path=result["file_path"]
+    )
 
 
 # 注意：更具体的路由必须在更通用的路由之前
 @router.post("/all", response_model=List[ScreenshotResponse])
-async def capture_all_regions():
-    """截取所有选区"""
-    from backend.services.region_service import RegionService
-    from backend.services.screenshot_service import ScreenshotService
-    
-    region_service = RegionService()
-    screenshot_service = ScreenshotService()
-    
-    regions = region_service.get_all_regions()
-    if not regions:
-        raise HTTPException(status_code=400, detail="没有可用的选区")
-    
-    results = []
-    for region in regions:
-        success, message, file_path = screenshot_service.capture_and_save_region(region)
-        results.append(ScreenshotResponse(
-            success=success,
-            message=message,
-            file_path=file_path
-        ))
-    
-    return results
+def capture_all_regions():
+    """截取所有选区（同步函数，在线程池中执行，并发请求可合并为一次截图）"""
+    return [to_response(result) for result in get_engine().capture_all()]
 
 
-@router.post("/{region_id}", response_model=ScreenshotResponse)
-async def capture_region(region_id: str):
-    """截取指定选区"""
-    region = region_service.get_region_by_id(region_id)
-    if region is None:
-        raise HTTPException(status_code=404, detail="选区不存在")
-    
-    success, message, file_path = screenshot_service.capture_and_save_region(region)
-    if not success:
-        raise HTTPException(status_code=500, detail=message)
-    
-    return ScreenshotResponse(success=True, message=message, file_path=file_path)
+@router.post("/burst", response_model=BurstResponse)
+def capture_burst(request: BurstRequest):
+    """连拍：以最快速度截取多帧到内存，结束后再编码保存（同步函数，在线程池中执行，不阻塞事件循环）"""
+    result = get_engine().capture_burst(
+        region_ids=request.region_ids,
+        frames=request.frames,
+        duration=request.duration,
+        output_dir=request.output_dir
+    )
+    if not result["success"] and result.get("frames", 0) == 0:
+        raise HTTPException(status_code=500, detail=result["message"])
+    return BurstResponse(**result)
+
+
+@router.get("/frame")
+def get_frame(ref: str):
+    """还原差分存储中的一帧（ref 为截图结果中的文件路径 "{分段文件}#{帧序号}"）"""
+    return Response(content=get_engine().read_frame(ref=ref), media_type="image/png")
+
 
+@router.get("/encoder")
+def get_encoder_stats():
+    """获取编码服务状态（编码方式、进程数、共享内存块使用情况）"""
+    return get_engine().get_encoder_stats()
+
+
+@router.get("/stats")
+def get_capture_stats():
+    """获取截图统计（单飞合并命中情况、截图计划缓存命中情况）"""
+    return get_engine().get_stats()
+
+
+@router.post("/{region_id}", response_model=ScreenshotResponse)
+def capture_region(region_id: str):
+    """截取指定选区（同步函数，在线程池中执行）"""
+    result = get_engine().capture_region(region_id=region_id)
+    if not result["success"]:
+        raise HTTPException(status_code=500, detail=result["message"])
+    return to_response(result)
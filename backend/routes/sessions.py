@@ -0,0 +1,45 @@
+"""
+录制会话路由：开始/结束会话，查看会话列表、汇总统计和帧索引
+"""
+from fastapi import APIRouter
+from typing import List, Optional
+from backend.models import SessionCreate
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/sessions", tags=["sessions"])
+
+
+@router.get("")
+def list_sessions() -> List[dict]:
+    """全部录制会话（最新的在前），状态为 active / completed / incomplete（进程异常退出，没有汇总统计）"""
+    return get_engine().list_sessions()
+
+
+@router.post("", status_code=201)
+def start_session(session: SessionCreate):
+    """开始录制会话（已有进行中的会话时返回409），之后保存到默认输出目录的截图改为保存到会话目录"""
+    return get_engine().start_session(name=session.name, note=session.note)
+
+
+@router.get("/active")
+def get_active_session():
+    """进行中的录制会话的当前统计（没有时为null）"""
+    return get_engine().get_active_session()
+
+
+@router.post("/active/stop")
+def stop_session():
+    """结束进行中的录制会话，返回汇总统计"""
+    return get_engine().stop_session()
+
+
+@router.get("/{session_id}")
+def get_session(session_id: str):
+    """录制会话详情：开始时的配置和选区快照、状态、汇总统计"""
+    return get_engine().get_session(session_id=session_id)
+
+
+@router.get("/{session_id}/frames")
+def get_session_frames(session_id: str, region: Optional[str] = None, offset: int = 0, limit: int = 100):
+    """录制会话的帧索引（按会话序号，region 为选区ID或名称）"""
+    return get_engine().get_session_frames(session_id=session_id, region=region, offset=offset, limit=limit)
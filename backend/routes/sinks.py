@@ -0,0 +1,19 @@
+"""
+截图输出路由：查看各输出的发送统计，从内存输出取出截图
+"""
+from fastapi import APIRouter
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/sinks", tags=["sinks"])
+
+
+@router.get("")
+def get_sinks():
+    """各截图输出的发送统计（待发送帧数、已发送、丢弃、重试、失败）"""
+    return get_engine().get_sink_stats()
+
+
+@router.get("/{name}/frames")
+def drain_frames(name: str, limit: int = 10, wait_ms: int = 0):
+    """从 memory 类型的输出取出最多 limit 帧（data_b64 为 PNG 或原始像素），队列为空时最多等待 wait_ms 毫秒"""
+    return get_engine().drain_sink(name=name, limit=limit, wait_ms=wait_ms)
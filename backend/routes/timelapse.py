@@ -0,0 +1,28 @@
+"""
+延时拼图路由：按选区和时间段拼接的截图缩略图网格，以及每格对应的截图
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from typing import List, Optional
+from backend.services.capture_engine import get_engine
+
+router = APIRouter(prefix="/api/timelapse", tags=["timelapse"])
+
+
+@router.get("")
+def list_sheets(region_name: Optional[str] = None) -> List[dict]:
+    """延时拼图列表（按选区名、开始时间排序）：布局和已有截图的格数"""
+    return get_engine().list_timelapse_sheets(region_name=region_name)
+
+
+@router.get("/{region_name}/{sheet_id}")
+def get_sheet(region_name: str, sheet_id: str):
+    """延时拼图图片（PNG，包括尚未写回文件的最新格子）"""
+    data = get_engine().read_timelapse_sheet(region_name=region_name, sheet_id=sheet_id)
+    return Response(content=data, media_type="image/png")
+
+
+@router.get("/{region_name}/{sheet_id}/index")
+def get_sheet_index(region_name: str, sheet_id: str):
+    """延时拼图的布局和格子索引（格子序号 -> 截取时间、截图文件）"""
+    return get_engine().get_timelapse_index(region_name=region_name, sheet_id=sheet_id)
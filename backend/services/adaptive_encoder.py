@@ -0,0 +1,284 @@
+"""
+自适应编码：按截图保存流水线自身的指标调节各选区的编码参数，负载变化时维持目标帧率
+- 指标（每个调节间隔统计一次）：每帧保存耗时占目标帧率时间预算的比例、等待编码的截图数、进程CPU使用率
+- 负载为各已启用指标与其上限之比的最大值
+- 负载超过1时，本间隔编码耗时不低于平均值的选区各降一级；
+  负载连续 RECOVER_WINDOWS 个间隔低于 LOW_WATERMARK 时，降级最多的选区恢复一级（每次只恢复一个，避免来回振荡）
+- 每个选区的级别从高质量到低开销依次为：首选格式为PNG时压缩级别从上限逐级降到下限 -> 依次换用后面的格式 ->
+  缩小倍数逐级翻倍到上限。负载低时文件最小，负载高时先降低压缩级别，再换用编码更快的格式，最后缩小图片
+只调节保存为文件的截图（storage_mode 为 png），连拍帧和差分存储不受影响
+"""
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+from backend.models import AdaptiveEncodingConfig, AppConfig, EncodingBounds, Region
+from backend.services.encoder_service import IMAGE_FORMATS
+
+# PNG压缩级别的调节档位（与上下限合并后使用）
+LEVEL_STEPS = (9, 6, 3, 1)
+# 负载低于该值视为空闲
+LOW_WATERMARK = 0.6
+# 连续空闲该数量的间隔后恢复一级
+RECOVER_WINDOWS = 3
+
+
+class EncodingSetting(NamedTuple):
+    """选区当前的编码参数"""
+    image_format: str  # png / jpeg / webp
+    compress_level: int  # PNG压缩级别
+    quality: int  # jpeg / webp 质量
+    downscale: int  # 缩小倍数（1表示不缩小）
+
+
+def validate_bounds(bounds: EncodingBounds) -> Optional[str]:
+    """检查调节范围，返回错误信息（合法时返回None）"""
+    if not 0 <= bounds.min_compress_level <= bounds.max_compress_level <= 9:
+        return "压缩级别范围必须满足 0 <= min_compress_level <= max_compress_level <= 9"
+    if not bounds.formats:
+        return "formats 不能为空"
+    for image_format in bounds.formats:
+        if image_format not in IMAGE_FORMATS:
+            return f"格式必须是 {' / '.join(IMAGE_FORMATS)}"
+    if len(set(bounds.formats)) != len(bounds.formats):
+        return "formats 不能重复"
+    if bounds.max_downscale < 1:
+        return "max_downscale 必须大于等于1"
+    return None
+
+
+def validate_adaptive(config: AdaptiveEncodingConfig) -> Optional[str]:
+    """检查自适应编码配置，返回错误信息（合法时返回None）"""
+    if config.target_fps < 0 or config.max_queue < 0:
+        return "target_fps 和 max_queue 不能为负数"
+    if not 0 <= config.cpu_budget <= 100:
+        return "cpu_budget 必须在 0 到 100 之间"
+    if config.interval_ms < 100:
+        return "interval_ms 不能小于100"
+    if not 1 <= config.jpeg_quality <= 95 or not 1 <= config.webp_quality <= 100:
+        return "jpeg_quality 必须在 1 到 95 之间，webp_quality 必须在 1 到 100 之间"
+    return validate_bounds(config.bounds)
+
+
+def build_ladder(bounds: EncodingBounds, config: AdaptiveEncodingConfig) -> List[EncodingSetting]:
+    """按调节范围生成从高质量到低开销的级别列表"""
+    low, high = bounds.min_compress_level, bounds.max_compress_level
+    quality = {"png": 0, "jpeg": config.jpeg_quality, "webp": config.webp_quality}
+    ladder = []
+    for i, image_format in enumerate(bounds.formats):
+        if image_format == "png" and i == 0:
+            levels = sorted({low, high} | {level for level in LEVEL_STEPS if low <= level <= high}, reverse=True)
+        else:
+            levels = [low]
+        ladder.extend(EncodingSetting(image_format, level, quality[image_format], 1) for level in levels)
+    # 缩小倍数逐级翻倍，最后一级为上限
+    factor = 2
+    while factor < bounds.max_downscale:
+        ladder.append(ladder[-1]._replace(downscale=factor))
+        factor *= 2
+    if bounds.max_downscale > 1:
+        ladder.append(ladder[-1]._replace(downscale=bounds.max_downscale))
+    return ladder
+
+
+def _initial_step(ladder: List[EncodingSetting], compress_level: int) -> int:
+    """初始级别：首选PNG时从不高于配置压缩级别（png_compress_level）的第一级开始，与未开启时的输出一致"""
+    for step, setting in enumerate(ladder):
+        if setting.image_format != "png" or setting.compress_level <= compress_level:
+            return step
+    return len(ladder) - 1
+
+
+class _RegionState:
+    """选区的调节状态"""
+
+    def __init__(self, name: str, bounds: EncodingBounds, ladder: List[EncodingSetting], step: int):
+        self.name = name
+        self.bounds = bounds
+        self.ladder = ladder
+        self.step = step
+        self.frames = 0  # 本间隔保存的帧数
+        self.encode_seconds = 0.0  # 本间隔的编码耗时（process模式含等待编码进程的时间）
+        self.last_frames = 0
+        self.last_encode_ms = None  # 上一个间隔的平均每帧编码耗时
+        self.changes = 0
+
+    @property
+    def setting(self) -> EncodingSetting:
+        return self.ladder[self.step]
+
+
+class AdaptiveEncoderService:
+    """自适应编码单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AdaptiveEncoderService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._lock = threading.Lock()
+        self._settings: Optional[AdaptiveEncodingConfig] = None  # 当前状态对应的自适应编码配置
+        self._regions: Dict[str, _RegionState] = {}
+        self.adjustments = 0
+        self.last: Optional[dict] = None  # 上一次调节的指标和结果
+        self._calm = 0  # 连续空闲的间隔数
+        self._reset_window()
+
+    def _reset_window(self):
+        from backend.services.resource_service import cpu_seconds
+        self._window_start = time.monotonic()
+        self._cpu_start = cpu_seconds()
+        self._frames = 0
+        self._save_seconds = 0.0
+        self._max_pending = 0
+
+    @staticmethod
+    def active(config: AppConfig) -> bool:
+        """是否对保存的截图启用自适应编码"""
+        return config.adaptive_encoding.enabled and config.save_files and config.storage_mode != "delta"
+
+    def _sync(self, config: AppConfig):
+        """自适应编码配置变化时丢弃全部状态（需持有锁）"""
+        if self._settings != config.adaptive_encoding:
+            self._settings = config.adaptive_encoding
+            self._regions.clear()
+            self._reset_window()
+            self._calm = 0
+
+    def setting_for(self, region: Region, config: AppConfig) -> EncodingSetting:
+        """选区当前的编码参数（调节范围变化时重新开始）"""
+        bounds = region.encoding or config.adaptive_encoding.bounds
+        with self._lock:
+            self._sync(config)
+            state = self._regions.get(region.id)
+            if state is None or state.bounds != bounds:
+                ladder = build_ladder(bounds, config.adaptive_encoding)
+                state = _RegionState(region.name, bounds, ladder, _initial_step(ladder, config.png_compress_level))
+                if region.id is not None:
+                    self._regions[region.id] = state
+            state.name = region.name
+            return state.setting
+
+    def record_encode(self, region_id: str, seconds: float):
+        """记录一帧的编码耗时"""
+        with self._lock:
+            state = self._regions.get(region_id)
+            if state is not None:
+                state.frames += 1
+                state.encode_seconds += seconds
+
+    def record_frame(self, seconds: float, pending: int):
+        """记录一次保存（全部选区）的耗时和提交后等待编码的截图数，到达调节间隔时调节"""
+        with self._lock:
+            self._frames += 1
+            self._save_seconds += seconds
+            self._max_pending = max(self._max_pending, pending)
+            if self._settings is not None and \
+                    time.monotonic() - self._window_start >= self._settings.interval_ms / 1000:
+                self._evaluate()
+
+    def _evaluate(self):
+        """统计本间隔的指标，按负载调节各选区的级别（需持有锁）"""
+        from backend.services.encoder_service import EncoderService
+        from backend.services.region_service import RegionService
+        from backend.services.resource_service import cpu_seconds
+        settings = self._settings
+        elapsed = time.monotonic() - self._window_start
+        cpu_percent = (cpu_seconds() - self._cpu_start) / max(elapsed, 1e-6) / (os.cpu_count() or 1) * 100
+        frame_ms = self._save_seconds / self._frames * 1000 if self._frames else None
+
+        signals = {}
+        if settings.target_fps > 0 and frame_ms is not None:
+            signals["fps"] = frame_ms / 1000 * settings.target_fps
+        if settings.cpu_budget > 0:
+            signals["cpu"] = cpu_percent / settings.cpu_budget
+        queue_limit = settings.max_queue or EncoderService().capacity
+        if queue_limit:
+            signals["queue"] = self._max_pending / queue_limit
+        load = max(signals.values()) if signals else None
+
+        # 已删除的选区不再保留状态
+        region_ids = {region.id for region in RegionService().get_all_regions()}
+        for region_id in [region_id for region_id in self._regions if region_id not in region_ids]:
+            del self._regions[region_id]
+        states = list(self._regions.values())
+
+        action, changed = "hold", []
+        if load is not None and load > 1:
+            self._calm = 0
+            candidates = [state for state in states if state.frames and state.step < len(state.ladder) - 1]
+            if candidates:
+                mean_cost = sum(state.encode_seconds for state in candidates) / len(candidates)
+                changed = [state for state in candidates if state.encode_seconds >= mean_cost]
+                for state in changed:
+                    state.step += 1
+                action = "degrade"
+        elif load is not None and load < LOW_WATERMARK:
+            self._calm += 1
+            candidates = [state for state in states if state.step > 0]
+            if self._calm >= RECOVER_WINDOWS and candidates:
+                state = max(candidates, key=lambda s: (s.step, -s.encode_seconds))
+                state.step -= 1
+                changed = [state]
+                action = "recover"
+                self._calm = 0
+        else:
+            self._calm = 0
+
+        for state in states:
+            state.last_frames = state.frames
+            state.last_encode_ms = round(state.encode_seconds / state.frames * 1000, 3) if state.frames else None
+            state.frames = 0
+            state.encode_seconds = 0.0
+        for state in changed:
+            state.changes += 1
+        self.adjustments += len(changed)
+        self.last = {
+            "time": time.time(),
+            "load": None if load is None else round(load, 3),
+            "signals": {name: round(value, 3) for name, value in signals.items()},
+            "frame_ms": None if frame_ms is None else round(frame_ms, 3),
+            "fps": round(self._frames / elapsed, 2),
+            "cpu_percent": round(cpu_percent, 1),
+            "max_pending": self._max_pending,
+            "action": action,
+            "changed": [state.name for state in changed]
+        }
+        if changed:
+            print(f"[自适应编码] 负载 {load:.2f}，{'降级' if action == 'degrade' else '恢复'}: " + "，".join(
+                f"{state.name} -> {self._describe(state.setting)}" for state in changed))
+        self._reset_window()
+
+    @staticmethod
+    def _describe(setting: EncodingSetting) -> str:
+        text = f"png/{setting.compress_level}" if setting.image_format == "png" else \
+            f"{setting.image_format}/q{setting.quality}"
+        return text if setting.downscale == 1 else f"{text} 1/{setting.downscale}"
+
+    def get_stats(self) -> dict:
+        """自适应编码状态：上一次调节的指标和结果，各选区当前的编码参数"""
+        with self._lock:
+            return {
+                "enabled": bool(self._settings and self._settings.enabled),
+                "adjustments": self.adjustments,
+                "last": self.last,
+                "regions": [
+                    {
+                        "region_id": region_id,
+                        "region_name": state.name,
+                        "step": state.step,
+                        "steps": len(state.ladder),
+                        **state.setting._asdict(),
+                        "frames": state.last_frames,
+                        "encode_ms": state.last_encode_ms,
+                        "changes": state.changes
+                    }
+                    for region_id, state in self._regions.items()
+                ]
+            }
@@ -0,0 +1,320 @@
+"""
+代理服务：把本机截图服务注册到中心协调器
+- 与协调器保持一个TCP长连接（每行一个JSON消息），断开后按指数退避重连
+- 接收协调器下发的选区/配置
+- 截图记录（可选附带截图文件内容）按批上报，协调器确认前保留，重连后重发
+- 定期上报健康状态
+
+消息格式（type字段区分）:
+    代理 -> 协调器: register / batch / health
+    协调器 -> 代理: registered / ack / push_regions / push_config
+"""
+import base64
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+from backend.services.config_service import ConfigService
+
+# 健康状态上报间隔（秒）
+HEALTH_INTERVAL = 5
+# 重连的最长等待时间（秒）
+MAX_BACKOFF = 30
+
+# 不允许协调器下发修改的配置（代理身份和连接相关）
+LOCAL_ONLY_CONFIG = {"agent_enabled", "agent_name", "coordinator_address", "capture_backend"}
+
+
+def default_agent_name() -> str:
+    """默认代理名称：主机名加工作目录的校验值（同一台机器上不同目录的代理名称不同）"""
+    return f"{socket.gethostname()}-{zlib.crc32(os.getcwd().encode('utf-8')) & 0xFFFF:04x}"
+
+
+class AgentService:
+    """代理服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AgentService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue: Deque[dict] = deque()  # 待上报的截图记录
+        self._pending: Dict[int, List[dict]] = {}  # 已发送未确认的批次 seq -> 记录
+        self._seq = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self.connected = False
+        self.stats = {"connects": 0, "batches_sent": 0, "records_sent": 0, "records_dropped": 0,
+                      "frames_sent": 0, "pushes_received": 0, "last_error": None}
+
+    @property
+    def agent_id(self) -> str:
+        return self.config_service.get_config().agent_name or default_agent_name()
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动代理（注册截图监听器并连接协调器）"""
+        if self._running:
+            return
+        from backend.services.screenshot_service import ScreenshotService
+        ScreenshotService().add_capture_listener(self.enqueue)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"[代理] 已启动: {self.agent_id} -> {self.config_service.get_config().coordinator_address}")
+
+    def stop(self):
+        """停止代理"""
+        from backend.services.screenshot_service import ScreenshotService
+        ScreenshotService().remove_capture_listener(self.enqueue)
+        with self._lock:
+            self._running = False
+            self._wakeup.notify_all()
+        self._disconnect()
+
+    def get_status(self) -> dict:
+        """代理状态"""
+        with self._lock:
+            return {
+                "agent_id": self.agent_id,
+                "coordinator": self.config_service.get_config().coordinator_address,
+                "connected": self.connected,
+                "queued": len(self._queue),
+                "unacked_batches": len(self._pending),
+                **self.stats
+            }
+
+    # ---------- 截图记录 ----------
+
+    def enqueue(self, records: List[dict]):
+        """截图监听器：记录加入上报队列（超出上限时丢弃最旧的记录）"""
+        config = self.config_service.get_config()
+        with self._lock:
+            self._queue.extend(records)
+            overflow = len(self._queue) - config.agent_queue_max
+            for _ in range(max(overflow, 0)):
+                self._queue.popleft()
+                self.stats["records_dropped"] += 1
+            if len(self._queue) >= config.agent_batch_size:
+                self._wakeup.notify_all()
+
+    def _build_record(self, record: dict, send_frames: bool) -> dict:
+        """补充文件大小，需要时附带截图文件内容"""
+        from backend.services.delta_store import is_frame_ref, read_frame_png
+        record = dict(record)
+        try:
+            if is_frame_ref(record["file_path"]):
+                # 差分存储的帧：还原为PNG上传
+                if send_frames:
+                    record["frame_b64"] = base64.b64encode(read_frame_png(record["file_path"])).decode("ascii")
+                return record
+            path = Path(record["file_path"])
+            record["size"] = path.stat().st_size
+            if send_frames:
+                record["frame_b64"] = base64.b64encode(path.read_bytes()).decode("ascii")
+        except (OSError, ValueError) as e:
+            print(f"[代理] ⚠ 读取截图文件失败: {e}")
+        return record
+
+    # ---------- 连接 ----------
+
+    def _send(self, message: dict):
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._send_lock:
+            if self._sock is None:
+                raise ConnectionError("未连接到协调器")
+            self._sock.sendall(data)
+
+    def _disconnect(self):
+        with self._send_lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.connected = False
+
+    def _connect(self) -> socket.socket:
+        host, _, port = self.config_service.get_config().coordinator_address.rpartition(":")
+        sock = socket.create_connection((host or "127.0.0.1", int(port)), timeout=10)
+        sock.settimeout(None)
+        with self._send_lock:
+            self._sock = sock
+        self._send({
+            "type": "register",
+            "agent_id": self.agent_id,
+            "hostname": socket.gethostname(),
+            "pid": os.getpid(),
+            "regions": self._region_payload(),
+            "config": self._config_payload()
+        })
+        return sock
+
+    def _run(self):
+        """连接循环：断开后按指数退避重连"""
+        backoff = 1
+        while self._running:
+            try:
+                sock = self._connect()
+            except OSError as e:
+                self.stats["last_error"] = str(e)
+                print(f"[代理] ✗ 连接协调器失败: {e}，{backoff}s 后重试")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = 1
+            self.connected = True
+            self.stats["connects"] += 1
+            print(f"[代理] ✓ 已连接协调器: {self.config_service.get_config().coordinator_address}")
+            reader = threading.Thread(target=self._read_loop, args=(sock,), daemon=True)
+            reader.start()
+            try:
+                self._send_loop()
+            except OSError as e:
+                self.stats["last_error"] = str(e)
+                print(f"[代理] ✗ 与协调器的连接中断: {e}")
+            self._disconnect()
+            # 未确认的批次放回队列头部，重连后重发
+            with self._lock:
+                for seq in sorted(self._pending, reverse=True):
+                    self._queue.extendleft(reversed(self._pending[seq]))
+                self._pending.clear()
+
+    def _send_loop(self):
+        """按批上报截图记录，定期上报健康状态"""
+        # 连接后立即上报一次健康状态
+        last_flush = time.monotonic()
+        last_health = last_flush - HEALTH_INTERVAL
+        while self._running and self.connected:
+            config = self.config_service.get_config()
+            with self._lock:
+                if len(self._queue) < config.agent_batch_size:
+                    self._wakeup.wait(timeout=0.5)
+                now = time.monotonic()
+                due = self._queue and (len(self._queue) >= config.agent_batch_size
+                                       or now - last_flush >= config.agent_flush_interval)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), config.agent_batch_size))] if due else []
+                if batch:
+                    self._seq += 1
+                    seq = self._seq
+                    self._pending[seq] = batch
+
+            if batch:
+                records = [self._build_record(r, config.agent_send_frames) for r in batch]
+                self._send({"type": "batch", "seq": seq, "captures": records})
+                self.stats["batches_sent"] += 1
+                self.stats["records_sent"] += len(records)
+                self.stats["frames_sent"] += sum(1 for r in records if "frame_b64" in r)
+                last_flush = now
+            if now - last_health >= HEALTH_INTERVAL:
+                self._send({"type": "health", "health": self._health_payload()})
+                last_health = now
+
+    def _read_loop(self, sock: socket.socket):
+        """接收协调器消息（单条消息无法解析或应用时跳过该消息，不断开连接）"""
+        try:
+            for line in sock.makefile("rb"):
+                if not line.strip():
+                    continue
+                try:
+                    self._handle(json.loads(line))
+                except Exception as e:
+                    self.stats["last_error"] = str(e)
+                    print(f"[代理] ✗ 处理协调器消息失败: {e}")
+        except OSError as e:
+            self.stats["last_error"] = str(e)
+        finally:
+            self.connected = False
+            with self._lock:
+                self._wakeup.notify_all()
+
+    def _handle(self, message: dict):
+        """处理协调器下发的消息"""
+        kind = message.get("type")
+        if kind == "ack":
+            with self._lock:
+                self._pending.pop(message.get("seq"), None)
+        elif kind == "push_regions":
+            self.stats["pushes_received"] += 1
+            self._apply_regions(message.get("regions") or [])
+        elif kind == "push_config":
+            self.stats["pushes_received"] += 1
+            self._apply_config(message.get("config") or {})
+        elif kind == "registered":
+            print(f"[代理] 协调器已确认注册: {message.get('agent_id')}")
+
+    # ---------- 下发 ----------
+
+    def _apply_regions(self, regions: List[dict]):
+        """应用协调器下发的选区（替换全部选区）"""
+        from backend.models import Region
+        from backend.services.region_service import RegionService
+        region_service = RegionService()
+        region_service.replace_regions([Region(**item) for item in regions])
+        print(f"[代理] 已应用下发的选区: {len(regions)} 个")
+        self._reload_hotkeys()
+
+    def _apply_config(self, config: dict):
+        """应用协调器下发的配置（代理身份和连接相关的配置除外），与当前配置合并后校验，不合法时不应用"""
+        from pydantic import ValidationError
+        from backend.models import AppConfig
+        from backend.services.config_service import validate_app_config
+        updates = {k: v for k, v in config.items() if k not in LOCAL_ONLY_CONFIG}
+        if updates:
+            current = self.config_service.get_config()
+            current = current.dict() if hasattr(current, 'dict') else current.model_dump()
+            try:
+                error = validate_app_config(AppConfig(**{**current, **updates}))
+            except ValidationError as e:
+                error = str(e)
+            if error:
+                print(f"[代理] ✗ 下发的配置无效，未应用: {error}")
+                return
+            self.config_service.update_config(**updates)
+            print(f"[代理] 已应用下发的配置: {', '.join(sorted(updates))}")
+            self._reload_hotkeys()
+
+    def _reload_hotkeys(self):
+        """引擎已注册热键时，按新的选区/配置重新注册"""
+        from backend.services.capture_engine import CaptureEngine
+        engine = CaptureEngine()
+        if engine.components.get("hotkeys") == "ok":
+            engine.reload_hotkeys()
+
+    # ---------- 上报内容 ----------
+
+    def _region_payload(self) -> List[dict]:
+        from backend.services.region_service import RegionService
+        return [region.to_dict() for region in RegionService().get_all_regions()]
+
+    def _config_payload(self) -> dict:
+        config = self.config_service.get_config()
+        return config.dict() if hasattr(config, 'dict') else config.model_dump()
+
+    def _health_payload(self) -> dict:
+        from backend.services.capture_engine import CaptureEngine
+        health = CaptureEngine().get_status()
+        health["agent"] = self.get_status()
+        health["reported_at"] = datetime.now().isoformat()
+        return health
@@ -0,0 +1,348 @@
+"""
+选区锚点服务：选区可以关联一个参考图（锚点模板），截图前先在屏幕上定位模板，按模板的位移平移选区，
+使选区跟随移动的窗口
+- 先在上次位置附近 ±LOCAL_RADIUS 像素内匹配（所有锚点按显示器合并为一次截取）
+- 未找到时在上次位置周围 search_margin 像素内做由粗到细的金字塔搜索，仍未找到时搜索模板所在的整个显示器
+- 匹配使用零均值归一化互相关（NCC），窗口方差用积分图计算，全部由NumPy向量化完成
+- 同一选区在 anchor_recheck_ms 内只定位一次；锚点丢失后每 LOST_SEARCH_INTERVAL 秒才重新大范围搜索
+- 位移变化时 version 递增（截图计划据此重新编译）
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from backend.models import Region
+from backend.services.config_service import ConfigService
+from backend.services.monitor_service import MonitorService
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 锚点模板保存目录
+ANCHORS_DIR = "anchors"
+# 在上次位置附近的快速匹配半径（像素）
+LOCAL_RADIUS = 2
+# 金字塔最粗一层模板的最短边（像素）与最大层数
+MIN_PYRAMID_SIDE = 8
+MAX_PYRAMID_LEVELS = 4
+# 金字塔最粗一层保留的候选位置数
+COARSE_CANDIDATES = 3
+# 锚点丢失后，大范围搜索的最短间隔（秒），期间只在上次位置附近匹配
+LOST_SEARCH_INTERVAL = 1.0
+
+
+def to_gray(img) -> 'np.ndarray':
+    """PIL图片转换为 float32 灰度数组"""
+    import numpy as np
+    return np.asarray(img.convert("L"), dtype=np.float32)
+
+
+def _downsample(image: 'np.ndarray') -> 'np.ndarray':
+    """2x2 平均降采样"""
+    h, w = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    return image[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+
+def _window_sums(image: 'np.ndarray', th: int, tw: int) -> 'np.ndarray':
+    """积分图计算每个 th x tw 窗口的和"""
+    import numpy as np
+    integral = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(image, axis=0), axis=1, out=integral[1:, 1:])
+    return integral[th:, tw:] - integral[:-th, tw:] - integral[th:, :-tw] + integral[:-th, :-tw]
+
+
+def match_template(image: 'np.ndarray', template: 'np.ndarray') -> 'np.ndarray':
+    """零均值归一化互相关，返回每个位置的得分（-1 到 1），图片比模板小时返回空数组"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    th, tw = template.shape
+    if image.shape[0] < th or image.shape[1] < tw:
+        return np.empty((0, 0), dtype=np.float32)
+    centered = template - template.mean()
+    template_norm = float(np.sqrt((centered ** 2).sum()))
+    numerator = np.einsum("ijkl,kl->ij", sliding_window_view(image, (th, tw)), centered, optimize=True)
+    sums = _window_sums(image, th, tw)
+    variance = _window_sums(image * image, th, tw) - sums * sums / (th * tw)
+    denominator = np.sqrt(np.maximum(variance, 0)) * template_norm
+    return np.where(denominator > 1e-6, numerator / np.maximum(denominator, 1e-6), 0).astype(np.float32)
+
+
+def build_pyramid(image: 'np.ndarray', levels: int) -> List['np.ndarray']:
+    pyramid = [image]
+    for _ in range(levels - 1):
+        pyramid.append(_downsample(pyramid[-1]))
+    return pyramid
+
+
+def pyramid_levels(template: 'np.ndarray') -> int:
+    """模板最短边在最粗一层不小于 MIN_PYRAMID_SIDE 的层数"""
+    levels, side = 1, min(template.shape)
+    while levels < MAX_PYRAMID_LEVELS and side // 2 >= MIN_PYRAMID_SIDE:
+        levels, side = levels + 1, side // 2
+    return levels
+
+
+def _refine(image: 'np.ndarray', template: 'np.ndarray', x: int, y: int, radius: int) -> Tuple[int, int, float]:
+    """在 (x, y) 附近 ±radius 内精确匹配，返回 (x, y, 得分)"""
+    import numpy as np
+    th, tw = template.shape
+    left, top = max(x - radius, 0), max(y - radius, 0)
+    right = min(x + radius + tw, image.shape[1])
+    bottom = min(y + radius + th, image.shape[0])
+    scores = match_template(image[top:bottom, left:right], template)
+    if scores.size == 0:
+        return x, y, -1.0
+    row, col = np.unravel_index(int(scores.argmax()), scores.shape)
+    return left + int(col), top + int(row), float(scores[row, col])
+
+
+def pyramid_search(image: 'np.ndarray', template_pyramid: List['np.ndarray']) -> Tuple[int, int, float]:
+    """由粗到细的金字塔搜索：最粗一层全图匹配取若干候选，逐层放大后在 ±2 像素内细化，返回 (x, y, 得分)"""
+    import numpy as np
+    levels = len(template_pyramid)
+    image_pyramid = build_pyramid(image, levels)
+    scores = match_template(image_pyramid[-1], template_pyramid[-1])
+    if scores.size == 0:
+        return 0, 0, -1.0
+    flat = scores.ravel()
+    count = min(COARSE_CANDIDATES, flat.size)
+    candidates = np.argpartition(flat, -count)[-count:]
+    best = (0, 0, -1.0)
+    for index in candidates:
+        y, x = np.unravel_index(int(index), scores.shape)
+        x, y, score = int(x), int(y), float(flat[index])
+        for level in range(levels - 2, -1, -1):
+            x, y, score = _refine(image_pyramid[level], template_pyramid[level], x * 2, y * 2, 2)
+        if score > best[2]:
+            best = (x, y, score)
+    return best
+
+
+class _Template:
+    """已载入的锚点模板及其金字塔"""
+
+    def __init__(self, path: str):
+        from PIL import Image
+        with Image.open(path) as img:
+            gray = to_gray(img)
+        self.signature = Path(path).stat().st_mtime_ns
+        self.height, self.width = gray.shape
+        self.pyramid = build_pyramid(gray, pyramid_levels(gray))
+
+
+class AnchorService:
+    """选区锚点服务单例"""
+    _instance = None
+    _initialized = False
+    # 任一选区位移变化时递增
+    version = 0
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AnchorService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self.monitor_service = MonitorService()
+        self._lock = threading.Lock()
+        self._templates: Dict[str, _Template] = {}
+        # 选区ID -> 定位状态（位移、得分、方式等）
+        self._states: Dict[str, dict] = {}
+
+    # ---------- 模板 ----------
+
+    def _template(self, path: str) -> _Template:
+        cached = self._templates.get(path)
+        if cached is None or cached.signature != Path(path).stat().st_mtime_ns:
+            cached = self._templates[path] = _Template(path)
+        return cached
+
+    def template_path(self, region_id: str) -> Path:
+        return Path(ANCHORS_DIR) / f"{region_id}.png"
+
+    @staticmethod
+    def grab_logical(screenshot_service, left: int, top: int, width: int, height: int):
+        """
+        截取屏幕矩形并缩放到逻辑尺寸（width x height）
+        HiDPI显示器上截图的像素尺寸是逻辑尺寸的倍数，锚点模板、搜索区域和匹配结果统一使用逻辑坐标
+        """
+        img = screenshot_service._grab(left, top, width, height)
+        if img.size != (width, height):
+            from PIL import Image
+            img = img.resize((width, height), Image.Resampling.BOX)
+        return img
+
+    def validate_template(self, img) -> Optional[str]:
+        """检查模板能否用于匹配，不能时返回原因"""
+        gray = to_gray(img)
+        if min(gray.shape) < 4:
+            return "锚点模板太小（至少 4x4 像素）"
+        if float(gray.std()) < 2:
+            return "锚点模板没有足够的纹理（颜色几乎一致）"
+        return None
+
+    def reset(self, region_id: str):
+        """清除选区的定位状态（锚点变化或删除时调用）"""
+        with self._lock:
+            if self._states.pop(region_id, None) is not None:
+                AnchorService.version += 1
+
+    # ---------- 定位 ----------
+
+    def resolve(self, regions: List[Region]) -> List[Region]:
+        """返回按锚点位移平移后的选区（没有锚点的选区原样返回）"""
+        anchored = [r for r in regions if r.anchor is not None and r.id]
+        if not anchored:
+            return regions
+        self._locate_due(anchored)
+        resolved = []
+        for region in regions:
+            state = self._states.get(region.id) if region.anchor is not None and region.id else None
+            if state is None or (state["dx"] == 0 and state["dy"] == 0):
+                resolved.append(region)
+                continue
+            data = region.to_dict()
+            data.update(x1=region.x1 + state["dx"], y1=region.y1 + state["dy"],
+                        x2=region.x2 + state["dx"], y2=region.y2 + state["dy"])
+            resolved.append(Region(**data))
+        return resolved
+
+    def _locate_due(self, regions: List[Region]):
+        """定位 anchor_recheck_ms 内未定位过的锚点"""
+        from backend.services.screenshot_service import ScreenshotService
+        interval = self.config_service.get_config().anchor_recheck_ms / 1000
+        now = time.monotonic()
+        with self._lock:
+            due = [r for r in regions if now - self._states.get(r.id, {}).get("checked", -1e9) >= interval]
+            if not due:
+                return
+            screenshot_service = ScreenshotService()
+            templates = []
+            for region in due:
+                try:
+                    templates.append(self._template(region.anchor.template))
+                except (OSError, ValueError) as e:
+                    print(f"[锚点] ✗ 载入锚点模板失败: {region.name} - {e}")
+                    templates.append(None)
+
+            # 1. 上次位置附近：全部锚点按显示器合并截取
+            local = []
+            for region, template in zip(due, templates):
+                if template is None:
+                    continue
+                state = self._states.get(region.id, {"dx": 0, "dy": 0})
+                x, y = region.anchor.x + state["dx"], region.anchor.y + state["dy"]
+                local.append((region, template, (x - LOCAL_RADIUS, y - LOCAL_RADIUS,
+                                                 x + template.width + LOCAL_RADIUS, y + template.height + LOCAL_RADIUS)))
+            areas = self._grab_areas(screenshot_service, [rect for _, _, rect in local])
+            for (region, template, rect), area in zip(local, areas):
+                start = time.perf_counter()
+                found = None
+                if area is not None:
+                    x, y, score = _refine(area, template.pyramid[0], LOCAL_RADIUS, LOCAL_RADIUS, LOCAL_RADIUS)
+                    # 最佳位置在窗口边界上时锚点可能移出了窗口（边界处只是部分重合），按未命中处理，进入大范围搜索
+                    inside = 0 < x < 2 * LOCAL_RADIUS and 0 < y < 2 * LOCAL_RADIUS
+                    if inside and score >= region.anchor.threshold:
+                        found = (rect[0] + x, rect[1] + y, score, "local")
+                # 2. 上次位置周围 search_margin 内，3. 模板所在的整个显示器
+                state = self._states.get(region.id, {})
+                searched = state.get("searched", -1e9)
+                if found is None and (state.get("status") != "lost" or now - searched >= LOST_SEARCH_INTERVAL):
+                    found = self._search(screenshot_service, region, template, rect)
+                    searched = now
+                self._update(region, found, (time.perf_counter() - start) * 1000, searched)
+
+    def _search(self, screenshot_service, region: Region, template: _Template,
+                local_rect: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, float, str]]:
+        margin = region.anchor.search_margin
+        x, y = local_rect[0] + LOCAL_RADIUS, local_rect[1] + LOCAL_RADIUS
+        searches = [((x - margin, y - margin, x + template.width + margin, y + template.height + margin), "neighbourhood")]
+        monitor_index, _ = self.monitor_service.locate(
+            region.anchor.x, region.anchor.y, region.anchor.x + template.width, region.anchor.y + template.height)
+        monitor = self.monitor_service.get_monitor(monitor_index or 1)
+        if monitor is not None:
+            searches.append(((monitor["left"], monitor["top"], monitor["left"] + monitor["width"],
+                              monitor["top"] + monitor["height"]), "monitor"))
+        for rect, method in searches:
+            rect = self._clip(rect)
+            if rect is None:
+                continue
+            area = self._grab_areas(screenshot_service, [rect])[0]
+            if area is None:
+                continue
+            ax, ay, score = pyramid_search(area, template.pyramid)
+            if score >= region.anchor.threshold:
+                return rect[0] + ax, rect[1] + ay, score, method
+        return None
+
+    def _update(self, region: Region, found: Optional[Tuple[int, int, float, str]], elapsed_ms: float,
+                searched: float):
+        previous = self._states.get(region.id, {"dx": 0, "dy": 0})
+        state = {"dx": previous["dx"], "dy": previous["dy"], "checked": time.monotonic(), "searched": searched,
+                 "located_ms": round(elapsed_ms, 3)}
+        if found is None:
+            state.update(status="lost", score=None, method=None)
+            if previous.get("status") != "lost":
+                print(f"[锚点] ⚠ 未找到锚点: {region.name}，沿用上次位置")
+        else:
+            x, y, score, method = found
+            state.update(status="tracking", score=round(score, 4), method=method,
+                         dx=x - region.anchor.x, dy=y - region.anchor.y)
+            if (state["dx"], state["dy"]) != (previous["dx"], previous["dy"]):
+                AnchorService.version += 1
+                print(f"[锚点] 选区 {region.name} 跟随锚点移动: ({state['dx']}, {state['dy']})")
+        self._states[region.id] = state
+
+    def _clip(self, rect: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """裁剪到虚拟屏幕范围内"""
+        screen = self.monitor_service.get_monitor(0)
+        if screen is None:
+            return rect
+        x1, y1 = max(rect[0], screen["left"]), max(rect[1], screen["top"])
+        x2 = min(rect[2], screen["left"] + screen["width"])
+        y2 = min(rect[3], screen["top"] + screen["height"])
+        return (x1, y1, x2, y2) if x2 > x1 and y2 > y1 else None
+
+    def _grab_areas(self, screenshot_service, rects: List[Tuple[int, int, int, int]]) -> List[Optional['np.ndarray']]:
+        """截取多个矩形的灰度图：同一显示器上的矩形合并为一次截取（外接矩形）"""
+        import numpy as np
+        results: List[Optional[np.ndarray]] = [None] * len(rects)
+        buckets: Dict[object, List[int]] = {}
+        for i, rect in enumerate(rects):
+            clipped = self._clip(rect)
+            if clipped is None:
+                continue
+            monitor, spans = self.monitor_service.locate(*clipped)
+            buckets.setdefault(("single", i) if spans or not monitor else monitor, []).append(i)
+        for members in buckets.values():
+            clipped = [self._clip(rects[i]) for i in members]
+            left, top = min(r[0] for r in clipped), min(r[1] for r in clipped)
+            right, bottom = max(r[2] for r in clipped), max(r[3] for r in clipped)
+            try:
+                gray = to_gray(self.grab_logical(screenshot_service, left, top, right - left, bottom - top))
+            except Exception as e:
+                print(f"[锚点] ✗ 截取锚点区域失败: {e}")
+                continue
+            for i, (x1, y1, x2, y2) in zip(members, clipped):
+                # 被屏幕边缘裁剪的部分补边（保持与请求的矩形一致的坐标）
+                area = gray[y1 - top:y2 - top, x1 - left:x2 - left]
+                pad = ((y1 - rects[i][1], rects[i][3] - y2), (x1 - rects[i][0], rects[i][2] - x2))
+                results[i] = np.pad(area, pad, mode="edge") if any(sum(p) for p in pad) else area
+        return results
+
+    def get_status(self, region_id: Optional[str] = None):
+        """定位状态（指定选区时返回该选区的状态，未定位过为None）"""
+        with self._lock:
+            if region_id is not None:
+                state = self._states.get(region_id)
+                return None if state is None else self._public_state(state)
+            return {rid: self._public_state(state) for rid, state in self._states.items()}
+
+    @staticmethod
+    def _public_state(state: dict) -> dict:
+        return {k: v for k, v in state.items() if k not in ("checked", "searched")}
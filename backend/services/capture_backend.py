@@ -0,0 +1,88 @@
+"""
+截图后端：
+- mss：截取真实屏幕（默认）
+- synthetic：合成画面，不依赖显示器，用于在一台机器上测试多个代理或无显示器环境
+两者接口一致：monitors（mss格式的显示器列表）、grab(monitor)（返回带 raw/bgra/size 的截图）
+"""
+import threading
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+# 合成后端的显示器布局：两个并排的1920x1080显示器
+SYNTHETIC_MONITORS = [
+    {"left": 0, "top": 0, "width": 3840, "height": 1080},
+    {"left": 0, "top": 0, "width": 1920, "height": 1080},
+    {"left": 1920, "top": 0, "width": 1920, "height": 1080},
+]
+
+
+class SyntheticShot:
+    """合成截图（与mss的ScreenShot接口一致）"""
+
+    def __init__(self, raw: bytearray, width: int, height: int):
+        self.raw = raw
+        self.size = (width, height)
+
+    @property
+    def bgra(self) -> bytes:
+        return bytes(self.raw)
+
+
+class SyntheticCapture:
+    """
+    合成截图后端：背景为按坐标生成的固定图案，叠加一个随帧计数移动的方块，
+    同一区域的连续截图内容会变化；seed不同的实例图案不同
+    """
+    _counter_lock = threading.Lock()
+    _frame = 0  # 所有实例共享的帧计数
+
+    def __init__(self, seed: str = ""):
+        self.seed = zlib.crc32(seed.encode("utf-8")) & 0xFF
+        self.monitors = [dict(m) for m in SYNTHETIC_MONITORS]
+
+    def grab(self, monitor: Dict[str, int]) -> SyntheticShot:
+        with SyntheticCapture._counter_lock:
+            SyntheticCapture._frame += 1
+            frame = SyntheticCapture._frame
+        left, top = monitor["left"], monitor["top"]
+        width, height = monitor["width"], monitor["height"]
+        xs = np.arange(left, left + width, dtype=np.int32)[None, :]
+        ys = np.arange(top, top + height, dtype=np.int32)[:, None]
+
+        pixels = np.empty((height, width, 4), dtype=np.uint8)
+        pixels[..., 0] = (xs + self.seed) & 0xFF
+        pixels[..., 1] = ys & 0xFF
+        pixels[..., 2] = ((xs >> 4) ^ (ys >> 4)) & 0xFF
+        pixels[..., 3] = 255
+        # 移动的方块：每帧向右移动8像素，在虚拟屏幕内循环
+        box_x = (frame * 8) % SYNTHETIC_MONITORS[0]["width"]
+        x0, x1 = max(box_x - left, 0), min(box_x + 64 - left, width)
+        y0, y1 = max(64 - top, 0), min(128 - top, height)
+        if x0 < x1 and y0 < y1:
+            pixels[y0:y1, x0:x1, :3] = 255
+        return SyntheticShot(bytearray(pixels.tobytes()), width, height)
+
+    def close(self):
+        pass
+
+
+def create_capture(backend: str, seed: str = ""):
+    """创建截图后端实例（mss实例不能跨线程使用，调用方应每个线程创建一个）"""
+    if backend == "synthetic":
+        return SyntheticCapture(seed)
+    import mss
+    return mss.mss()
+
+
+def enumerate_monitors(backend: str) -> List[Dict[str, int]]:
+    """枚举显示器（mss实例会缓存枚举结果，因此每次使用新实例）"""
+    if backend == "synthetic":
+        return [dict(m) for m in SYNTHETIC_MONITORS]
+    import mss
+    with mss.mss() as sct:
+        return [
+            {"left": m["left"], "top": m["top"], "width": m["width"], "height": m["height"]}
+            for m in sct.monitors
+        ]
@@ -0,0 +1,895 @@
+"""
+截图引擎：持有定时截图、热键和截图流水线
+- 默认与API在同一进程中运行（本地引擎）
+- 设置环境变量 LX_ENGINE_SOCKET 后，API通过Unix socket调用独立运行的引擎守护进程
+  （python -m backend.engine_daemon），API可以多worker运行，重启API也不会中断截图
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from backend.services.config_service import ConfigService
+from backend.services.encoder_service import EncoderService
+from backend.services.group_service import GroupService
+from backend.services.hotkey_service import HotkeyService
+from backend.services.job_service import JobService
+from backend.services.probe_service import ProbeService
+from backend.services.sink_service import MemorySink, SinkService
+from backend.services.region_service import RegionService
+from backend.services.screenshot_service import ScreenshotService
+from backend.services.session_service import SessionService
+from backend.services.timelapse_service import TimelapseService
+from backend.utils.hotkey_parser import parse_hotkey
+
+# 引擎守护进程的Unix socket路径（设置后API使用远程引擎）
+ENGINE_SOCKET_ENV = "LX_ENGINE_SOCKET"
+
+
+class EngineError(Exception):
+    """引擎调用错误（status_code 对应HTTP状态码）"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _result_dict(region, success: bool, message: str, file_path: Optional[str]) -> dict:
+    """截图结果（可JSON序列化，便于跨进程传递）"""
+    return {
+        "region_id": region.id,
+        "region_name": region.name,
+        "success": success,
+        "message": message,
+        "file_path": file_path
+    }
+
+
+class CaptureEngine:
+    """截图引擎单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CaptureEngine, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.hotkey_service = HotkeyService()
+        self.config_service = ConfigService()
+        self.region_service = RegionService()
+        self.group_service = GroupService()
+        self.screenshot_service = ScreenshotService()
+
+        # 启动状态，各组件状态: pending / ok / failed / skipped
+        self.components = {"capture": "pending", "hotkeys": "pending"}
+        self.ready_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+
+        # 定时截图
+        self._timer_running = False
+        self._timer_thread: Optional[threading.Thread] = None
+
+        # 当前已注册的热键字符串，重新设置热键时先全部注销
+        self._registered_hotkeys: List[str] = []
+        self._hotkey_lock = threading.Lock()
+
+    # ---------- 生命周期 ----------
+
+    def start(self, on_ready=None, hotkeys: bool = True):
+        """
+        启动定时截图和选区探测，并在后台线程中预热截图组件、注册热键（完成后调用on_ready）
+        hotkeys为False时不注册热键（如无人值守的代理）；开启 agent_enabled 时同时启动代理
+        """
+        self.started_at = time.time()
+        # 延时拼图按 timelapse_enabled 决定是否处理，修改配置后无需重新注册
+        self.screenshot_service.add_capture_listener(TimelapseService().on_saved)
+        self.start_timer()
+        ProbeService().start()
+        if self.config_service.get_config().agent_enabled:
+            from backend.services.agent_service import AgentService
+            AgentService().start()
+        threading.Thread(target=self._startup_worker, args=(on_ready, hotkeys), daemon=True).start()
+
+    def _startup_worker(self, on_ready=None, hotkeys: bool = True):
+        """后台初始化：预热截图组件、注册热键，不阻塞请求处理"""
+        config = self.config_service.get_config()
+        if config.prewarm_capture:
+            self.components["capture"] = "ok" if self.screenshot_service.warm_up() else "failed"
+        else:
+            self.components["capture"] = "skipped"
+
+        # 设置热键（注意：在某些系统上可能需要管理员权限）
+        if hotkeys:
+            self.components["hotkeys"] = "ok" if self.setup_hotkeys() else "failed"
+        else:
+            self.components["hotkeys"] = "skipped"
+        self.ready_at = time.time()
+        if on_ready is not None:
+            on_ready(dict(self.components))
+
+    def stop(self):
+        """结束录制会话，停止定时截图、选区探测、截图输出、代理和热键监听，写回延时拼图，关闭编码进程池"""
+        SessionService().stop(reason="shutdown")
+        self.stop_timer()
+        self.screenshot_service.remove_capture_listener(TimelapseService().on_saved)
+        ProbeService().stop()
+        SinkService().stop()
+        from backend.services.agent_service import AgentService
+        if AgentService._instance is not None:
+            AgentService().stop()
+        if JobService._instance is not None:
+            JobService().shutdown()
+        self.hotkey_service.stop_listening()
+        TimelapseService().stop()
+        EncoderService().shutdown()
+
+    def get_status(self) -> dict:
+        """引擎状态"""
+        status = {
+            "ready": all(status != "pending" for status in self.components.values()),
+            "components": dict(self.components),
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "timer_running": self._timer_running
+        }
+        from backend.services.agent_service import AgentService
+        if AgentService._instance is not None:
+            status["agent"] = AgentService().get_status()
+        return status
+
+    # ---------- 定时截图 ----------
+
+    def start_timer(self):
+        """启动定时截图"""
+        if not self._timer_running:
+            self._timer_running = True
+            self._timer_thread = threading.Thread(target=self._timer_worker, daemon=True)
+            self._timer_thread.start()
+
+    def stop_timer(self):
+        """停止定时截图"""
+        self._timer_running = False
+
+    def _timer_worker(self):
+        """定时截图工作线程（全局间隔截取所有选区，各分组按自己的间隔截取）"""
+        next_run = {}  # 任务（"__all__" 或分组ID） -> 下次执行时间
+        while self._timer_running:
+            config = self.config_service.get_config()
+            # 每次循环重新加载最新的选区和分组配置（文件未变化时不会重新解析）
+            try:
+                self.region_service.load_regions()
+                self.group_service.load_groups()
+            except Exception as e:
+                print(f"[定时截图] 重新加载选区失败: {e}")
+
+            schedules = {"__all__": (config.screenshot_interval, None)}
+            for group in self.group_service.get_all_groups():
+                schedules[group.id] = (group.screenshot_interval, group)
+            for key in list(next_run):
+                if key not in schedules or schedules[key][0] <= 0:
+                    del next_run[key]
+
+            now = time.monotonic()
+            for key, (interval, group) in schedules.items():
+                if interval <= 0 or now < next_run.setdefault(key, now):
+                    continue
+                try:
+                    if group is None:
+                        self.screenshot_service.capture_and_save_regions(self.region_service.get_image_regions())
+                    else:
+                        self._capture_group_regions(group)
+                except Exception as e:
+                    print(f"[定时截图] 截图失败 ({group.name if group else '全部选区'}): {e}")
+                next_run[key] = time.monotonic() + interval
+
+            # 睡到最近一个任务到期（最多1秒，以便及时响应配置变化）
+            wait = min([next_run[key] - time.monotonic() for key in next_run] + [1.0])
+            time.sleep(max(wait, 0.01))
+
+    # ---------- 截图 ----------
+
+    def _capture_group_regions(self, group) -> list:
+        """截取分组：每个显示器一次截取成员选区的外接矩形，再裁剪出各选区"""
+        regions = [r for r in (self.region_service.get_region_by_id(rid) for rid in group.region_ids) if r is not None]
+        if not regions:
+            print(f"[分组截图] ⚠ 分组 {group.name} 中没有可用的选区")
+            return []
+        return self.screenshot_service.capture_and_save_regions(regions, group.output_dir)
+
+    def _reload(self, groups: bool = False):
+        """重新加载选区（及分组），文件未变化时不会重新解析"""
+        self.region_service.load_regions()
+        if groups:
+            self.group_service.load_groups()
+
+    def capture_all(self) -> List[dict]:
+        """截取并保存所有选区"""
+        self._reload()
+        regions = self.region_service.get_image_regions()
+        if not regions:
+            raise EngineError(400, "没有可用的选区")
+        return [_result_dict(*result) for result in self.screenshot_service.capture_and_save_regions(regions)]
+
+    def capture_region(self, region_id: str) -> dict:
+        """截取并保存单个选区"""
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        return _result_dict(region, *self.screenshot_service.capture_and_save_region(region))
+
+    def capture_group(self, group_id: str) -> List[dict]:
+        """截取并保存分组"""
+        self._reload(groups=True)
+        group = self.group_service.get_group_by_id(group_id)
+        if group is None:
+            raise EngineError(404, "分组不存在")
+        results = self._capture_group_regions(group)
+        if not results:
+            raise EngineError(400, "分组中没有可用的选区")
+        return [_result_dict(*result) for result in results]
+
+    def capture_burst(self, region_ids: Optional[List[str]] = None, frames: int = 0, duration: float = 0,
+                      output_dir: Optional[str] = None) -> dict:
+        """连拍"""
+        self._reload()
+        if region_ids:
+            regions = [r for r in (self.region_service.get_region_by_id(rid) for rid in region_ids) if r is not None]
+        else:
+            regions = self.region_service.get_image_regions()
+        if not regions:
+            raise EngineError(400, "没有可用的选区")
+        if frames < 0 or duration < 0:
+            raise EngineError(400, "帧数和时长不能为负数")
+        return self.screenshot_service.capture_burst(regions, frames, duration, output_dir)
+
+    def preview_region(self, region_id: str) -> bytes:
+        """选区预览图（PNG）"""
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        return self._preview(region)
+
+    def preview_rect(self, x1: int, y1: int, x2: int, y2: int) -> bytes:
+        """临时选区预览图（PNG，用于交互式设置）"""
+        from backend.models import Region
+        return self._preview(Region(name="temp", x1=x1, y1=y1, x2=x2, y2=y2))
+
+    def _preview(self, region) -> bytes:
+        data = self.screenshot_service.get_region_preview(region)
+        if data is None:
+            raise EngineError(500, "生成预览图失败")
+        return data
+
+    # ---------- 选区锚点 ----------
+
+    def set_anchor(self, region_id: str, x1: int, y1: int, x2: int, y2: int,
+                   search_margin: int = 200, threshold: float = 0.8) -> dict:
+        """截取屏幕矩形作为选区的锚点参考图，返回更新后的选区"""
+        from backend.models import RegionAnchor
+        from backend.services.anchor_service import AnchorService
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            raise EngineError(400, "锚点模板太小（至少 4x4 像素）")
+        if search_margin < 0 or not -1 <= threshold <= 1:
+            raise EngineError(400, "search_margin 不能为负数，threshold 必须在 -1 到 1 之间")
+        anchor_service = AnchorService()
+        # 模板按逻辑尺寸保存，与定位时的搜索区域一致
+        img = anchor_service.grab_logical(self.screenshot_service, x1, y1, x2 - x1, y2 - y1)
+        problem = anchor_service.validate_template(img)
+        if problem:
+            raise EngineError(400, problem)
+        path = anchor_service.template_path(region_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        img.save(path, "PNG")
+        region.anchor = RegionAnchor(template=str(path), x=x1, y=y1, search_margin=search_margin, threshold=threshold)
+        self.region_service.save_regions()
+        anchor_service.reset(region_id)
+        print(f"[锚点] ✓ 已设置选区锚点: {region.name} <- ({x1}, {y1}, {x2}, {y2})")
+        return region.to_dict()
+
+    def clear_anchor(self, region_id: str) -> dict:
+        """清除选区锚点，返回更新后的选区"""
+        from backend.services.anchor_service import AnchorService
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        if region.anchor is not None:
+            Path(region.anchor.template).unlink(missing_ok=True)
+            region.anchor = None
+            self.region_service.save_regions()
+        AnchorService().reset(region_id)
+        return region.to_dict()
+
+    def get_anchor_status(self, region_id: str) -> dict:
+        """选区锚点的定位状态"""
+        from backend.services.anchor_service import AnchorService
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        if region.anchor is None:
+            raise EngineError(404, "选区没有设置锚点")
+        anchor = region.anchor.dict() if hasattr(region.anchor, 'dict') else region.anchor.model_dump()
+        return {"anchor": anchor, "state": AnchorService().get_status(region_id)}
+
+    # ---------- 选区探测 ----------
+
+    def probe_region(self, region_id: str) -> dict:
+        """立即探测一次选区（任意模式的选区均可），返回探测记录"""
+        self._reload()
+        region = self.region_service.get_region_by_id(region_id)
+        if region is None:
+            raise EngineError(404, "选区不存在")
+        record = ProbeService().probe([region], self.screenshot_service)[0]
+        if record is None:
+            raise EngineError(500, "截图失败")
+        return record
+
+    def get_probe_series(self, region_id: str, since: Optional[float] = None, limit: int = 1000) -> List[dict]:
+        """选区的探测记录"""
+        return ProbeService().get_series(region_id, since, limit)
+
+    def get_probe_latest(self) -> Dict[str, dict]:
+        """各探测选区最新的记录"""
+        return ProbeService().get_latest()
+
+    # ---------- 截图输出 ----------
+
+    def get_sink_stats(self) -> List[dict]:
+        """各截图输出的发送统计"""
+        return SinkService().get_stats()
+
+    def drain_sink(self, name: str, limit: int = 10, wait_ms: int = 0) -> List[dict]:
+        """从内存输出取出最多 limit 帧（元数据 + base64数据），队列为空时最多等待 wait_ms 毫秒"""
+        import base64
+        sink = SinkService().get_sink(name)
+        if sink is None:
+            raise EngineError(404, "输出不存在或未启用")
+        if not isinstance(sink, MemorySink):
+            raise EngineError(400, "只能从 memory 类型的输出取出截图")
+        frames = sink.drain(limit, min(max(wait_ms, 0), 30000) / 1000)
+        return [dict(meta, data_b64=base64.b64encode(data).decode("ascii")) for meta, data in frames]
+
+    # ---------- 录制会话 ----------
+
+    def start_session(self, name: str = "", note: str = "") -> dict:
+        """开始录制会话，返回会话开始记录"""
+        try:
+            return SessionService().start(name, note)
+        except ValueError as e:
+            raise EngineError(400, str(e))
+        except RuntimeError as e:
+            raise EngineError(409, str(e))
+
+    def stop_session(self) -> dict:
+        """结束录制会话，返回汇总统计"""
+        summary = SessionService().stop()
+        if summary is None:
+            raise EngineError(409, "没有进行中的录制会话")
+        return summary
+
+    def get_active_session(self) -> Optional[dict]:
+        """进行中的录制会话（没有时为None）"""
+        return SessionService().get_active()
+
+    def list_sessions(self) -> List[dict]:
+        """全部录制会话"""
+        return SessionService().list_sessions()
+
+    def get_session(self, session_id: str) -> dict:
+        """录制会话详情"""
+        session = SessionService().get_session(session_id)
+        if session is None:
+            raise EngineError(404, "录制会话不存在")
+        return session
+
+    def get_session_frames(self, session_id: str, region: Optional[str] = None, offset: int = 0,
+                           limit: int = 100) -> List[dict]:
+        """录制会话的帧索引"""
+        frames = SessionService().get_frames(session_id, region, max(offset, 0), min(max(limit, 1), 10000))
+        if frames is None:
+            raise EngineError(404, "录制会话不存在")
+        return frames
+
+    # ---------- 延时拼图 ----------
+
+    def list_timelapse_sheets(self, region_name: Optional[str] = None) -> List[dict]:
+        """延时拼图列表"""
+        return TimelapseService().list_sheets(region_name)
+
+    def read_timelapse_sheet(self, region_name: str, sheet_id: str) -> bytes:
+        """延时拼图图片（PNG）"""
+        data = TimelapseService().read_sheet(region_name, sheet_id)
+        if data is None:
+            raise EngineError(404, "延时拼图不存在")
+        return data
+
+    def get_timelapse_index(self, region_name: str, sheet_id: str) -> dict:
+        """延时拼图的布局和格子索引"""
+        index = TimelapseService().get_index(region_name, sheet_id)
+        if index is None:
+            raise EngineError(404, "延时拼图不存在")
+        return index
+
+    # ---------- 资源统计 ----------
+
+    def get_resources(self, top: int = 0) -> dict:
+        """进程资源使用情况（内存、句柄、线程、截图后端实例、tracemalloc）"""
+        from backend.services.resource_service import ResourceService
+        return ResourceService().get_usage(top)
+
+    def set_tracemalloc(self, enabled: bool, frames: int = 1) -> dict:
+        """开启或关闭 tracemalloc 内存分配追踪"""
+        from backend.services.resource_service import ResourceService
+        service = ResourceService()
+        return service.start_tracing(frames) if enabled else service.stop_tracing()
+
+    def take_memory_snapshot(self, limit: int = 10) -> dict:
+        """保存 tracemalloc 快照"""
+        from backend.services.resource_service import ResourceService
+        try:
+            return ResourceService().take_snapshot(limit)
+        except RuntimeError as e:
+            raise EngineError(400, str(e))
+
+    def diff_memory_snapshot(self, snapshot_id: int, limit: int = 10) -> dict:
+        """当前内存分配与快照的差异"""
+        from backend.services.resource_service import ResourceService
+        try:
+            diff = ResourceService().diff_snapshot(snapshot_id, limit)
+        except RuntimeError as e:
+            raise EngineError(400, str(e))
+        if diff is None:
+            raise EngineError(404, "快照不存在")
+        return diff
+
+    # ---------- 相似截图 ----------
+
+    def search_similar(self, image_b64: Optional[str] = None, capture_id: Optional[int] = None,
+                       file_path: Optional[str] = None, region_name: Optional[str] = None,
+                       max_distance: int = 10, limit: int = 5) -> dict:
+        """
+        查找相似的历史截图：按上传的图片（base64）、已索引截图的ID或文件路径计算pHash，
+        返回各选区汉明距离最近的截图
+        """
+        from backend.services.hash_index import HashIndexService, phash
+        index = HashIndexService()
+        exclude_id = None
+        if image_b64:
+            import base64
+            from io import BytesIO
+            from PIL import Image
+            try:
+                with Image.open(BytesIO(base64.b64decode(image_b64))) as img:
+                    value = phash(img)
+            except Exception as e:
+                raise EngineError(400, f"无法读取图片: {e}")
+        else:
+            if capture_id is None and not file_path:
+                raise EngineError(400, "需要指定图片、截图ID或文件路径")
+            entry = index.get_entry(capture_id) if capture_id is not None else index.find_by_path(file_path)
+            if entry is None:
+                raise EngineError(404, "截图不存在或尚未索引")
+            value, exclude_id = entry.phash, entry.id
+        if not 0 <= max_distance <= 64 or limit <= 0:
+            raise EngineError(400, "max_distance 必须在 0-64 之间，limit 必须大于0")
+        return {
+            "phash": f"{value:016x}",
+            "results": index.search(value, region_name, max_distance, limit, exclude_id)
+        }
+
+    def get_stats(self) -> dict:
+        """截图统计"""
+        return {
+            "singleflight": self.screenshot_service.singleflight.get_stats(),
+            "plan": self.screenshot_service.get_plan_stats(),
+            "frame_cache": self.screenshot_service.frame_cache.get_stats(),
+            "jobs": JobService().get_stats(),
+            "probe": ProbeService().get_stats(),
+            "hash_index": self._hash_index_stats(),
+            "sinks": SinkService().get_stats()
+        }
+
+    def _hash_index_stats(self) -> Optional[dict]:
+        from backend.services.hash_index import HashIndexService
+        return HashIndexService().get_stats() if HashIndexService._instance is not None else None
+
+    def get_encoder_stats(self) -> dict:
+        """编码服务状态（包含自适应编码的调节状态；差分存储已启用时包含写入统计）"""
+        stats = EncoderService().get_stats()
+        from backend.services.adaptive_encoder import AdaptiveEncoderService
+        stats["adaptive"] = AdaptiveEncoderService().get_stats()
+        from backend.services.delta_store import DeltaStore
+        if DeltaStore._instance is not None:
+            stats["delta"] = DeltaStore().get_stats()
+        return stats
+
+    def read_frame(self, ref: str) -> bytes:
+        """还原差分存储中的一帧（帧引用 "{分段文件}#{帧序号}"），返回PNG数据；分段文件必须在输出目录或分组输出目录中"""
+        from backend.services.delta_store import parse_frame_ref, read_frame_png
+        try:
+            path, _ = parse_frame_ref(ref)
+        except ValueError as e:
+            raise EngineError(400, str(e))
+        self._reload(groups=True)
+        roots = [self.config_service.get_config().output_dir]
+        roots += [group.output_dir for group in self.group_service.get_all_groups() if group.output_dir]
+        resolved = Path(path).resolve()
+        if not any(resolved.is_relative_to(Path(root).resolve()) for root in roots):
+            raise EngineError(403, "分段文件不在输出目录中")
+        try:
+            return read_frame_png(ref)
+        except FileNotFoundError:
+            raise EngineError(404, "分段文件不存在")
+        except (ValueError, IndexError) as e:
+            raise EngineError(400, str(e))
+
+    def reload_config(self) -> bool:
+        """重新读取配置文件（API进程修改配置后调用）"""
+        self.config_service.load_config()
+        return True
+
+    # ---------- 任务 ----------
+
+    def _resolve_regions(self, region_ids: Optional[List[str]] = None, group_id: Optional[str] = None):
+        """确定任务要截取的选区：指定分组时为分组成员，否则为指定的选区（默认全部）；返回 (选区, 分组输出目录)"""
+        self._reload(groups=bool(group_id))
+        output_dir = None
+        if group_id:
+            group = self.group_service.get_group_by_id(group_id)
+            if group is None:
+                raise EngineError(404, "分组不存在")
+            region_ids, output_dir = group.region_ids, group.output_dir
+        if region_ids:
+            regions = [r for r in (self.region_service.get_region_by_id(rid) for rid in region_ids) if r is not None]
+        else:
+            regions = self.region_service.get_image_regions()
+        if not regions:
+            raise EngineError(400, "没有可用的选区")
+        return regions, output_dir
+
+    def submit_job(self, kind: str, params: Optional[dict] = None) -> dict:
+        """
+        提交任务，立即返回任务信息
+        capture: region_ids / group_id / output_dir
+        burst: region_ids / frames / duration / output_dir
+        export: output_dir（要导出的目录，默认输出目录） / region_name / since / until（时间戳）
+        reindex: output_dir（要加入感知哈希索引的目录，默认输出目录）
+        timelapse: output_dir（要拼接的目录，默认输出目录） / region_name / since / until（时间戳）
+        """
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        if kind == "capture":
+            regions, group_dir = self._resolve_regions(params.get("region_ids"), params.get("group_id"))
+            output_dir = params.get("output_dir") or group_dir
+            runner = lambda job: self._run_capture_job(job, regions, output_dir)
+        elif kind == "burst":
+            regions, _ = self._resolve_regions(params.get("region_ids"))
+            if params.get("frames", 0) < 0 or params.get("duration", 0) < 0:
+                raise EngineError(400, "帧数和时长不能为负数")
+            runner = lambda job: self._run_burst_job(job, regions, params)
+        elif kind == "export":
+            runner = lambda job: self._run_export_job(job, params)
+        elif kind == "reindex":
+            runner = lambda job: self._run_reindex_job(job, params)
+        elif kind == "timelapse":
+            runner = lambda job: self._run_timelapse_job(job, params)
+        else:
+            raise EngineError(400, f"未知的任务类型: {kind}")
+        return JobService().submit(kind, params, runner).to_dict()
+
+    def _run_capture_job(self, job, regions, output_dir: Optional[str]) -> List[dict]:
+        job.progress(0, len(regions), "正在截图")
+        results = self.screenshot_service.capture_and_save_regions(regions, output_dir, progress=job.progress)
+        success_count = sum(1 for _, success, _, _ in results if success)
+        job.message = f"截图完成，成功: {success_count}/{len(results)}"
+        return [_result_dict(*result) for result in results]
+
+    def _run_burst_job(self, job, regions, params: dict) -> dict:
+        job.progress(0, 0, "正在连拍")
+        result = self.screenshot_service.capture_burst(
+            regions, params.get("frames", 0), params.get("duration", 0), params.get("output_dir"),
+            stop_event=job.cancel_event, progress=job.progress
+        )
+        job.check_cancelled()
+        if not result["success"] and result.get("frames", 0) == 0:
+            raise RuntimeError(result["message"])
+        job.message = result["message"]
+        return result
+
+    def _run_export_job(self, job, params: dict) -> dict:
+        from backend.services.export_service import export_archive
+        source_dir = params.get("output_dir") or self.config_service.get_config().output_dir
+        job.progress(0, 0, "正在导出")
+        result = export_archive(
+            source_dir, str(Path(source_dir) / "exports"),
+            region_name=params.get("region_name"), since=params.get("since"), until=params.get("until"),
+            progress=job.progress
+        )
+        job.message = f"已导出 {result['files']} 个文件"
+        return result
+
+    def _run_reindex_job(self, job, params: dict) -> dict:
+        from backend.services.hash_index import HashIndexService
+        job.progress(0, 0, "正在索引")
+        result = HashIndexService().rebuild(params.get("output_dir"), progress=job.progress)
+        job.message = f"已索引 {result['indexed']} 张截图"
+        return result
+
+    def _run_timelapse_job(self, job, params: dict) -> dict:
+        job.progress(0, 0, "正在拼接")
+        result = TimelapseService().backfill(params.get("output_dir"), params.get("region_name"),
+                                             params.get("since"), params.get("until"), progress=job.progress)
+        job.message = f"已扫描 {result['scanned']} 张截图，新增 {result['tiles_added']} 格"
+        return result
+
+    def _get_job(self, job_id: str):
+        job = JobService().get_job(job_id)
+        if job is None:
+            raise EngineError(404, "任务不存在")
+        return job
+
+    def get_job(self, job_id: str) -> dict:
+        """任务信息"""
+        return self._get_job(job_id).to_dict()
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """任务列表（最新的在前）"""
+        return [job.to_dict() for job in JobService().list_jobs(status, limit)]
+
+    def cancel_job(self, job_id: str) -> dict:
+        """取消任务"""
+        self._get_job(job_id)
+        return JobService().cancel(job_id).to_dict()
+
+    def wait_job(self, job_id: str, after_version: int = -1, timeout: float = 15) -> dict:
+        """等待任务发生变化或结束（用于订阅进度），最多等待timeout秒"""
+        self._get_job(job_id)
+        return JobService().wait(job_id, after_version, min(timeout, 60)).to_dict()
+
+    # ---------- 热键 ----------
+
+    def _on_hotkey_coord(self, label: str, corner: str):
+        """热键A/B：记录坐标"""
+        print("\n" + "=" * 60)
+        print(f"[热键{label}] ========== 触发！==========")
+        try:
+            from backend.utils.platform_utils import get_mouse_position
+            print(f"[热键{label}] 正在获取鼠标位置...")
+            pos = get_mouse_position()
+            print(f"[热键{label}] 获取到坐标: {pos}")
+
+            self.hotkey_service.set_captured_coord(corner, pos[0], pos[1])
+            current_coords = self.hotkey_service.get_captured_coords()
+            print(f"[热键{label}] 已保存坐标: {current_coords}")
+            print(f"[热键{label}] ========== 完成 ==========")
+        except Exception as e:
+            print(f"[热键{label}] ✗ 错误: {e}")
+            import traceback
+            traceback.print_exc()
+        print("=" * 60 + "\n")
+
+    def on_hotkey_a(self):
+        """热键A：记录左上角坐标"""
+        self._on_hotkey_coord("A", "top_left")
+
+    def on_hotkey_b(self):
+        """热键B：记录右下角坐标"""
+        self._on_hotkey_coord("B", "bottom_right")
+
+    def on_hotkey_c(self):
+        """热键C：手动截图"""
+        print("\n" + "=" * 60)
+        print("[热键C] ========== 触发！执行截图 ==========")
+        try:
+            # 每次热键触发时重新加载选区，确保使用最新配置
+            try:
+                self._reload()
+            except Exception as e:
+                print(f"[热键C] ⚠ 重新加载选区失败: {e}")
+
+            regions = self.region_service.get_image_regions()
+            if not regions:
+                print("[热键C] ⚠ 警告: 没有可用的选区")
+                return
+
+            print(f"[热键C] 找到 {len(regions)} 个选区，开始截图...")
+            success_count = 0
+            for region, success, message, file_path in self.screenshot_service.capture_and_save_regions(regions):
+                if success:
+                    success_count += 1
+                    print(f"[热键C] ✓ {region.name}: {file_path}")
+                else:
+                    print(f"[热键C] ✗ {region.name}: {message}")
+
+            print(f"[热键C] 完成！成功: {success_count}/{len(regions)}")
+            print("=" * 60 + "\n")
+        except Exception as e:
+            print(f"[热键C] ✗ 错误: {e}")
+            import traceback
+            traceback.print_exc()
+            print("=" * 60 + "\n")
+
+    def on_hotkey_region(self, region_id: str):
+        """选区热键：单独截取该选区"""
+        try:
+            result = self.capture_region(region_id)
+        except EngineError as e:
+            print(f"[选区热键] ⚠ {e.detail}: {region_id}")
+            return
+        print(f"[选区热键] {'✓' if result['success'] else '✗'} {result['region_name']}: "
+              f"{result['file_path'] or result['message']}")
+
+    def on_hotkey_group(self, group_id: str):
+        """分组热键：按显示器批量截取分组成员选区"""
+        try:
+            self._reload(groups=True)
+        except Exception as e:
+            print(f"[分组热键] ⚠ 重新加载配置失败: {e}")
+        group = self.group_service.get_group_by_id(group_id)
+        if group is None:
+            print(f"[分组热键] ⚠ 分组不存在: {group_id}")
+            return
+        results = self._capture_group_regions(group)
+        success_count = sum(1 for _, success, _, _ in results if success)
+        print(f"[分组热键] {group.name} 完成！成功: {success_count}/{len(results)}")
+
+    def on_hotkey_burst(self):
+        """连拍热键：对所有选区连拍 burst_frames 帧"""
+        try:
+            result = self.capture_burst(frames=self.config_service.get_config().burst_frames)
+        except EngineError as e:
+            print(f"[连拍热键] ⚠ 警告: {e.detail}")
+            return
+        print(f"[连拍热键] {result['message']}: {result.get('frames', 0)} 帧，fps={result.get('fps')}")
+
+    def on_hotkey_session(self):
+        """录制会话热键：没有进行中的会话时开始新会话，否则结束当前会话"""
+        try:
+            if SessionService().active is None:
+                session = self.start_session()
+                print(f"[会话热键] ▶ 开始录制: {session['name']}")
+            else:
+                summary = self.stop_session()
+                print(f"[会话热键] ■ 结束录制: {summary['name']}，{summary['frames']} 帧")
+        except EngineError as e:
+            print(f"[会话热键] ⚠ {e.detail}")
+
+    def setup_hotkeys(self) -> bool:
+        """设置热键（A/B/C 以及各选区、分组的热键），返回是否成功"""
+        hotkey_service = self.hotkey_service
+        with self._hotkey_lock:
+            try:
+                config = self.config_service.get_config()
+                # 先清除旧热键
+                for hotkey_str in self._registered_hotkeys:
+                    hotkey_service.unregister_hotkey(hotkey_str)
+                registered = self._registered_hotkeys = []
+
+                # 注册新热键
+                success_a = hotkey_service.register_hotkey(config.hotkey_a, self.on_hotkey_a)
+                success_b = hotkey_service.register_hotkey(config.hotkey_b, self.on_hotkey_b)
+                success_c = hotkey_service.register_hotkey(config.hotkey_c, self.on_hotkey_c)
+                registered.extend([config.hotkey_a, config.hotkey_b, config.hotkey_c])
+
+                print(f"热键注册结果: A={success_a}, B={success_b}, C={success_c}")
+                print(f"热键配置: A={config.hotkey_a}, B={config.hotkey_b}, C={config.hotkey_c}")
+
+                if config.hotkey_burst:
+                    success_burst = hotkey_service.register_hotkey(config.hotkey_burst, self.on_hotkey_burst)
+                    registered.append(config.hotkey_burst)
+                    print(f"热键注册结果: 连拍={success_burst} ({config.hotkey_burst})")
+
+                if config.hotkey_session:
+                    success_session = hotkey_service.register_hotkey(config.hotkey_session, self.on_hotkey_session)
+                    registered.append(config.hotkey_session)
+                    print(f"热键注册结果: 录制会话={success_session} ({config.hotkey_session})")
+
+                if config.region_hotkeys_enabled:
+                    self._reload(groups=True)
+                    bindings = [(r.hotkey, f"选区 {r.name}", lambda rid=r.id: self.on_hotkey_region(rid))
+                                for r in self.region_service.get_all_regions() if r.hotkey]
+                    bindings += [(g.hotkey, f"分组 {g.name}", lambda gid=g.id: self.on_hotkey_group(gid))
+                                 for g in self.group_service.get_all_groups() if g.hotkey]
+                    taken = {parse_hotkey(h).normalized for h in registered}
+                    for hotkey_str, label, callback in bindings:
+                        if parse_hotkey(hotkey_str).normalized in taken:
+                            print(f"⚠ 热键冲突，跳过 {label}: {hotkey_str}")
+                            continue
+                        taken.add(parse_hotkey(hotkey_str).normalized)
+                        success = hotkey_service.register_hotkey(hotkey_str, callback)
+                        registered.append(hotkey_str)
+                        print(f"热键注册结果: {label}={success} ({hotkey_str})")
+
+                # 启动监听
+                hotkey_service.start_listening()
+                print("热键监听已启动")
+                return success_a and success_b and success_c
+            except Exception as e:
+                print(f"设置热键失败: {e}")
+                import traceback
+                traceback.print_exc()
+                return False
+
+    def reload_hotkeys(self) -> bool:
+        """选区/分组热键变化后重新注册热键"""
+        return self.setup_hotkeys()
+
+    def get_captured_coords(self) -> Dict[str, Optional[dict]]:
+        """获取通过热键采集的坐标"""
+        coords = self.hotkey_service.get_captured_coords()
+        return {
+            "top_left": coords.get('top_left'),
+            "bottom_right": coords.get('bottom_right')
+        }
+
+    def clear_captured_coords(self) -> bool:
+        """清除已采集的坐标"""
+        self.hotkey_service.clear_captured_coords()
+        return True
+
+    def get_hotkey_status(self) -> dict:
+        """热键服务状态"""
+        hotkey_service = self.hotkey_service
+        config = self.config_service.get_config()
+
+        # 获取平台信息
+        from backend.utils.platform_utils import get_platform_info
+        platform_info = get_platform_info()
+
+        result = {
+            "is_listening": hotkey_service.is_listening,
+            "platform_info": platform_info,
+            "config": {
+                "hotkey_a": config.hotkey_a,
+                "hotkey_b": config.hotkey_b,
+                "hotkey_c": config.hotkey_c
+            },
+            "current_coords": hotkey_service.get_captured_coords(),
+            "dispatch_stats": hotkey_service.get_dispatch_stats()
+        }
+
+        # 添加注册的热键信息
+        if hasattr(hotkey_service, 'hotkeys'):
+            result["registered_hotkeys"] = list(hotkey_service.hotkeys.keys())
+        if hasattr(hotkey_service, 'win32_service') and hotkey_service.win32_service:
+            result["hotkey_implementation"] = "win32"
+            if hasattr(hotkey_service.win32_service, 'hotkey_id_map'):
+                result["registered_hotkeys"] = list(hotkey_service.win32_service.hotkey_id_map.keys())
+        else:
+            result["hotkey_implementation"] = "pynput"
+        return result
+
+
+_remote_engine = None
+
+
+def is_remote_engine() -> bool:
+    """是否使用独立进程中的引擎"""
+    return bool(os.environ.get(ENGINE_SOCKET_ENV))
+
+
+def get_engine():
+    """获取截图引擎：设置了 LX_ENGINE_SOCKET 时返回远程引擎客户端，否则返回本进程内的引擎"""
+    global _remote_engine
+    socket_path = os.environ.get(ENGINE_SOCKET_ENV)
+    if not socket_path:
+        return CaptureEngine()
+    if _remote_engine is None or _remote_engine.socket_path != socket_path:
+        from backend.services.engine_ipc import EngineClient
+        _remote_engine = EngineClient(socket_path)
+    return _remote_engine
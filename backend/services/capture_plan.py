@@ -0,0 +1,137 @@
+"""
+截图计划：把选区集合编译为紧凑、不可变的截图计划
+- 选区矩形以NumPy数组存放，规范化、显示器归属和批次外接矩形均向量化计算
+- 每个批次预先生成mss截取参数和各选区的裁剪框，每个选区预先生成输出文件路径前缀和编码前的图片变换链
+- 计划按 (选区ID, 选区版本, 配置版本, 显示器布局版本) 缓存，只有选区或配置变化时才重新编译
+"""
+from pathlib import Path
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from backend.models import ImageTransform, Region
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class GrabBatch(NamedTuple):
+    """一次屏幕截取及其包含的选区"""
+    left: int
+    top: int
+    width: int
+    height: int
+    monitor: Dict[str, int]  # mss截取参数
+    members: Tuple[Tuple[int, Tuple[int, int, int, int]], ...]  # (选区位置, 在截图中的裁剪框)
+
+
+class CapturePlan:
+    """不可变的截图计划"""
+    __slots__ = ("key", "grab_key", "rects", "names", "region_ids", "prefixes", "transforms", "batches",
+                 "output_dir")
+
+    def __init__(self, key: Optional[Hashable], grab_key: Hashable, rects: 'np.ndarray', names: Tuple[str, ...],
+                 region_ids: Tuple[Optional[str], ...], prefixes: Tuple[str, ...],
+                 transforms: Tuple[Tuple[ImageTransform, ...], ...], batches: Tuple[GrabBatch, ...], output_dir: str):
+        rects.setflags(write=False)
+        self.key = key  # 缓存键，None表示不缓存（如临时选区）
+        self.grab_key = grab_key  # 截取内容相同的计划共享同一个键（用于单飞合并）
+        self.rects = rects  # (N, 4) int32，规范化后的 x1, y1, x2, y2
+        self.names = names
+        self.region_ids = region_ids
+        self.prefixes = prefixes  # 各选区的输出文件路径前缀 {output_dir}/{name}
+        self.transforms = transforms  # 各选区编码前的图片变换链（空元组表示保存原图）
+        self.batches = batches
+        self.output_dir = output_dir
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def scale_box(box: Tuple[int, int, int, int], scale_x: float, scale_y: float) -> Tuple[int, int, int, int]:
+    """
+    把虚拟屏幕坐标的裁剪框换算为截图像素坐标
+    HiDPI显示器上截图的像素尺寸是逻辑尺寸的倍数（如Retina为2倍），scale为截图像素尺寸与截取区域逻辑尺寸之比
+    """
+    if scale_x == 1 and scale_y == 1:
+        return box
+    x1, y1, x2, y2 = box
+    return round(x1 * scale_x), round(y1 * scale_y), round(x2 * scale_x), round(y2 * scale_y)
+
+
+def locate_rects(rects: 'np.ndarray', monitors: Sequence[Dict[str, int]]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """
+    向量化计算各矩形所在的显示器
+    返回: (重叠面积最大的显示器序号，不在任何显示器上为0; 是否跨越多个显示器)
+    """
+    import numpy as np
+    count = len(rects)
+    if count == 0 or len(monitors) <= 1:
+        return np.zeros(count, dtype=np.int32), np.zeros(count, dtype=bool)
+
+    mons = np.array([[m["left"], m["top"], m["left"] + m["width"], m["top"] + m["height"]]
+                     for m in monitors[1:]], dtype=np.int64)
+    r = rects.astype(np.int64)[:, None, :]
+    w = np.minimum(r[..., 2], mons[:, 2]) - np.maximum(r[..., 0], mons[:, 0])
+    h = np.minimum(r[..., 3], mons[:, 3]) - np.maximum(r[..., 1], mons[:, 1])
+    overlap = np.where((w > 0) & (h > 0), w * h, 0)
+
+    best = overlap.argmax(axis=1)
+    best_area = overlap[np.arange(count), best]
+    areas = (rects[:, 2] - rects[:, 0]).astype(np.int64) * (rects[:, 3] - rects[:, 1])
+    hits = (overlap > 0).sum(axis=1)
+    index = np.where(best_area > 0, best + 1, 0).astype(np.int32)
+    spans = (hits > 1) | ((hits == 1) & (best_area < areas))
+    return index, spans
+
+
+def compile_capture_plan(key: Optional[Hashable], regions: Sequence[Region], monitors: Sequence[Dict[str, int]],
+                         batching: bool, output_dir: str) -> CapturePlan:
+    """
+    编译截图计划
+    batching为True时按所在显示器分批，每个显示器只截取一次该显示器上选区的外接矩形；
+    跨显示器的选区单独截取；宽高为0的选区不进入任何批次
+    """
+    import numpy as np
+    raw = np.array([[r.x1, r.y1, r.x2, r.y2] for r in regions], dtype=np.int32).reshape(-1, 4)
+    rects = np.empty_like(raw)
+    rects[:, 0] = np.minimum(raw[:, 0], raw[:, 2])
+    rects[:, 1] = np.minimum(raw[:, 1], raw[:, 3])
+    rects[:, 2] = np.maximum(raw[:, 0], raw[:, 2])
+    rects[:, 3] = np.maximum(raw[:, 1], raw[:, 3])
+    valid = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+
+    positions = np.flatnonzero(valid)
+    if batching and len(positions) > 1:
+        index, spans = locate_rects(rects[positions], monitors)
+        buckets: List[np.ndarray] = []
+        batched = (index > 0) & ~spans
+        for monitor_index in np.unique(index[batched]):
+            buckets.append(positions[batched & (index == monitor_index)])
+        buckets.extend(positions[~batched][:, None])
+    else:
+        buckets = [np.array([p]) for p in positions]
+
+    batches = []
+    for bucket in buckets:
+        sub = rects[bucket]
+        left, top = int(sub[:, 0].min()), int(sub[:, 1].min())
+        right, bottom = int(sub[:, 2].max()), int(sub[:, 3].max())
+        members = tuple(
+            (int(p), (int(x1) - left, int(y1) - top, int(x2) - left, int(y2) - top))
+            for p, (x1, y1, x2, y2) in zip(bucket, sub)
+        )
+        monitor = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+        batches.append(GrabBatch(left, top, right - left, bottom - top, monitor, members))
+
+    directory = Path(output_dir)
+    names = tuple(r.name for r in regions)
+    return CapturePlan(
+        key=key,
+        grab_key=(rects.tobytes(), tuple(batch[:4] for batch in batches)),
+        rects=rects,
+        names=names,
+        region_ids=tuple(r.id for r in regions),
+        prefixes=tuple(str(directory / name) for name in names),
+        transforms=tuple(tuple(r.transforms) for r in regions),
+        batches=tuple(batches),
+        output_dir=str(directory)
+    )
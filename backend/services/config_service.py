@@ -13,14 +13,103 @@ DEFAULT_CONFIG = {
     "hotkey_a": "ctrl+alt+1",
     "hotkey_b": "ctrl+alt+2",
     "hotkey_c": "ctrl+alt+s",
-    "screenshot_interval": 0
+    "screenshot_interval": 0,
+    "open_browser": True,
+    "prewarm_capture": True,
+    "hotkey_coalesce": True,
+    "hotkey_debounce_ms": 150,
+    "hotkey_dispatch_workers": 2,
+    "region_hotkeys_enabled": True,
+    "monitor_batching": True,
+    "monitor_refresh_interval": 5,
+    "hotkey_burst": "",
+    "hotkey_session": "",
+    "burst_frames": 30,
+    "burst_max_memory_mb": 512,
+    "encoder_mode": "inline",
+    "encoder_workers": 0,
+    "png_compress_level": 6,
+    "adaptive_encoding": {
+        "enabled": False,
+        "target_fps": 0,
+        "cpu_budget": 0,
+        "max_queue": 0,
+        "interval_ms": 2000,
+        "jpeg_quality": 85,
+        "webp_quality": 80,
+        "bounds": {"min_compress_level": 1, "max_compress_level": 9, "formats": ["png"], "max_downscale": 1}
+    },
+    "storage_mode": "png",
+    "delta_keyframe_interval": 300,
+    "delta_tile_size": 32,
+    "singleflight_window_ms": 50,
+    "frame_cache_max_age_ms": 1000,
+    "frame_cache_size": 2,
+    "probe_history_size": 3600,
+    "probe_log": True,
+    "hash_index_enabled": True,
+    "hash_index_max_entries": 50000,
+    "timelapse_enabled": False,
+    "timelapse_tile_seconds": 60,
+    "timelapse_sheet_seconds": 3600,
+    "timelapse_tile_width": 160,
+    "timelapse_columns": 10,
+    "anchor_recheck_ms": 100,
+    "save_files": True,
+    "output_sinks": [],
+    "singleflight_share_encode": False,
+    "capture_backend": "mss",
+    "agent_enabled": False,
+    "agent_name": "",
+    "coordinator_address": "127.0.0.1:8765",
+    "agent_send_frames": False,
+    "agent_batch_size": 20,
+    "agent_flush_interval": 2.0,
+    "agent_queue_max": 1000,
+    "job_max_concurrency": 2,
+    "job_history_size": 200
 }
 
 
+def validate_app_config(config: AppConfig, check_output_dir: bool = True) -> Optional[str]:
+    """
+    检查配置中各项的取值（类型已由AppConfig校验），返回错误信息（合法时返回None）
+    check_output_dir 为False时不检查输出目录是否可写（如协调器校验下发给其他主机的配置）
+    """
+    # 各服务模块导入了配置服务，因此在函数内导入
+    from backend.services.adaptive_encoder import validate_adaptive
+    from backend.services.delta_store import validate_delta
+    from backend.services.sink_service import validate_sink
+    from backend.services.timelapse_service import validate_timelapse
+    if check_output_dir and config.output_dir:
+        is_valid, message = ConfigService().validate_output_dir(config.output_dir)
+        if not is_valid:
+            return message
+    names = [sink.name for sink in config.output_sinks]
+    if len(set(names)) != len(names):
+        return "输出名称不能重复"
+    for sink in config.output_sinks:
+        error = validate_sink(sink)
+        if error:
+            return error
+    error = validate_adaptive(config.adaptive_encoding)
+    if error:
+        return f"自适应编码: {error}"
+    error = validate_timelapse(config)
+    if error:
+        return f"延时拼图: {error}"
+    error = validate_delta(config)
+    if error:
+        return f"差分存储: {error}"
+    return None
+
+
 class ConfigService:
     """配置服务单例"""
     _instance = None
     _config: Optional[AppConfig] = None
+    # 配置版本：每次加载或更新配置时递增（截图计划据此判断是否需要重新编译）
+    version = 0
 
     def __new__(cls):
         if cls._instance is None:
@@ -32,7 +121,8 @@ class ConfigService:
             self.load_config()
 
     def load_config(self) -> AppConfig:
-        """加载配置文件"""
+        """加载配置文件（内容变化时递增配置版本）"""
+        previous = self._config
         config_path = Path(CONFIG_FILE)
         if config_path.exists():
             try:
@@ -45,6 +135,8 @@ class ConfigService:
         else:
             self._config = AppConfig(**DEFAULT_CONFIG)
             self.save_config()
+        if self._config != previous:
+            ConfigService.version += 1
         return self._config
 
     def save_config(self) -> bool:
@@ -69,9 +161,18 @@ class ConfigService:
         config_dict = self._config.dict() if hasattr(self._config, 'dict') else self._config.model_dump()
         config_dict.update({k: v for k, v in kwargs.items() if v is not None})
         self._config = AppConfig(**config_dict)
+        ConfigService.version += 1
         self.save_config()
         return self._config
 
+    def override_config(self, **kwargs) -> AppConfig:
+        """只修改内存中的配置，不写入配置文件（如命令行参数临时覆盖）"""
+        config_dict = self._config.dict() if hasattr(self._config, 'dict') else self._config.model_dump()
+        config_dict.update({k: v for k, v in kwargs.items() if v is not None})
+        self._config = AppConfig(**config_dict)
+        ConfigService.version += 1
+        return self._config
+
     def validate_output_dir(self, path: str) -> tuple[bool, str]:
         """验证输出目录是否可写"""
         try:
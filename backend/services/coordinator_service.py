@@ -0,0 +1,250 @@
+"""
+协调器服务：接收各代理的长连接，汇总截图目录和健康状态，并向代理下发选区/配置
+协议与 agent_service 一致（TCP，每行一个JSON消息）
+"""
+import base64
+import json
+import re
+import socketserver
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+
+class AgentRecord:
+    """协调器中一个代理的状态"""
+
+    def __init__(self, agent_id: str, catalog_size: int):
+        self.agent_id = agent_id
+        self.hostname = ""
+        self.pid = 0
+        self.connected = False
+        self.connected_at: Optional[str] = None
+        self.last_seen: Optional[str] = None
+        self.regions: List[dict] = []
+        self.config: dict = {}
+        self.health: dict = {}
+        self.catalog: Deque[dict] = deque(maxlen=catalog_size)  # 最近的截图记录
+        self.capture_count = 0
+        self.frame_count = 0
+        self.handler: Optional["_AgentHandler"] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "agent_id": self.agent_id,
+            "hostname": self.hostname,
+            "pid": self.pid,
+            "connected": self.connected,
+            "connected_at": self.connected_at,
+            "last_seen": self.last_seen,
+            "capture_count": self.capture_count,
+            "frame_count": self.frame_count,
+            "region_count": len(self.regions),
+            "health": self.health
+        }
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """一个代理连接"""
+
+    def setup(self):
+        super().setup()
+        self._send_lock = threading.Lock()
+
+    def send(self, message: dict):
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._send_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def handle(self):
+        coordinator: CoordinatorService = self.server.coordinator
+        record: Optional[AgentRecord] = None
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if message.get("type") == "register":
+                    record = coordinator._register(self, message)
+                    self.send({"type": "registered", "agent_id": record.agent_id})
+                elif record is None:
+                    print("[协调器] ⚠ 代理未注册就发送了消息，断开连接")
+                    return
+                else:
+                    coordinator._handle(record, message)
+        except (OSError, ValueError) as e:
+            print(f"[协调器] 代理连接异常: {e}")
+        finally:
+            if record is not None:
+                coordinator._disconnected(record, self)
+
+
+class _CoordinatorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CoordinatorService:
+    """协调器服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CoordinatorService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._lock = threading.Lock()
+        self.agents: Dict[str, AgentRecord] = {}
+        self.frames_dir = Path("coordinator_frames")
+        self.catalog_size = 1000
+        self._server: Optional[_CoordinatorServer] = None
+
+    def start(self, host: str = "0.0.0.0", port: int = 8765, frames_dir: Optional[str] = None,
+              catalog_size: int = 1000):
+        """在后台线程中监听代理连接"""
+        if frames_dir:
+            self.frames_dir = Path(frames_dir)
+        self.catalog_size = catalog_size
+        self._server = _CoordinatorServer((host, port), _AgentHandler)
+        self._server.coordinator = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[协调器] 正在监听代理连接: {host}:{self._server.server_address[1]}")
+
+    def stop(self):
+        """停止监听"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # ---------- 代理消息 ----------
+
+    def _register(self, handler: _AgentHandler, message: dict) -> AgentRecord:
+        agent_id = str(message.get("agent_id") or "unknown")
+        with self._lock:
+            record = self.agents.get(agent_id)
+            if record is None:
+                record = self.agents[agent_id] = AgentRecord(agent_id, self.catalog_size)
+            previous = record.handler
+            record.handler = handler
+            record.hostname = message.get("hostname", "")
+            record.pid = message.get("pid", 0)
+            record.regions = message.get("regions") or []
+            record.config = message.get("config") or {}
+            record.connected = True
+            record.connected_at = record.last_seen = datetime.now().isoformat()
+        if previous is not None and previous is not handler:
+            # 同名代理重新连接，关闭旧连接
+            try:
+                previous.connection.close()
+            except OSError:
+                pass
+        print(f"[协调器] ✓ 代理已注册: {agent_id} ({record.hostname}, pid={record.pid})")
+        return record
+
+    def _handle(self, record: AgentRecord, message: dict):
+        kind = message.get("type")
+        record.last_seen = datetime.now().isoformat()
+        if kind == "batch":
+            captures = message.get("captures") or []
+            for capture in captures:
+                frame = capture.pop("frame_b64", None)
+                if frame is not None:
+                    capture["frame_path"] = self._save_frame(record, capture, frame)
+            with self._lock:
+                record.catalog.extend(captures)
+                record.capture_count += len(captures)
+                record.frame_count += sum(1 for c in captures if c.get("frame_path"))
+            record.handler.send({"type": "ack", "seq": message.get("seq")})
+        elif kind == "health":
+            record.health = message.get("health") or {}
+
+    def _save_frame(self, record: AgentRecord, capture: dict, frame_b64: str) -> Optional[str]:
+        """保存代理上传的截图文件：{frames_dir}/{agent_id}/{文件名}（差分存储的帧保存为 {分段名}_{帧序号}.png）"""
+        try:
+            directory = self.frames_dir / re.sub(r"[^\w.-]", "_", record.agent_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            name = Path(capture.get("file_path", "frame.png")).name
+            if "#" in name:
+                name = name.replace(".lxd#", "_") + ".png"
+            path = directory / name
+            path.write_bytes(base64.b64decode(frame_b64))
+            return str(path)
+        except Exception as e:
+            print(f"[协调器] ✗ 保存代理截图失败: {e}")
+            return None
+
+    def _disconnected(self, record: AgentRecord, handler: _AgentHandler):
+        with self._lock:
+            if record.handler is not handler:
+                return
+            record.handler = None
+            record.connected = False
+        print(f"[协调器] 代理已断开: {record.agent_id}")
+
+    # ---------- 查询与下发 ----------
+
+    def get_agents(self) -> List[dict]:
+        """全部代理"""
+        with self._lock:
+            return [record.to_dict() for record in self.agents.values()]
+
+    def get_agent(self, agent_id: str) -> Optional[AgentRecord]:
+        """根据ID获取代理"""
+        return self.agents.get(agent_id)
+
+    def get_catalog(self, agent_id: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """最近的截图记录（不指定代理时汇总全部代理，按截取时间倒序）"""
+        with self._lock:
+            records = [self.agents[agent_id]] if agent_id else list(self.agents.values())
+            entries = [dict(capture, agent_id=record.agent_id) for record in records for capture in record.catalog]
+        entries.sort(key=lambda c: c.get("captured_at", ""), reverse=True)
+        return entries[:limit]
+
+    def get_health(self) -> dict:
+        """汇总健康状态"""
+        with self._lock:
+            records = list(self.agents.values())
+        return {
+            "agents": len(records),
+            "connected": sum(1 for r in records if r.connected),
+            "ready": sum(1 for r in records if r.connected and r.health.get("ready")),
+            "captures": sum(r.capture_count for r in records),
+            "frames": sum(r.frame_count for r in records)
+        }
+
+    def _push(self, agent_id: str, message: dict) -> bool:
+        record = self.agents.get(agent_id)
+        handler = record.handler if record else None
+        if handler is None:
+            return False
+        try:
+            handler.send(message)
+            return True
+        except (OSError, ValueError) as e:
+            # 连接已关闭时写入会抛出 ValueError（I/O operation on closed file），按断开处理
+            print(f"[协调器] ✗ 下发到代理 {agent_id} 失败: {e}")
+            self._disconnected(record, handler)
+            return False
+
+    def push_regions(self, agent_id: str, regions: List[dict]) -> bool:
+        """向代理下发选区（替换代理的全部选区），代理未连接时返回False"""
+        if not self._push(agent_id, {"type": "push_regions", "regions": regions}):
+            return False
+        self.agents[agent_id].regions = regions
+        return True
+
+    def push_config(self, agent_id: str, config: dict) -> bool:
+        """向代理下发配置（只包含需要修改的字段），代理未连接时返回False"""
+        if not self._push(agent_id, {"type": "push_config", "config": config}):
+            return False
+        self.agents[agent_id].config.update(config)
+        return True
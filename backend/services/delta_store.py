@@ -0,0 +1,304 @@
+"""
+差分存储：同一选区的连续截图大多只有少量像素变化，按关键帧 + 差分帧写入分段文件
+- 每个分段文件 {output_dir}/{name}_{时间戳}.lxd 以一个关键帧开始，之后是相对上一帧的差分帧
+- 差分帧把画面切成 tile_size x tile_size 的块，只保存变化块的位图和变化块的像素（zlib压缩）
+- 达到 delta_keyframe_interval 帧或画面尺寸变化时开始新的分段
+- 截图结果中的文件路径为帧引用 "{分段文件}#{帧序号}"，用 read_frame_ref / read_frame_png 还原
+
+文件格式（小端）:
+    文件头: b"LXD1"
+    每帧: 帧头 <BdHHBHI（类型 0=关键帧 1=差分帧、截取时间戳、宽、高、通道数、块大小、数据长度） + 数据
+    关键帧数据: zlib(原始像素)
+    差分帧数据: zlib(变化块位图(packbits) + 变化块像素)
+"""
+import io
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from backend.models import AppConfig
+from backend.services.config_service import ConfigService
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+STORAGE_MODES = ("png", "delta")
+MAGIC = b"LXD1"
+FRAME_HEADER = struct.Struct("<BdHHBHI")
+KEYFRAME = 0
+DELTA = 1
+SEGMENT_SUFFIX = ".lxd"
+# zlib压缩级别
+ZLIB_LEVEL = 6
+# 同时保持的写入器数量（每个选区输出路径一个，超出时关闭最久未写入的分段）
+MAX_WRITERS = 256
+# 块大小上限（帧头中为16位；每帧补齐到块大小的整数倍，块过大时补齐的像素远多于画面本身）
+MAX_TILE_SIZE = 1024
+# 通道数 -> PIL图片模式
+_MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+
+def validate_delta(config: AppConfig) -> Optional[str]:
+    """检查存储方式和差分存储配置，返回错误信息（合法时返回None）"""
+    if config.storage_mode not in STORAGE_MODES:
+        return f"storage_mode 必须是 {' / '.join(STORAGE_MODES)}"
+    if not 1 <= config.delta_tile_size <= MAX_TILE_SIZE:
+        return f"delta_tile_size 必须在 1 到 {MAX_TILE_SIZE} 之间"
+    if config.delta_keyframe_interval < 1:
+        return "delta_keyframe_interval 至少为1"
+    return None
+
+
+class FrameInfo(NamedTuple):
+    """分段文件中一帧的位置"""
+    kind: int
+    timestamp: float
+    width: int
+    height: int
+    channels: int
+    tile: int
+    offset: int  # 数据起始位置
+    length: int
+
+
+def to_array(img: 'Image.Image') -> 'np.ndarray':
+    """图片转换为 (高, 宽, 通道) uint8 数组"""
+    import numpy as np
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("L" if img.mode == "1" else "RGB")
+    frame = np.asarray(img, dtype=np.uint8)
+    return frame[:, :, None] if frame.ndim == 2 else frame
+
+
+def _padded(frame: 'np.ndarray', tile: int) -> 'np.ndarray':
+    """补齐到块大小的整数倍（右侧和下方补0）"""
+    import numpy as np
+    height, width = frame.shape[:2]
+    pad_h, pad_w = -height % tile, -width % tile
+    if pad_h or pad_w:
+        frame = np.pad(frame, ((0, pad_h), (0, pad_w), (0, 0)))
+    return np.ascontiguousarray(frame)
+
+
+def _tiles(frame: 'np.ndarray', tile: int) -> 'np.ndarray':
+    """补齐后的帧按块重排的视图 (行块数, 列块数, tile, tile, 通道)，对视图赋值会写回原帧"""
+    height, width, channels = frame.shape
+    return frame.reshape(height // tile, tile, width // tile, tile, channels).swapaxes(1, 2)
+
+
+def encode_delta(previous: 'np.ndarray', current: 'np.ndarray', tile: int) -> Tuple[bytes, int]:
+    """计算差分帧数据（两帧均已补齐），返回 (压缩数据, 变化块数)"""
+    import numpy as np
+    prev_tiles, cur_tiles = _tiles(previous, tile), _tiles(current, tile)
+    changed = (prev_tiles != cur_tiles).any(axis=(2, 3, 4))
+    payload = np.packbits(changed).tobytes() + np.ascontiguousarray(cur_tiles[changed]).tobytes()
+    return zlib.compress(payload, ZLIB_LEVEL), int(changed.sum())
+
+
+def apply_delta(frame: 'np.ndarray', data: bytes, tile: int):
+    """把差分帧数据应用到补齐后的帧（原地修改）"""
+    import numpy as np
+    tiles = _tiles(frame, tile)
+    rows, cols = tiles.shape[:2]
+    payload = zlib.decompress(data)
+    bitmap_size = -(-rows * cols // 8)
+    changed = np.unpackbits(np.frombuffer(payload, np.uint8, bitmap_size), count=rows * cols)
+    changed = changed.astype(bool).reshape(rows, cols)
+    tiles[changed] = np.frombuffer(payload, np.uint8, offset=bitmap_size).reshape(-1, *tiles.shape[2:])
+
+
+class _SegmentWriter:
+    """一个选区当前的分段文件及上一帧"""
+
+    def __init__(self, path: Path, tile: int):
+        import numpy as np
+        self.path = path
+        self.tile = tile
+        self.frames = 0
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.previous: Optional[np.ndarray] = None  # 补齐后的上一帧
+
+    def append(self, frame: 'np.ndarray', timestamp: float) -> Tuple[int, int]:
+        """追加一帧，返回 (帧序号, 写入字节数)"""
+        height, width, channels = frame.shape
+        padded = _padded(frame, self.tile)
+        if self.previous is None:
+            kind, data = KEYFRAME, zlib.compress(frame.tobytes(), ZLIB_LEVEL)
+        else:
+            kind, (data, _) = DELTA, encode_delta(self.previous, padded, self.tile)
+        header = FRAME_HEADER.pack(kind, timestamp, width, height, channels, self.tile, len(data))
+        with open(self.path, "ab") as f:
+            if self.frames == 0:
+                f.write(MAGIC)
+            f.write(header)
+            f.write(data)
+        self.previous = padded
+        self.shape = frame.shape
+        self.frames += 1
+        return self.frames - 1, len(header) + len(data)
+
+
+class DeltaStore:
+    """差分存储单例（按选区输出路径前缀保持写入器）"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DeltaStore, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self._writers: 'OrderedDict[str, _SegmentWriter]' = OrderedDict()
+        self._prefix_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"segments": 0, "keyframes": 0, "deltas": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def _new_segment_path(self, prefix: str, captured_at: datetime) -> Path:
+        base = f"{prefix}_{captured_at.strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+        path, count = Path(base + SEGMENT_SUFFIX), 0
+        while path.exists():
+            count += 1
+            path = Path(f"{base}_{count}{SEGMENT_SUFFIX}")
+        return path
+
+    def append(self, img: 'Image.Image', prefix: str, captured_at: Optional[datetime] = None) -> str:
+        """追加一帧到选区的当前分段（路径前缀 {output_dir}/{name}），返回帧引用 "{分段文件}#{帧序号}" """
+        captured_at = captured_at or datetime.now()
+        frame = to_array(img)
+        config = self.config_service.get_config()
+        with self._lock:
+            prefix_lock = self._prefix_locks.setdefault(prefix, threading.Lock())
+        with prefix_lock:
+            with self._lock:
+                writer = self._writers.get(prefix)
+                if writer is not None:
+                    self._writers.move_to_end(prefix)
+            # 首帧、达到关键帧间隔、尺寸或块大小变化时开始新的分段
+            if (writer is None or writer.frames >= max(config.delta_keyframe_interval, 1)
+                    or writer.shape != frame.shape or writer.tile != config.delta_tile_size):
+                writer = _SegmentWriter(self._new_segment_path(prefix, captured_at), config.delta_tile_size)
+                with self._lock:
+                    self._writers[prefix] = writer
+                    while len(self._writers) > MAX_WRITERS:
+                        evicted, _ = self._writers.popitem(last=False)
+                        self._prefix_locks.pop(evicted, None)
+                    self.stats["segments"] += 1
+            index, written = writer.append(frame, captured_at.timestamp())
+        with self._lock:
+            self.stats["keyframes" if index == 0 else "deltas"] += 1
+            self.stats["raw_bytes"] += frame.nbytes
+            self.stats["stored_bytes"] += written
+        return f"{writer.path}#{index}"
+
+    def get_stats(self) -> dict:
+        """写入统计（压缩比 = 原始像素字节数 / 写入字节数）"""
+        with self._lock:
+            stats = dict(self.stats, writers=len(self._writers))
+        stats["ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 1) if stats["stored_bytes"] else None
+        return stats
+
+
+class DeltaReader:
+    """
+    分段文件读取器：打开时只扫描帧头建立索引，按需还原任意一帧
+    缓存最近还原的一帧，顺序读取时每帧只需应用一次差分
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+        self.path = Path(path)
+        self.frames: List[FrameInfo] = []
+        self._cache: Optional[Tuple[int, np.ndarray]] = None  # (帧序号, 补齐后的帧)
+        size = self.path.stat().st_size
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是差分存储文件: {self.path}")
+            while True:
+                header = f.read(FRAME_HEADER.size)
+                if len(header) < FRAME_HEADER.size:
+                    break
+                kind, timestamp, width, height, channels, tile, length = FRAME_HEADER.unpack(header)
+                offset = f.tell()
+                if offset + length > size:
+                    break  # 最后一帧未写完整（如写入时进程退出）
+                f.seek(length, io.SEEK_CUR)
+                self.frames.append(FrameInfo(kind, timestamp, width, height, channels, tile, offset, length))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def _read_data(self, f, info: FrameInfo) -> bytes:
+        f.seek(info.offset)
+        return f.read(info.length)
+
+    def read_frame(self, index: int) -> 'np.ndarray':
+        """还原第index帧，返回 (高, 宽, 通道) uint8 数组"""
+        import numpy as np
+        if not 0 <= index < len(self.frames):
+            raise IndexError(f"帧序号超出范围: {index}（共 {len(self.frames)} 帧）")
+        target = self.frames[index]
+        # 从缓存帧或最近的关键帧开始应用差分
+        start = next(i for i in range(index, -1, -1) if self.frames[i].kind == KEYFRAME)
+        with open(self.path, "rb") as f:
+            if self._cache is not None and start <= self._cache[0] <= index:
+                position, frame = self._cache[0], self._cache[1].copy()
+            else:
+                info = self.frames[start]
+                raw = np.frombuffer(zlib.decompress(self._read_data(f, info)), np.uint8)
+                frame = _padded(raw.reshape(info.height, info.width, info.channels), info.tile)
+                position = start
+            for i in range(position + 1, index + 1):
+                apply_delta(frame, self._read_data(f, self.frames[i]), self.frames[i].tile)
+        self._cache = (index, frame)
+        return frame[:target.height, :target.width]
+
+    def iter_frames(self) -> Iterator[Tuple[FrameInfo, 'np.ndarray']]:
+        """按顺序还原全部帧"""
+        for i, info in enumerate(self.frames):
+            yield info, self.read_frame(i)
+
+    def read_image(self, index: int) -> 'Image.Image':
+        """还原第index帧为PIL图片"""
+        from PIL import Image
+        frame = self.read_frame(index)
+        return Image.fromarray(frame[:, :, 0] if frame.shape[2] == 1 else frame, _MODES[frame.shape[2]])
+
+
+def parse_frame_ref(ref: str) -> Tuple[str, int]:
+    """解析帧引用 "{分段文件}#{帧序号}" """
+    path, _, index = ref.rpartition("#")
+    if not path.endswith(SEGMENT_SUFFIX) or not index.isdigit():
+        raise ValueError(f"无效的帧引用: {ref}")
+    return path, int(index)
+
+
+def is_frame_ref(path: str) -> bool:
+    """是否为差分存储的帧引用"""
+    try:
+        parse_frame_ref(path)
+        return True
+    except ValueError:
+        return False
+
+
+def read_frame_ref(ref: str) -> 'Image.Image':
+    """按帧引用还原图片"""
+    path, index = parse_frame_ref(ref)
+    return DeltaReader(path).read_image(index)
+
+
+def read_frame_png(ref: str) -> bytes:
+    """按帧引用还原并编码为PNG"""
+    buffer = io.BytesIO()
+    read_frame_ref(ref).save(buffer, "PNG")
+    return buffer.getvalue()
@@ -0,0 +1,209 @@
+"""
+编码服务：把截图编码为PNG（自适应编码换用格式时为 JPEG / WebP）并写入文件
+- inline：在调用线程中直接编码（默认）
+- process：进程池编码。帧数据写入 multiprocessing.shared_memory 共享内存块，
+  跨进程只传递共享内存名称和尺寸等少量参数（不序列化像素数据），由子进程直接写文件
+"""
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, TYPE_CHECKING
+from backend.services.config_service import ConfigService
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# 共享内存块按1MB对齐分配，便于不同尺寸的帧复用
+SLAB_ALIGN = 1024 * 1024
+
+# 支持的编码格式 -> PIL格式名
+IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+# 文件扩展名
+FORMAT_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+# 子进程中已挂载的共享内存块（按名称缓存，避免每帧重新挂载）
+_worker_slabs: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _save_options(image_format: str, compress_level: int, quality: int) -> dict:
+    """各格式的编码参数（WebP 使用最快的编码方法，换用 WebP 是为了降低编码开销）"""
+    if image_format == "png":
+        return {"compress_level": compress_level}
+    if image_format == "webp":
+        return {"quality": quality, "method": 0}
+    return {"quality": quality}
+
+
+def _encode_slab(slab_name: str, mode: str, width: int, height: int, path: str, image_format: str,
+                 options: dict) -> str:
+    """子进程：从共享内存块读取帧数据，编码后写入文件"""
+    from PIL import Image
+    slab = _worker_slabs.get(slab_name)
+    if slab is None:
+        slab = shared_memory.SharedMemory(name=slab_name)
+        _worker_slabs[slab_name] = slab
+    size = width * height * len(mode)
+    view = slab.buf[:size]
+    try:
+        img = Image.frombuffer(mode, (width, height), view, "raw", mode, 0, 1)
+        img.save(path, IMAGE_FORMATS[image_format], **options)
+        del img
+    finally:
+        view.release()
+    return path
+
+
+def _completed(result) -> Future:
+    """返回一个已完成的Future（inline模式与process模式接口一致）"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class EncoderService:
+    """编码服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(EncoderService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._workers = 0
+        self._slabs: List[shared_memory.SharedMemory] = []  # 已分配的全部共享内存块
+        self._free_slabs: List[shared_memory.SharedMemory] = []  # 空闲的共享内存块
+        self._inflight: Optional[threading.BoundedSemaphore] = None  # 限制在途帧数（背压）
+        self._pending = 0  # 正在编码（含等待编码进程）的帧数
+
+    @property
+    def mode(self) -> str:
+        """当前编码模式"""
+        return "process" if self.config_service.get_config().encoder_mode == "process" else "inline"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """获取进程池（首次使用时创建）"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    workers = self.config_service.get_config().encoder_workers or os.cpu_count() or 1
+                    self._workers = workers
+                    self._inflight = threading.BoundedSemaphore(workers * 2)
+                    self._pool = ProcessPoolExecutor(max_workers=workers)
+                    print(f"[编码服务] 进程池已启动，进程数: {workers}")
+        return self._pool
+
+    def _acquire_slab(self, size: int) -> shared_memory.SharedMemory:
+        """取一个容量足够的空闲共享内存块，没有则新建"""
+        with self._lock:
+            candidates = [slab for slab in self._free_slabs if slab.size >= size]
+            if candidates:
+                slab = min(candidates, key=lambda s: s.size)
+                self._free_slabs.remove(slab)
+                return slab
+            slab = shared_memory.SharedMemory(create=True, size=-(-size // SLAB_ALIGN) * SLAB_ALIGN)
+            self._slabs.append(slab)
+            return slab
+
+    def _release_slab(self, slab: shared_memory.SharedMemory):
+        """归还共享内存块"""
+        with self._lock:
+            self._free_slabs.append(slab)
+        self._inflight.release()
+
+    def encode_png(self, img: 'Image.Image', path: str) -> Future:
+        """把图片按配置的压缩级别编码为PNG写入path，返回Future（结果为文件路径）"""
+        return self.encode_image(img, path)
+
+    def encode_image(self, img: 'Image.Image', path: str, image_format: str = "png",
+                     compress_level: Optional[int] = None, quality: int = 85) -> Future:
+        """
+        把图片编码为 image_format（png / jpeg / webp）写入path，返回Future（结果为文件路径）
+        compress_level 为空时使用配置的PNG压缩级别，quality 用于 jpeg / webp
+        process模式下在途帧数达到上限时阻塞，直到有帧编码完成
+        """
+        if compress_level is None:
+            compress_level = self.config_service.get_config().png_compress_level
+        options = _save_options(image_format, compress_level, quality)
+        if image_format != "png" and img.mode not in ("RGB", "L"):
+            # JPEG / WebP 不支持调色板和1位图片
+            img = img.convert("L" if img.mode == "1" else "RGB")
+        # 调色板和1位图片（选区变换的量化、二值化结果）数据量小，直接在当前线程编码
+        if self.mode != "process" or img.mode in ("P", "1"):
+            self._add_pending(1)
+            try:
+                img.save(path, IMAGE_FORMATS[image_format], **options)
+            finally:
+                self._add_pending(-1)
+            return _completed(path)
+
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        pool = self._get_pool()
+        self._inflight.acquire()
+        slab = None
+        try:
+            data = img.tobytes()
+            slab = self._acquire_slab(len(data))
+            slab.buf[:len(data)] = data
+            future = pool.submit(_encode_slab, slab.name, img.mode, img.width, img.height, path, image_format,
+                                 options)
+        except Exception:
+            if slab is not None:
+                self._release_slab(slab)
+            else:
+                self._inflight.release()
+            raise
+        self._add_pending(1)
+        future.add_done_callback(lambda _: (self._add_pending(-1), self._release_slab(slab)))
+        return future
+
+    def _add_pending(self, delta: int):
+        with self._lock:
+            self._pending += delta
+
+    @property
+    def pending(self) -> int:
+        """正在编码（含等待编码进程）的帧数"""
+        return self._pending
+
+    @property
+    def capacity(self) -> int:
+        """process模式下在途帧数上限（进程池未启动或inline模式为0）"""
+        return self._workers * 2 if self._pool is not None else 0
+
+    def get_stats(self) -> dict:
+        """获取编码服务状态"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self._workers,
+                "pending": self._pending,
+                "slabs": len(self._slabs),
+                "free_slabs": len(self._free_slabs),
+                "slab_bytes": sum(slab.size for slab in self._slabs)
+            }
+
+    def shutdown(self):
+        """关闭进程池并释放共享内存"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        with self._lock:
+            for slab in self._slabs:
+                try:
+                    slab.close()
+                    slab.unlink()
+                except Exception:
+                    pass
+            self._slabs = []
+            self._free_slabs = []
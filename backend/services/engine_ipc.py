@@ -0,0 +1,178 @@
+"""
+截图引擎的本地IPC（Unix socket，每行一个JSON消息）
+请求: {"id": 1, "method": "capture_all", "params": {...}}
+响应: {"id": 1, "result": ...} / {"id": 1, "result_b64": "..."}（bytes结果） / {"id": 1, "error": "...", "status": 404}
+一个连接上可以连续发送多个请求；客户端每个线程复用一个连接
+"""
+import base64
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import Any
+from backend.services.capture_engine import CaptureEngine, EngineError
+
+# 允许远程调用的引擎方法
+ENGINE_METHODS = {
+    "get_status", "get_stats", "get_encoder_stats", "reload_config", "reload_hotkeys",
+    "capture_all", "capture_region", "capture_group", "capture_burst", "preview_region", "preview_rect",
+    "get_captured_coords", "clear_captured_coords", "get_hotkey_status",
+    "read_frame", "probe_region", "get_probe_series", "get_probe_latest", "search_similar", "set_anchor", "clear_anchor", "get_anchor_status", "submit_job", "get_job", "list_jobs", "cancel_job", "wait_job",
+    "get_sink_stats", "drain_sink", "get_resources", "set_tracemalloc", "take_memory_snapshot", "diff_memory_snapshot",
+    "start_session", "stop_session", "get_active_session", "list_sessions", "get_session", "get_session_frames",
+    "list_timelapse_sheets", "read_timelapse_sheet", "get_timelapse_index"
+}
+# 重复执行没有副作用的方法：请求已发出但未收到响应时可以重连后重试（截图、探测、任务提交等不重试，避免执行两次）
+IDEMPOTENT_METHODS = {
+    "get_status", "get_stats", "get_encoder_stats", "reload_config", "reload_hotkeys",
+    "preview_region", "preview_rect", "get_captured_coords", "clear_captured_coords", "get_hotkey_status",
+    "read_frame", "get_probe_series", "get_probe_latest", "search_similar", "get_anchor_status",
+    "get_job", "list_jobs", "cancel_job", "wait_job", "get_sink_stats", "get_resources",
+    "get_active_session", "list_sessions", "get_session", "get_session_frames",
+    "list_timelapse_sheets", "read_timelapse_sheet", "get_timelapse_index"
+}
+
+
+class _EngineRequestHandler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接上的全部请求"""
+
+    def handle(self):
+        engine = self.server.engine
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get("id")
+                method = request.get("method")
+                if method not in ENGINE_METHODS:
+                    raise EngineError(404, f"未知的引擎方法: {method}")
+                result = getattr(engine, method)(**(request.get("params") or {}))
+                if isinstance(result, bytes):
+                    response = {"id": request_id, "result_b64": base64.b64encode(result).decode("ascii")}
+                else:
+                    response = {"id": request_id, "result": result}
+            except EngineError as e:
+                response = {"id": request_id, "error": e.detail, "status": e.status_code}
+            except Exception as e:
+                print(f"[引擎IPC] ✗ 调用失败: {e}")
+                import traceback
+                traceback.print_exc()
+                response = {"id": request_id, "error": f"引擎内部错误: {e}", "status": 500}
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class EngineServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """引擎IPC服务端（每个连接一个线程）"""
+    daemon_threads = True
+
+    def __init__(self, engine: CaptureEngine, socket_path: str):
+        self.engine = engine
+        self.socket_path = socket_path
+        # 清理上次异常退出遗留的socket文件
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _EngineRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class EngineClient:
+    """
+    引擎IPC客户端，方法与 CaptureEngine 一致
+    每个线程复用一个连接，连接断开（如引擎重启）时重连一次：请求未能发出时总是重试，
+    已发出但未收到响应时只重试 IDEMPOTENT_METHODS 中的方法（引擎可能已执行过该请求）
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 120):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        self._local.next_id = 0
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _send(self, method: str, params: dict):
+        sock = getattr(self._local, "sock", None) or self._connect()
+        self._local.next_id += 1
+        request = {"id": self._local.next_id, "method": method, "params": params}
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _receive(self) -> dict:
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("引擎连接已关闭")
+        return json.loads(line)
+
+    def call(self, method: str, **params) -> Any:
+        """调用引擎方法"""
+        try:
+            try:
+                self._send(method, params)
+            except ConnectionError:
+                # 连接可能已被引擎重启断开，请求没有发出，重连后重试一次
+                self._close()
+                self._send(method, params)
+            try:
+                response = self._receive()
+            except ConnectionError:
+                # 请求已发出，引擎可能已经执行，只有无副作用的方法才重试
+                if method not in IDEMPOTENT_METHODS:
+                    raise
+                self._close()
+                self._send(method, params)
+                response = self._receive()
+        except OSError as e:
+            self._close()
+            raise EngineError(503, f"截图引擎不可用: {e}")
+
+        if "error" in response:
+            raise EngineError(response.get("status", 500), response["error"])
+        if "result_b64" in response:
+            return base64.b64decode(response["result_b64"])
+        return response.get("result")
+
+    def __getattr__(self, name: str):
+        if name in ENGINE_METHODS:
+            return lambda **params: self.call(name, **params)
+        raise AttributeError(name)
+
+
+def serve_engine(engine: CaptureEngine, socket_path: str) -> EngineServer:
+    """在后台线程中启动引擎IPC服务端"""
+    server = EngineServer(engine, socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[引擎IPC] 正在监听: {socket_path}")
+    return server
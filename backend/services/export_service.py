@@ -0,0 +1,67 @@
+"""
+导出服务：把输出目录中的截图打包为zip文件
+"""
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+from backend.services.encoder_service import FORMAT_EXTENSIONS
+from backend.services.timelapse_service import TIMELAPSE_DIR
+
+
+def find_screenshots(source_dir: str, region_name: Optional[str] = None,
+                     since: Optional[float] = None, until: Optional[float] = None) -> List[Path]:
+    """
+    查找截图文件（包括子目录，如连拍目录；包括自适应编码换用格式保存的文件和差分存储的分段文件；不包括延时拼图），按修改时间排序
+    region_name: 只包含该选区的截图（文件名以 "{region_name}_" 开头）
+    since / until: 修改时间范围（时间戳）
+    """
+    root = Path(source_dir)
+    if not root.is_dir():
+        return []
+    files = []
+    patterns = [f"*{extension}" for extension in FORMAT_EXTENSIONS.values()] + ["*.lxd"]
+    for path in [path for pattern in patterns for path in sorted(root.rglob(pattern))]:
+        if region_name and not path.name.startswith(f"{region_name}_"):
+            continue
+        if path.relative_to(root).parts[0] == TIMELAPSE_DIR:
+            continue
+        mtime = path.stat().st_mtime
+        if (since is not None and mtime < since) or (until is not None and mtime > until):
+            continue
+        files.append((mtime, path))
+    files.sort()
+    return [path for _, path in files]
+
+
+def export_archive(source_dir: str, archive_dir: str, region_name: Optional[str] = None,
+                   since: Optional[float] = None, until: Optional[float] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    把符合条件的截图打包到 {archive_dir}/export_{时间}.zip（PNG已压缩，zip中只存储不再压缩）
+    progress(已打包数, 总数) 每个文件调用一次，抛出异常时删除未完成的压缩包
+    """
+    files = find_screenshots(source_dir, region_name, since, until)
+    archive_root = Path(archive_dir)
+    archive_root.mkdir(parents=True, exist_ok=True)
+    archive_path = archive_root / datetime.now().strftime("export_%Y%m%d_%H%M%S_%f.zip")
+
+    root = Path(source_dir)
+    total_bytes = 0
+    try:
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            for i, path in enumerate(files, start=1):
+                archive.write(path, path.relative_to(root).as_posix())
+                total_bytes += path.stat().st_size
+                if progress is not None:
+                    progress(i, len(files))
+    except BaseException:
+        archive_path.unlink(missing_ok=True)
+        raise
+
+    print(f"[导出] ✓ 已导出 {len(files)} 个文件 -> {archive_path}")
+    return {
+        "archive_path": str(archive_path),
+        "files": len(files),
+        "bytes": total_bytes
+    }
@@ -0,0 +1,72 @@
+"""
+最近截图缓存：保存各显示器最近几次截取的画面（截取时间 + 虚拟屏幕坐标）
+预览等不需要保存文件的请求，在画面足够新时直接从缓存裁剪，避免重新截屏
+画面按虚拟屏幕坐标（逻辑尺寸）匹配，裁剪时按图片像素尺寸与逻辑尺寸之比换算（HiDPI显示器）
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
+from backend.services.capture_plan import scale_box
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class CachedFrame(NamedTuple):
+    """一次截取的画面"""
+    monitor: int  # 所在显示器序号（跨显示器或不在任何显示器上为0）
+    grabbed_at: float  # time.monotonic()
+    left: int
+    top: int
+    width: int  # 截取区域的逻辑尺寸（HiDPI显示器上小于图片的像素尺寸）
+    height: int
+    image: 'Image.Image'
+
+    def contains(self, x1: int, y1: int, x2: int, y2: int) -> bool:
+        return (self.left <= x1 and self.top <= y1
+                and x2 <= self.left + self.width and y2 <= self.top + self.height)
+
+
+class FrameCache:
+    """按显示器保存最近的截图（每个显示器最多 size 个，图片在调用者之间共享，不得原地修改）"""
+
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._lock = threading.Lock()
+        self._frames: Dict[int, Deque[CachedFrame]] = {}
+        self.stats = {"stored": 0, "hits": 0, "misses": 0}
+
+    def put(self, monitor: int, left: int, top: int, width: int, height: int, image: 'Image.Image'):
+        """保存一次截取的画面（left, top, width, height 为截取区域的虚拟屏幕坐标和逻辑尺寸）"""
+        with self._lock:
+            frames = self._frames.get(monitor)
+            if frames is None or frames.maxlen != self.size:
+                frames = self._frames[monitor] = deque(frames or (), maxlen=self.size)
+            frames.append(CachedFrame(monitor, time.monotonic(), left, top, width, height, image))
+            self.stats["stored"] += 1
+
+    def get(self, rect: Tuple[int, int, int, int], max_age: float) -> Optional['Image.Image']:
+        """取覆盖矩形（规范化坐标）且截取时间在 max_age 秒以内的最新画面，返回裁剪后的图片"""
+        x1, y1, x2, y2 = rect
+        oldest = time.monotonic() - max_age
+        with self._lock:
+            candidates = [frame for frames in self._frames.values() for frame in frames
+                          if frame.grabbed_at >= oldest and frame.contains(x1, y1, x2, y2)]
+            if not candidates:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        frame = max(candidates, key=lambda f: f.grabbed_at)
+        box = scale_box((x1 - frame.left, y1 - frame.top, x2 - frame.left, y2 - frame.top),
+                        frame.image.width / frame.width, frame.image.height / frame.height)
+        return frame.image if box == (0, 0, frame.image.width, frame.image.height) else frame.image.crop(box)
+
+    def clear(self):
+        """清空缓存（如显示器布局变化）"""
+        with self._lock:
+            self._frames.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, cached=sum(len(frames) for frames in self._frames.values()))
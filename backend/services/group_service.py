@@ -0,0 +1,122 @@
+"""
+分组服务：负责选区分组的CRUD操作（与regions.json同目录存放groups.json）
+"""
+import json
+import threading
+import uuid
+from pathlib import Path
+from datetime import datetime
+from typing import List, Optional, Tuple
+from backend.models import RegionGroup, RegionGroupCreate, RegionGroupUpdate
+from backend.services.region_service import _file_signature
+
+GROUPS_FILE = "groups.json"
+
+
+class GroupService:
+    """分组服务"""
+    # 所有实例共享的分组文件解析结果：文件签名未变化时跳过重新解析
+    _loaded_signature: Optional[Tuple[int, int]] = None
+    _loaded_groups: List[RegionGroup] = []
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.groups: List[RegionGroup] = []
+        self.load_groups()
+
+    def load_groups(self):
+        """从文件加载分组（文件未变化时直接复用上次的解析结果）"""
+        cls = GroupService
+        groups_path = Path(GROUPS_FILE)
+        signature = _file_signature(groups_path)
+        with cls._lock:
+            if signature is not None and signature == cls._loaded_signature:
+                self.groups = list(cls._loaded_groups)
+                return
+        if signature is not None:
+            try:
+                with open(groups_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    self.groups = [RegionGroup(**item) for item in data]
+            except Exception as e:
+                print(f"加载分组失败: {e}")
+                self.groups = []
+                signature = None
+        else:
+            self.groups = []
+        self._remember(signature)
+
+    def _remember(self, signature: Optional[Tuple[int, int]]):
+        """记录当前分组为共享解析结果"""
+        cls = GroupService
+        with cls._lock:
+            cls._loaded_signature = signature
+            cls._loaded_groups = list(self.groups)
+
+    def save_groups(self) -> bool:
+        """保存分组到文件"""
+        try:
+            with open(GROUPS_FILE, 'w', encoding='utf-8') as f:
+                data = [group.to_dict() for group in self.groups]
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._remember(_file_signature(Path(GROUPS_FILE)))
+            return True
+        except Exception as e:
+            print(f"保存分组失败: {e}")
+            return False
+
+    def get_all_groups(self) -> List[RegionGroup]:
+        """获取所有分组"""
+        return self.groups
+
+    def get_group_by_id(self, group_id: str) -> Optional[RegionGroup]:
+        """根据ID获取分组"""
+        for group in self.groups:
+            if group.id == group_id:
+                return group
+        return None
+
+    def create_group(self, group_data: RegionGroupCreate) -> RegionGroup:
+        """创建分组"""
+        group = RegionGroup(
+            id=str(uuid.uuid4()),
+            name=group_data.name,
+            region_ids=list(group_data.region_ids),
+            hotkey=group_data.hotkey or None,
+            screenshot_interval=group_data.screenshot_interval,
+            output_dir=group_data.output_dir or None,
+            created_at=datetime.now().isoformat()
+        )
+        self.groups.append(group)
+        self.save_groups()
+        return group
+
+    def update_group(self, group_id: str, group_data: RegionGroupUpdate) -> Optional[RegionGroup]:
+        """更新分组"""
+        group = self.get_group_by_id(group_id)
+        if group is None:
+            return None
+
+        if group_data.name is not None:
+            group.name = group_data.name
+        if group_data.region_ids is not None:
+            group.region_ids = list(group_data.region_ids)
+        if group_data.hotkey is not None:
+            group.hotkey = group_data.hotkey or None
+        if group_data.screenshot_interval is not None:
+            group.screenshot_interval = group_data.screenshot_interval
+        if group_data.output_dir is not None:
+            group.output_dir = group_data.output_dir or None
+
+        self.save_groups()
+        return group
+
+    def delete_group(self, group_id: str) -> bool:
+        """删除分组"""
+        group = self.get_group_by_id(group_id)
+        if group is None:
+            return False
+
+        self.groups.remove(group)
+        self.save_groups()
+        return True
@@ -0,0 +1,367 @@
+"""
+感知哈希索引：为每张保存的截图计算感知哈希，按选区建立BK树，按汉明距离查找相似的历史截图
+- pHash：32x32灰度图做二维DCT（NumPy矩阵乘法），取左上8x8低频系数与中位数比较，得到64位哈希
+- dHash：9x8灰度图相邻像素比较，得到64位哈希（随结果返回，用于辅助判断）
+- 提交时只把截图缩小为计算哈希用的小灰度图，DCT在后台线程中计算，不阻塞截图保存，队列也不持有原图；记录追加写入 {output_dir}/hash_index.jsonl，重启后重新载入
+- 记录数超过 hash_index_max_entries 时淘汰最早的 10%，重建BK树并压缩索引文件
+"""
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from backend.services.config_service import ConfigService
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+INDEX_FILE = "hash_index.jsonl"
+# 待计算哈希的截图队列上限（超出时丢弃，不阻塞截图）
+QUEUE_MAX = 1000
+# 超过记录数上限时一次淘汰的比例（分批淘汰，避免每次加入都重建BK树）
+EVICT_FRACTION = 0.1
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """n点DCT-II变换矩阵"""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _gray(img: 'Image.Image', size: Tuple[int, int]) -> np.ndarray:
+    from PIL import Image
+    return np.asarray(img.convert("L").resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0), dtype=np.float32)
+
+
+def hash_inputs(img: 'Image.Image') -> Tuple[np.ndarray, np.ndarray]:
+    """计算哈希所需的缩小灰度图：(pHash用的32x32, dHash用的9x8)"""
+    gray = img.convert("L")
+    return _gray(gray, (32, 32)), _gray(gray, (9, 8))
+
+
+def _phash_pixels(pixels: np.ndarray) -> int:
+    coefficients = _DCT32 @ pixels @ _DCT32.T
+    low = coefficients[:8, :8].ravel()
+    # 直流分量不参与中位数计算
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def _dhash_pixels(pixels: np.ndarray) -> int:
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(img: 'Image.Image') -> int:
+    """64位pHash"""
+    return _phash_pixels(_gray(img, (32, 32)))
+
+
+def dhash(img: 'Image.Image') -> int:
+    """64位dHash"""
+    return _dhash_pixels(_gray(img, (9, 8)))
+
+
+def hamming(a: int, b: int) -> int:
+    """汉明距离"""
+    return (a ^ b).bit_count()
+
+
+class HashEntry(NamedTuple):
+    """一张已索引的截图"""
+    id: int
+    region_id: Optional[str]
+    region_name: str
+    file_path: str
+    captured_at: str
+    phash: int
+    dhash: int
+
+    def to_dict(self, distance: Optional[int] = None) -> dict:
+        result = {
+            "id": self.id,
+            "region_id": self.region_id,
+            "region_name": self.region_name,
+            "file_path": self.file_path,
+            "captured_at": self.captured_at,
+            "phash": f"{self.phash:016x}",
+            "dhash": f"{self.dhash:016x}"
+        }
+        if distance is not None:
+            result["distance"] = distance
+        return result
+
+
+class BKTree:
+    """BK树：按汉明距离组织哈希，查询时利用三角不等式剪枝"""
+
+    def __init__(self):
+        # 节点: [哈希, 该哈希的截图列表, {距离: 子节点}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int, entry: HashEntry):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [entry], {}]
+            return
+        node = self._root
+        while True:
+            distance = (value ^ node[0]).bit_count()
+            if distance == 0:
+                node[1].append(entry)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [entry], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, HashEntry]]:
+        """距离不超过 max_distance 的全部截图 (距离, 截图)"""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = (value ^ node[0]).bit_count()
+            if distance <= max_distance:
+                results.extend((distance, entry) for entry in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+
+class HashIndexService:
+    """感知哈希索引单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HashIndexService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        # 载入、追加和压缩索引文件的锁（载入完成前其他线程等待，不会看到载入了一半的索引）
+        self._file_lock = threading.Lock()
+        self._trees: Dict[str, BKTree] = {}  # 选区名称 -> BK树
+        self._entries: Dict[int, HashEntry] = {}
+        self._paths: Dict[str, int] = {}  # 文件路径 -> 截图ID
+        self._next_id = 1
+        self._index_path: Optional[Path] = None
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=QUEUE_MAX)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"indexed": 0, "dropped": 0, "errors": 0, "searches": 0, "evicted": 0}
+
+    # ---------- 索引 ----------
+
+    def _ensure_loaded(self):
+        """首次使用时载入输出目录中的索引文件（载入完成后才记录索引文件路径）"""
+        index_path = Path(self.config_service.get_config().output_dir) / INDEX_FILE
+        if self._index_path == index_path:
+            return
+        with self._file_lock:
+            if self._index_path == index_path:
+                return
+            with self._lock:
+                self._trees.clear()
+                self._entries.clear()
+                self._paths.clear()
+                self._next_id = 1
+            loaded = 0
+            if index_path.exists():
+                with open(index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            item = json.loads(line)
+                            self._insert(item.get("region_id"), item["region_name"], item["file_path"],
+                                         item["captured_at"], int(item["phash"], 16), int(item["dhash"], 16))
+                            loaded += 1
+                        except (ValueError, KeyError):
+                            continue
+                print(f"[哈希索引] 已载入 {loaded} 条记录: {index_path}")
+            self._index_path = index_path
+            self._enforce_limit()
+
+    def _enforce_limit(self):
+        """记录数超过上限时淘汰最早的记录，重建BK树并压缩索引文件（调用者持有 _file_lock）"""
+        limit = self.config_service.get_config().hash_index_max_entries
+        with self._lock:
+            if limit <= 0 or len(self._entries) <= limit:
+                return
+            count = len(self._entries) - limit + int(limit * EVICT_FRACTION)
+            # 字典按插入顺序（即截图ID顺序）排列，开头的就是最早的记录
+            for entry in list(itertools.islice(self._entries.values(), count)):
+                del self._entries[entry.id]
+                self._paths.pop(entry.file_path, None)
+            self._trees.clear()
+            for entry in self._entries.values():
+                self._trees.setdefault(entry.region_name, BKTree()).add(entry.phash, entry)
+            records = []
+            for entry in self._entries.values():
+                record = entry.to_dict()
+                del record["id"]
+                records.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stats["evicted"] += count
+        try:
+            temp_path = self._index_path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.writelines(records)
+            os.replace(temp_path, self._index_path)
+        except OSError as e:
+            print(f"[哈希索引] ⚠ 压缩索引文件失败: {e}")
+        print(f"[哈希索引] 已淘汰最早的 {count} 条记录，保留 {len(records)} 条")
+
+    def _insert(self, region_id: Optional[str], region_name: str, file_path: str, captured_at: str,
+                phash_value: int, dhash_value: int) -> Optional[HashEntry]:
+        with self._lock:
+            if file_path in self._paths:
+                return None
+            entry = HashEntry(self._next_id, region_id, region_name, file_path, captured_at, phash_value, dhash_value)
+            self._next_id += 1
+            self._entries[entry.id] = entry
+            self._paths[file_path] = entry.id
+            self._trees.setdefault(region_name, BKTree()).add(phash_value, entry)
+        return entry
+
+    def add(self, img: 'Image.Image', region_id: Optional[str], region_name: str, file_path: str,
+            captured_at: Optional[datetime] = None) -> Optional[HashEntry]:
+        """计算截图的哈希并加入索引（同一文件只索引一次）"""
+        return self._add_inputs(hash_inputs(img), region_id, region_name, file_path, captured_at)
+
+    def _add_inputs(self, inputs: Tuple[np.ndarray, np.ndarray], region_id: Optional[str], region_name: str,
+                    file_path: str, captured_at: Optional[datetime] = None) -> Optional[HashEntry]:
+        """由 hash_inputs 的结果计算哈希并加入索引"""
+        self._ensure_loaded()
+        entry = self._insert(region_id, region_name, file_path, (captured_at or datetime.now()).isoformat(),
+                             _phash_pixels(inputs[0]), _dhash_pixels(inputs[1]))
+        if entry is None:
+            return None
+        record = entry.to_dict()
+        del record["id"]
+        with self._file_lock:
+            try:
+                self._index_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self._index_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"[哈希索引] ⚠ 写入索引文件失败: {e}")
+            self._enforce_limit()
+        self.stats["indexed"] += 1
+        return entry
+
+    def submit(self, img: 'Image.Image', region_id: Optional[str], region_name: str, file_path: str,
+               captured_at: Optional[datetime] = None):
+        """提交到后台线程计算哈希（队列中只保存缩小后的灰度图，队列已满时丢弃）"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, daemon=True)
+                    self._thread.start()
+        if self._queue.full():
+            self.stats["dropped"] += 1
+            return
+        try:
+            inputs = hash_inputs(img)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[哈希索引] ✗ 缩小截图失败: {e}")
+            return
+        try:
+            self._queue.put_nowait((inputs, region_id, region_name, file_path, captured_at))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._add_inputs(*item)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[哈希索引] ✗ 计算哈希失败: {e}")
+
+    def rebuild(self, source_dir: Optional[str] = None, progress=None) -> dict:
+        """把目录中尚未索引的截图加入索引（选区名称取自文件名 {选区名}_{日期}_{时间}_{毫秒}.png，也包括 .jpg / .webp）"""
+        from PIL import Image
+        self._ensure_loaded()
+        root = Path(source_dir or self.config_service.get_config().output_dir)
+        with self._lock:
+            known = set(self._paths)
+        from backend.services.encoder_service import FORMAT_EXTENSIONS
+        from backend.services.timelapse_service import TIMELAPSE_DIR
+        # 不包括延时拼图
+        files = [path for extension in FORMAT_EXTENSIONS.values() for path in sorted(root.rglob(f"*{extension}"))
+                 if str(path) not in known and path.relative_to(root).parts[0] != TIMELAPSE_DIR]
+        added = 0
+        for i, path in enumerate(files, start=1):
+            parts = path.stem.split("_")
+            if len(parts) >= 4:
+                try:
+                    captured_at = datetime.strptime("_".join(parts[-3:]), "%Y%m%d_%H%M%S_%f")
+                    name = "_".join(parts[:-3])
+                except ValueError:
+                    captured_at, name = datetime.fromtimestamp(path.stat().st_mtime), path.stem
+                with Image.open(path) as img:
+                    if self.add(img, None, name, str(path), captured_at) is not None:
+                        added += 1
+            if progress is not None:
+                progress(i, len(files))
+        return {"scanned": len(files), "indexed": added}
+
+    # ---------- 查询 ----------
+
+    def get_entry(self, capture_id: int) -> Optional[HashEntry]:
+        self._ensure_loaded()
+        return self._entries.get(capture_id)
+
+    def find_by_path(self, file_path: str) -> Optional[HashEntry]:
+        self._ensure_loaded()
+        capture_id = self._paths.get(file_path)
+        return None if capture_id is None else self._entries.get(capture_id)
+
+    def search(self, phash_value: int, region_name: Optional[str] = None, max_distance: int = 10,
+               limit: int = 5, exclude_id: Optional[int] = None) -> Dict[str, List[dict]]:
+        """按pHash查找相似截图：各选区距离最近的 limit 张（距离相同时较新的在前）"""
+        self._ensure_loaded()
+        start = time.perf_counter()
+        with self._lock:
+            if region_name:
+                tree = self._trees.get(region_name)
+                trees = {region_name: tree} if tree is not None else {}
+            else:
+                trees = dict(self._trees)
+            results = {}
+            for name, tree in trees.items():
+                matches = [(d, e) for d, e in tree.search(phash_value, max_distance) if e.id != exclude_id]
+                matches.sort(key=lambda m: (m[0], -m[1].id))
+                if matches:
+                    results[name] = [entry.to_dict(distance) for distance, entry in matches[:limit]]
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return results
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), regions=len(self._trees),
+                        queued=self._queue.qsize())
@@ -0,0 +1,153 @@
+"""
+热键分发器：把热键回调从输入钩子线程转交到后台线程池执行
+- 钩子线程中只记录按下时间并提交任务，立即返回，不阻塞系统按键投递
+- 合并（coalesce）：每个热键同一时间最多一个回调在执行，执行期间的重复按下合并为一次后续执行
+- 防抖（debounce）：间隔小于阈值的连续按下直接丢弃（长按自动重复）
+- 统计从按下到回调开始执行的延迟
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from backend.services.config_service import ConfigService
+
+
+class _HotkeyState:
+    """单个热键的分发状态与统计"""
+
+    def __init__(self, name: str, callback: Callable):
+        self.name = name
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.running = False  # 合并模式下是否有回调正在执行（或已提交待执行）
+        self.pending_press: Optional[float] = None  # 执行期间合并的按下时间
+        self.last_press: Optional[float] = None
+        # 统计
+        self.presses = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.debounced = 0
+        self.errors = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.last_latency_ms: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "presses": self.presses,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "debounced": self.debounced,
+            "errors": self.errors,
+            "running": self.running,
+            "last_latency_ms": self.last_latency_ms,
+            "avg_latency_ms": round(self.latency_total_ms / self.executed, 3) if self.executed else None,
+            "max_latency_ms": round(self.latency_max_ms, 3),
+            "last_duration_ms": self.last_duration_ms
+        }
+
+
+class HotkeyDispatcher:
+    """热键分发器"""
+
+    def __init__(self):
+        self.config_service = ConfigService()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._states: Dict[str, _HotkeyState] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取线程池（首次使用时创建）"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    workers = max(1, self.config_service.get_config().hotkey_dispatch_workers)
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hotkey-dispatch")
+        return self._executor
+
+    def wrap(self, name: str, callback: Callable) -> Callable:
+        """包装热键回调，返回可直接交给热键库的轻量函数"""
+        state = _HotkeyState(name, callback)
+        self._states[name] = state
+
+        def on_press(*_args):
+            self._on_press(state)
+
+        return on_press
+
+    def remove(self, name: str):
+        """移除热键（正在执行的回调不受影响）"""
+        self._states.pop(name, None)
+
+    def _on_press(self, state: _HotkeyState):
+        """在钩子线程中调用：只做判断和提交，不执行回调"""
+        now = time.perf_counter()
+        config = self.config_service.get_config()
+        with state.lock:
+            state.presses += 1
+            # 防抖：长按产生的自动重复按下直接丢弃
+            if (config.hotkey_debounce_ms > 0 and state.last_press is not None
+                    and (now - state.last_press) * 1000 < config.hotkey_debounce_ms):
+                state.last_press = now
+                state.debounced += 1
+                return
+            state.last_press = now
+
+            # 合并：已有回调在执行时，只记录一次待执行
+            if config.hotkey_coalesce:
+                if state.running:
+                    if state.pending_press is None:
+                        state.pending_press = now
+                    else:
+                        state.coalesced += 1
+                    return
+                state.running = True
+
+        try:
+            self._get_executor().submit(self._run, state, now, config.hotkey_coalesce)
+        except RuntimeError as e:
+            # 线程池已关闭（应用退出中）
+            with state.lock:
+                state.running = False
+            print(f"[热键分发] ✗ 提交失败 {state.name}: {e}")
+
+    def _run(self, state: _HotkeyState, press_time: float, coalesce: bool):
+        """在线程池中执行回调；合并模式下执行完后处理期间累积的按下"""
+        while True:
+            start = time.perf_counter()
+            latency_ms = (start - press_time) * 1000
+            try:
+                state.callback()
+            except Exception as e:
+                state.errors += 1
+                print(f"[热键分发] ✗ 回调执行错误 {state.name}: {e}")
+                import traceback
+                traceback.print_exc()
+
+            with state.lock:
+                state.executed += 1
+                state.latency_total_ms += latency_ms
+                state.latency_max_ms = max(state.latency_max_ms, latency_ms)
+                state.last_latency_ms = round(latency_ms, 3)
+                state.last_duration_ms = round((time.perf_counter() - start) * 1000, 3)
+                if not coalesce:
+                    return
+                if state.pending_press is not None:
+                    press_time = state.pending_press
+                    state.pending_press = None
+                    continue
+                state.running = False
+                return
+
+    def get_stats(self) -> Dict[str, dict]:
+        """获取各热键的分发统计"""
+        return {name: state.to_dict() for name, state in list(self._states.items())}
+
+    def shutdown(self):
+        """关闭线程池（不等待正在执行的回调）"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -4,27 +4,46 @@
 """
 import platform
 import threading
+from functools import lru_cache
 from typing import Callable, Optional, Dict, Tuple
 from backend.services.config_service import ConfigService
+from backend.services.hotkey_dispatcher import HotkeyDispatcher
+from backend.utils.hotkey_parser import ChordMatcher, parse_hotkey
 
 IS_WINDOWS = platform.system() == 'Windows'
 
-# 尝试导入keyboard库（更可靠）
-KEYBOARD_AVAILABLE = False
+# 热键库在首次使用时才导入（见 detect_hotkey_backend），避免拖慢启动
 kb_lib = None
 keyboard = None
 
-try:
-    import keyboard as kb_lib
-    KEYBOARD_AVAILABLE = True
-    print("[热键服务] ✓ keyboard库可用（推荐）")
-except ImportError:
-    print("[热键服务] keyboard库不可用，使用pynput")
+
+@lru_cache(maxsize=None)
+def detect_hotkey_backend() -> str:
+    """
+    检测可用的热键库（首次调用时导入并缓存结果）
+    返回: 'keyboard' / 'win32' / 'pynput' / 'none'
+    """
+    global kb_lib, keyboard
+    # 优先尝试keyboard库（更可靠）
+    try:
+        import keyboard as _kb_lib
+        kb_lib = _kb_lib
+        print("[热键服务] ✓ keyboard库可用（推荐）")
+        return 'keyboard'
+    except ImportError:
+        print("[热键服务] keyboard库不可用，使用pynput")
+
     try:
-        from pynput import keyboard
+        from pynput import keyboard as _pynput_keyboard
+        keyboard = _pynput_keyboard
     except ImportError:
         print("[热键服务] ✗ pynput也不可用！")
 
+    # Windows平台尝试使用win32实现（备选）
+    if IS_WINDOWS:
+        return 'win32'
+    return 'pynput' if keyboard is not None else 'none'
+
 
 class HotkeyService:
     """热键服务（跨平台）"""
@@ -34,82 +53,104 @@ class HotkeyService:
         self.hotkey_handlers: Dict[str, Callable] = {}
         self.is_listening = False
         self.listener = None  # pynput的Listener
-        self.hotkeys: Dict[str, any] = {}  # pynput的HotKey
+        self.hotkeys: Dict[str, any] = {}  # pynput实现已注册的组合键
+        self.chord_matcher = ChordMatcher()  # pynput实现的组合键匹配器
+        self._pynput_modifier_names = None
         # 存储坐标采集的临时数据
         self.captured_coords: Dict[str, Optional[Tuple[int, int]]] = {
             'top_left': None,
             'bottom_right': None
         }
         
-        # 优先使用keyboard库（更可靠）
-        self.use_keyboard = KEYBOARD_AVAILABLE
         self.keyboard_hotkeys = {}  # 存储keyboard库注册的热键ID
+        # 热键回调统一经分发器转交线程池执行，钩子线程立即返回
+        self.dispatcher = HotkeyDispatcher()
         
-        # Windows平台尝试使用win32实现（备选）
-        self.win32_service = None
-        if IS_WINDOWS and not KEYBOARD_AVAILABLE:
-            try:
-                from backend.services.hotkey_service_win32 import HotkeyServiceWin32
-                self.win32_service = HotkeyServiceWin32()
-                print("[热键服务] 使用Windows Win32实现")
-            except Exception as e:
-                print(f"[热键服务] Win32实现不可用: {e}")
-                self.win32_service = None
+        # 热键库延迟到首次注册/监听时才检测和加载
+        self._backend: Optional[str] = None
+        self._win32_service = None
+        self._backend_lock = threading.Lock()
+
+    def _ensure_backend(self) -> str:
+        """确保热键库已加载，返回当前使用的实现名称"""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    backend = detect_hotkey_backend()
+                    if backend == 'win32':
+                        try:
+                            from backend.services.hotkey_service_win32 import HotkeyServiceWin32
+                            self._win32_service = HotkeyServiceWin32()
+                            print("[热键服务] 使用Windows Win32实现")
+                        except Exception as e:
+                            print(f"[热键服务] Win32实现不可用: {e}")
+                            self._win32_service = None
+                            backend = 'pynput' if keyboard is not None else 'none'
+                    self._backend = backend
+        return self._backend
+
+    @property
+    def backend_name(self) -> str:
+        """当前使用的热键实现"""
+        return self._ensure_backend()
+
+    @property
+    def use_keyboard(self) -> bool:
+        """是否使用keyboard库"""
+        return self._ensure_backend() == 'keyboard'
+
+    @property
+    def win32_service(self):
+        """Windows Win32实现（仅在keyboard库不可用时启用）"""
+        self._ensure_backend()
+        return self._win32_service
 
     def _parse_hotkey_keyboard(self, hotkey_str: str) -> str:
-        """解析热键字符串为keyboard库格式"""
-        # keyboard库使用 '+' 连接，格式如 'ctrl+alt+1'
-        # 直接返回，但需要规范化
-        parts = [p.strip().lower() for p in hotkey_str.split('+')]
-        # 规范化修饰键名称
-        normalized = []
-        for part in parts:
-            if part == 'control' or part == 'ctrl':
-                normalized.append('ctrl')
-            elif part == 'alt':
-                normalized.append('alt')
-            elif part == 'shift':
-                normalized.append('shift')
-            elif part == 'win' or part == 'cmd' or part == 'super':
-                normalized.append('win')
-            else:
-                normalized.append(part)
-        return '+'.join(normalized)
-    
-    def _parse_hotkey_pynput(self, hotkey_str: str) -> list:
-        """解析热键字符串为pynput格式的键列表"""
-        if keyboard is None:
-            return []
-        parts = hotkey_str.lower().split('+')
-        keys = []
-        for part in parts:
-            part = part.strip()
-            if part == 'ctrl' or part == 'control':
-                keys.append(keyboard.Key.ctrl)
-            elif part == 'alt':
-                keys.append(keyboard.Key.alt)
-            elif part == 'shift':
-                keys.append(keyboard.Key.shift)
-            elif part == 'cmd' or part == 'win' or part == 'super':
-                keys.append(keyboard.Key.cmd)
-            elif len(part) == 1:
-                keys.append(part)
-            else:
-                if part.isdigit():
-                    keys.append(part)
-                else:
-                    try:
-                        key_attr = getattr(keyboard.Key, part, None)
-                        if key_attr:
-                            keys.append(key_attr)
-                        else:
-                            keys.append(part)
-                    except AttributeError:
-                        keys.append(part)
-        return keys
+        """解析热键字符串为keyboard库格式（如 'ctrl+alt+1'）"""
+        return parse_hotkey(hotkey_str).normalized
+
+    def _get_pynput_modifier_names(self) -> dict:
+        """pynput修饰键 -> 规范名称（左右修饰键合并）"""
+        if self._pynput_modifier_names is None:
+            names = {}
+            for attr, name in (('ctrl', 'ctrl'), ('ctrl_l', 'ctrl'), ('ctrl_r', 'ctrl'),
+                               ('alt', 'alt'), ('alt_l', 'alt'), ('alt_r', 'alt'), ('alt_gr', 'alt'),
+                               ('shift', 'shift'), ('shift_l', 'shift'), ('shift_r', 'shift'),
+                               ('cmd', 'win'), ('cmd_l', 'win'), ('cmd_r', 'win')):
+                key = getattr(keyboard.Key, attr, None)
+                if key is not None:
+                    names[key] = name
+            self._pynput_modifier_names = names
+        return self._pynput_modifier_names
+
+    @staticmethod
+    def _pynput_key_code(key):
+        """pynput按键的原始标识（按下和释放时一致）：特殊键为Key本身，普通键优先用虚拟键码"""
+        if isinstance(key, keyboard.Key):
+            return key
+        vk = getattr(key, 'vk', None)
+        return ('vk', vk) if vk is not None else ('char', getattr(key, 'char', None))
+
+    def _pynput_key_name(self, key) -> Optional[str]:
+        """把pynput的按键对象转换为与parse_hotkey一致的键名"""
+        if isinstance(key, keyboard.Key):
+            return self._get_pynput_modifier_names().get(key, key.name)
+        vk = getattr(key, 'vk', None)
+        # Windows上字母数字优先按虚拟键码判断（按住Ctrl时char可能为控制字符或None）
+        # 其他平台的vk不是Windows虚拟键码（X11为keysym，macOS为硬件键码），只能按char判断
+        if IS_WINDOWS and vk is not None and (0x30 <= vk <= 0x39 or 0x41 <= vk <= 0x5A):
+            return chr(vk).lower()
+        char = getattr(key, 'char', None)
+        if char:
+            if ord(char) < 32:
+                # Ctrl+字母产生的控制字符，如 '\x13' -> 's'
+                return chr(ord(char) + 96)
+            return char.lower()
+        return None
 
     def register_hotkey(self, hotkey_str: str, callback: Callable) -> bool:
-        """注册热键"""
+        """注册热键（回调在分发线程池中执行，不阻塞输入钩子线程）"""
+        callback = self.dispatcher.wrap(hotkey_str, callback)
         # 优先使用keyboard库
         if self.use_keyboard:
             try:
@@ -135,14 +176,14 @@ class HotkeyService:
             return False
         
         try:
-            keys = self._parse_hotkey_pynput(hotkey_str)
-            if not keys:
-                print(f"[pynput] 解析热键失败 {hotkey_str}: 无法解析为有效键")
+            chord = parse_hotkey(hotkey_str)
+            if chord.key is None:
+                print(f"[pynput] 解析热键失败 {hotkey_str}: 缺少主键")
                 return False
             
-            print(f"[pynput] 解析热键 {hotkey_str} -> {keys}")
-            hotkey = keyboard.HotKey(keys, callback)
-            self.hotkeys[hotkey_str] = hotkey
+            print(f"[pynput] 解析热键 {hotkey_str} -> {chord.normalized}")
+            self.chord_matcher.register(chord, callback)
+            self.hotkeys[hotkey_str] = chord
             self.hotkey_handlers[hotkey_str] = callback
             print(f"[pynput] 热键注册成功: {hotkey_str}")
             return True
@@ -154,24 +195,36 @@ class HotkeyService:
 
     def unregister_hotkey(self, hotkey_str: str) -> bool:
         """注销热键"""
+        self.dispatcher.remove(hotkey_str)
+        if self._backend is None:
+            return True
+
         if self.win32_service:
             return self.win32_service.unregister_hotkey(hotkey_str)
+
+        if hotkey_str in self.keyboard_hotkeys:
+            try:
+                kb_lib.remove_hotkey(self.keyboard_hotkeys[hotkey_str])
+            except (KeyError, ValueError):
+                pass
+            del self.keyboard_hotkeys[hotkey_str]
         
         if hotkey_str in self.hotkeys:
+            self.chord_matcher.unregister(self.hotkeys[hotkey_str])
             del self.hotkeys[hotkey_str]
         if hotkey_str in self.hotkey_handlers:
             del self.hotkey_handlers[hotkey_str]
         return True
 
     def _on_press(self, key):
-        """按键按下事件"""
-        for hotkey in self.hotkeys.values():
-            hotkey.press(key)
+        """按键按下事件（一次字典查找匹配组合键）"""
+        callback = self.chord_matcher.press(self._pynput_key_code(key), self._pynput_key_name(key))
+        if callback is not None:
+            callback()
 
     def _on_release(self, key):
         """按键释放事件"""
-        for hotkey in self.hotkeys.values():
-            hotkey.release(key)
+        self.chord_matcher.release(self._pynput_key_code(key))
         # ESC键停止监听
         if key == keyboard.Key.esc:
             return False
@@ -197,6 +250,7 @@ class HotkeyService:
         
         if not self.is_listening:
             self.is_listening = True
+            self.chord_matcher.reset()
             self.listener = keyboard.Listener(
                 on_press=self._on_press,
                 on_release=self._on_release
@@ -206,6 +260,12 @@ class HotkeyService:
 
     def stop_listening(self):
         """停止监听热键"""
+        self.dispatcher.shutdown()
+        # 热键库尚未加载说明从未注册过热键，无需清理
+        if self._backend is None:
+            self.is_listening = False
+            return
+
         # keyboard库：清除所有热键
         if self.use_keyboard:
             try:
@@ -228,10 +288,14 @@ class HotkeyService:
             self.listener.stop()
             self.listener = None
 
+    def get_dispatch_stats(self) -> Dict[str, dict]:
+        """获取热键分发统计（按下次数、合并/防抖次数、按下到执行的延迟）"""
+        return self.dispatcher.get_stats()
+
     def clear_captured_coords(self):
         """清除已采集的坐标"""
-        if self.win32_service:
-            self.win32_service.clear_captured_coords()
+        if self._win32_service:
+            self._win32_service.clear_captured_coords()
         self.captured_coords = {
             'top_left': None,
             'bottom_right': None
@@ -239,13 +303,13 @@ class HotkeyService:
 
     def get_captured_coords(self) -> Dict[str, Optional[Tuple[int, int]]]:
         """获取已采集的坐标"""
-        if self.win32_service:
-            return self.win32_service.get_captured_coords()
+        if self._win32_service:
+            return self._win32_service.get_captured_coords()
         return self.captured_coords.copy()
     
     def set_captured_coord(self, coord_type: str, x: int, y: int):
         """设置采集的坐标（统一接口）"""
-        if self.win32_service:
-            self.win32_service.captured_coords[coord_type] = (x, y)
+        if self._win32_service:
+            self._win32_service.captured_coords[coord_type] = (x, y)
         self.captured_coords[coord_type] = (x, y)
 
@@ -6,6 +6,7 @@ import ctypes
 from ctypes import wintypes
 from typing import Callable, Optional, Dict, Tuple
 from backend.services.config_service import ConfigService
+from backend.utils.hotkey_parser import parse_hotkey
 
 # Windows API常量
 MOD_ALT = 0x0001
@@ -13,6 +14,14 @@ MOD_CONTROL = 0x0002
 MOD_SHIFT = 0x0004
 MOD_WIN = 0x0008
 
+# 规范化修饰键名称 -> 修饰键标志
+MOD_FLAGS = {
+    'ctrl': MOD_CONTROL,
+    'alt': MOD_ALT,
+    'shift': MOD_SHIFT,
+    'win': MOD_WIN,
+}
+
 WM_HOTKEY = 0x0312
 
 # VK代码映射
@@ -25,6 +34,9 @@ VK_CODE = {
     'p': 0x50, 'q': 0x51, 'r': 0x52, 's': 0x53, 't': 0x54,
     'u': 0x55, 'v': 0x56, 'w': 0x57, 'x': 0x58, 'y': 0x59,
     'z': 0x5A,
+    'f1': 0x70, 'f2': 0x71, 'f3': 0x72, 'f4': 0x73, 'f5': 0x74, 'f6': 0x75,
+    'f7': 0x76, 'f8': 0x77, 'f9': 0x78, 'f10': 0x79, 'f11': 0x7A, 'f12': 0x7B,
+    'space': 0x20, 'enter': 0x0D, 'esc': 0x1B, 'tab': 0x09,
 }
 
 
@@ -53,40 +65,22 @@ class HotkeyServiceWin32:
 
     def _parse_hotkey(self, hotkey_str: str) -> tuple:
         """
-        解析热键字符串
-        返回: (modifiers, vk_code, hotkey_id)
+        解析热键字符串（使用与其他实现共用的parse_hotkey）
+        返回: (modifiers, vk_code)
         """
-        parts = hotkey_str.lower().split('+')
-        modifiers = 0
-        vk_code = None
-        
-        for part in parts:
-            part = part.strip()
-            if part == 'ctrl' or part == 'control':
-                modifiers |= MOD_CONTROL
-            elif part == 'alt':
-                modifiers |= MOD_ALT
-            elif part == 'shift':
-                modifiers |= MOD_SHIFT
-            elif part == 'win' or part == 'cmd' or part == 'super':
-                modifiers |= MOD_WIN
-            elif len(part) == 1:
-                vk_code = VK_CODE.get(part)
-                if vk_code is None:
-                    print(f"未知的虚拟键代码: {part}")
-                    return None
-            else:
-                # 尝试作为数字
-                if part.isdigit():
-                    vk_code = VK_CODE.get(part)
-                else:
-                    print(f"无法解析热键部分: {part}")
-                    return None
-        
-        if vk_code is None:
+        chord = parse_hotkey(hotkey_str)
+        if chord.key is None:
             print(f"热键缺少主键: {hotkey_str}")
             return None
-        
+
+        vk_code = VK_CODE.get(chord.key)
+        if vk_code is None:
+            print(f"未知的虚拟键代码: {chord.key}")
+            return None
+
+        modifiers = 0
+        for modifier in chord.modifiers:
+            modifiers |= MOD_FLAGS[modifier]
         return (modifiers, vk_code)
 
     def register_hotkey(self, hotkey_str: str, callback: Callable) -> bool:
@@ -0,0 +1,137 @@
+"""
+选区图片后处理：截图在编码前按选区配置的变换链依次处理（NumPy向量化计算）
+- inset：四边向内裁剪（像素）
+- downscale：按整数倍面积平均缩小（factor x factor 的像素块取平均）
+- grayscale：转为灰度（ITU-R 601 加权）
+- quantize：均匀调色板量化为不超过 colors 种颜色，输出调色板图片（P模式）
+- threshold：按灰度阈值二值化，输出1位图片
+量化和二值化后的图片位深更低，PNG编码更快、文件更小
+"""
+from typing import Optional, Sequence, Tuple, TYPE_CHECKING
+
+from backend.models import ImageTransform
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+TRANSFORM_OPS = ("inset", "downscale", "grayscale", "quantize", "threshold")
+# ITU-R 601 灰度权重（NumPy在首次处理时才导入，避免拖慢启动）
+_GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def validate_transforms(transforms: Sequence[ImageTransform]) -> Optional[str]:
+    """检查变换链，返回错误信息（合法时返回None）"""
+    for i, step in enumerate(transforms):
+        if step.op not in TRANSFORM_OPS:
+            return f"第 {i + 1} 个变换的类型必须是 {' / '.join(TRANSFORM_OPS)}"
+        if step.op == "inset" and min(step.left, step.top, step.right, step.bottom) < 0:
+            return f"第 {i + 1} 个变换（inset）的裁剪量不能为负数"
+        if step.op == "downscale" and step.factor < 1:
+            return f"第 {i + 1} 个变换（downscale）的倍数必须大于等于1"
+        if step.op == "quantize" and not 2 <= step.colors <= 256:
+            return f"第 {i + 1} 个变换（quantize）的颜色数必须在 2 到 256 之间"
+        if step.op == "threshold" and not 0 <= step.level <= 255:
+            return f"第 {i + 1} 个变换（threshold）的阈值必须在 0 到 255 之间"
+        if step.op in ("quantize", "threshold") and i != len(transforms) - 1:
+            return f"第 {i + 1} 个变换（{step.op}）必须是变换链的最后一步"
+    return None
+
+
+def _to_gray(pixels: 'np.ndarray') -> 'np.ndarray':
+    """(高, 宽, 3) -> (高, 宽) uint8"""
+    import numpy as np
+    if pixels.ndim == 2:
+        return pixels
+    return (pixels[..., :3] @ np.array(_GRAY_WEIGHTS, dtype=np.float32) + 0.5).astype(np.uint8)
+
+
+def _downscale(pixels: 'np.ndarray', factor: int) -> 'np.ndarray':
+    """面积平均缩小（右侧和下方不足一块的像素丢弃）"""
+    import numpy as np
+    height, width = pixels.shape[0] // factor, pixels.shape[1] // factor
+    if factor == 1 or height == 0 or width == 0:
+        return pixels
+    # 按步长切片逐行、逐列累加（比 reshape 后对非连续轴求和快一个数量级）
+    dtype = np.uint16 if factor <= 16 else np.uint32
+    pixels = pixels[:height * factor, :width * factor]
+    rows = pixels[0::factor].astype(dtype)
+    for i in range(1, factor):
+        rows += pixels[i::factor]
+    total = rows[:, 0::factor].copy()
+    for j in range(1, factor):
+        total += rows[:, j::factor]
+    total += factor * factor // 2
+    total //= factor * factor
+    return total.astype(np.uint8)
+
+
+def _channel_levels(colors: int) -> Tuple[int, int, int]:
+    """把 colors 种颜色分配到 R/G/B 三个通道的级数（乘积不超过 colors），按 G、R、B 的顺序轮流加一级"""
+    levels = [1, 1, 1]
+    grown = True
+    while grown:
+        grown = False
+        for channel in (1, 0, 2):
+            trial = levels.copy()
+            trial[channel] += 1
+            if trial[0] * trial[1] * trial[2] <= colors:
+                levels = trial
+                grown = True
+    return levels[0], levels[1], levels[2]
+
+
+def _level_values(levels: int) -> 'np.ndarray':
+    """各级对应的输出值：均匀分布在 0-255，只有一级时取中间值"""
+    import numpy as np
+    if levels == 1:
+        return np.array([128], dtype=np.uint8)
+    return (np.arange(levels) * 255 // (levels - 1)).astype(np.uint8)
+
+
+def _quantize(pixels: 'np.ndarray', colors: int) -> 'Image.Image':
+    """均匀调色板量化：灰度分为 colors 级，RGB各通道级数的乘积不超过 colors（颜色数少于8时部分通道只有一级）"""
+    import numpy as np
+    from PIL import Image
+    if pixels.ndim == 2:
+        index = (pixels.astype(np.uint16) * colors >> 8).astype(np.uint8)
+        palette = np.repeat(_level_values(colors)[:, None], 3, axis=1)
+    else:
+        red, green, blue = _channel_levels(colors)
+        rgb = pixels[..., :3].astype(np.uint16)
+        steps = [rgb[..., c] * n >> 8 for c, n in enumerate((red, green, blue))]
+        index = ((steps[0] * green + steps[1]) * blue + steps[2]).astype(np.uint8)
+        grid = np.meshgrid(_level_values(red), _level_values(green), _level_values(blue), indexing="ij")
+        palette = np.stack(grid, axis=-1).reshape(-1, 3)
+    img = Image.fromarray(np.ascontiguousarray(index), "P")
+    img.putpalette(palette.astype(np.uint8).tobytes())
+    return img
+
+
+def apply_transforms(img: 'Image.Image', transforms: Sequence[ImageTransform]) -> 'Image.Image':
+    """
+    按变换链处理截图，返回新图片（不修改原图，原图可能在调用者之间共享）
+    变换链为空时直接返回原图
+    """
+    import numpy as np
+    if not transforms:
+        return img
+    from PIL import Image
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    pixels = np.asarray(img)
+    for step in transforms:
+        if step.op == "inset":
+            # 裁剪量超过图片尺寸时至少保留1个像素
+            height, width = pixels.shape[:2]
+            top, left = min(step.top, height - 1), min(step.left, width - 1)
+            pixels = pixels[top:max(height - step.bottom, top + 1), left:max(width - step.right, left + 1)]
+        elif step.op == "downscale":
+            pixels = _downscale(pixels, step.factor)
+        elif step.op == "grayscale":
+            pixels = _to_gray(pixels)
+        elif step.op == "quantize":
+            return _quantize(pixels, step.colors)
+        elif step.op == "threshold":
+            return Image.fromarray(_to_gray(pixels) >= step.level)
+    return Image.fromarray(np.ascontiguousarray(pixels))
@@ -0,0 +1,207 @@
+"""
+任务服务：截图、连拍、导出等耗时操作以任务方式异步执行
+- 提交后立即返回任务ID，客户端轮询或订阅进度，可随时取消
+- 同时执行的任务数受 job_max_concurrency 限制，其余任务排队
+- 保留最近 job_history_size 个已结束的任务
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from backend.services.config_service import ConfigService
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+
+class JobCancelled(Exception):
+    """任务已被取消（由进度回调抛出，中断任务执行）"""
+
+
+class Job:
+    """一个任务"""
+
+    def __init__(self, kind: str, params: dict, changed: threading.Condition):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = JOB_QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.version = 0  # 每次状态或进度变化时递增（订阅者据此判断是否有更新）
+        self.cancel_event = threading.Event()
+        self._changed = changed
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def _touch(self):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def progress(self, done: int, total: int, message: str = ""):
+        """更新进度；任务已被取消时抛出 JobCancelled"""
+        self.done, self.total = done, total
+        if message:
+            self.message = message
+        self._touch()
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        """任务已被取消时抛出 JobCancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "version": self.version
+        }
+
+
+class JobService:
+    """任务服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(JobService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            workers = max(1, self.config_service.get_config().job_max_concurrency)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        return self._executor
+
+    def submit(self, kind: str, params: dict, runner: Callable[[Job], object]) -> Job:
+        """提交任务，runner(job) 的返回值作为任务结果"""
+        job = Job(kind, params, self._changed)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+            self._get_executor().submit(self._run, job, runner)
+        return job
+
+    def _run(self, job: Job, runner: Callable[[Job], object]):
+        if job.cancel_event.is_set():
+            return
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        job._touch()
+        try:
+            job.result = runner(job)
+            job.status = JOB_SUCCEEDED
+        except JobCancelled:
+            job.status = JOB_CANCELLED
+            job.message = "任务已取消"
+        except Exception as e:
+            print(f"[任务] ✗ {job.kind} 任务失败: {e}")
+            import traceback
+            traceback.print_exc()
+            job.status = JOB_FAILED
+            job.error = str(e)
+        job.finished_at = time.time()
+        job._touch()
+        print(f"[任务] {job.kind} 任务 {job.id} 结束: {job.status}，耗时 {job.finished_at - job.started_at:.2f}s")
+
+    def _trim_history(self):
+        """只保留最近 job_history_size 个已结束的任务（未结束的任务不清理）"""
+        limit = self.config_service.get_config().job_history_size
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - limit, 0)]:
+            del self._jobs[job_id]
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """根据ID获取任务"""
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """任务列表（最新的在前）"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        jobs.reverse()
+        if status:
+            jobs = [job for job in jobs if job.status == status]
+        return jobs[:limit]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """取消任务：排队中的任务直接取消，执行中的任务在下一次进度更新时中断"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.message = "任务已取消"
+            job.finished_at = time.time()
+        job._touch()
+        return job
+
+    def wait(self, job_id: str, after_version: int, timeout: float = 15) -> Optional[Job]:
+        """等待任务发生变化（version 大于 after_version）或结束，最多等待timeout秒"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while job.version <= after_version and not job.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return job
+
+    def get_stats(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            stats: Dict[str, int] = {}
+            for job in self._jobs.values():
+                stats[job.status] = stats.get(job.status, 0) + 1
+            return stats
+
+    def shutdown(self):
+        """取消所有未结束的任务并关闭线程池"""
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                self.cancel(job.id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,97 @@
+"""
+显示器服务：缓存显示器布局，并把选区分配到所在的显示器
+布局按 monitor_refresh_interval 定期重新枚举，发生变化时 layout_version 递增
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from backend.services.config_service import ConfigService
+
+# 缓存的矩形分配结果数上限（按最近使用淘汰；预览任意矩形时坐标各不相同）
+ASSIGNMENT_CACHE_SIZE = 1024
+
+
+class MonitorService:
+    """显示器服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MonitorService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        # mss格式的显示器列表：[0]为所有显示器组成的虚拟屏幕，[1:]为各显示器
+        self._monitors: List[Dict[str, int]] = []
+        self._refreshed_at = 0.0
+        self.layout_version = 0
+        # (x1, y1, x2, y2) -> (显示器序号, 是否跨显示器)，布局变化时清空
+        self._assignments: 'OrderedDict[Tuple[int, int, int, int], Tuple[int, bool]]' = OrderedDict()
+        self._assignments_lock = threading.Lock()
+
+    def _enumerate(self) -> List[Dict[str, int]]:
+        """重新枚举显示器"""
+        from backend.services.capture_backend import enumerate_monitors
+        return enumerate_monitors(self.config_service.get_config().capture_backend)
+
+    def get_monitors(self, force_refresh: bool = False) -> List[Dict[str, int]]:
+        """获取显示器布局（缓存，过期或强制时重新枚举）"""
+        interval = self.config_service.get_config().monitor_refresh_interval
+        now = time.monotonic()
+        if not force_refresh and self._monitors and (interval <= 0 or now - self._refreshed_at < interval):
+            return self._monitors
+
+        with self._lock:
+            if not force_refresh and self._monitors and (interval <= 0 or now - self._refreshed_at < interval):
+                return self._monitors
+            monitors = self._enumerate()
+            self._refreshed_at = time.monotonic()
+            if monitors != self._monitors:
+                if self._monitors:
+                    print(f"[显示器服务] 显示器布局已变化: {len(monitors) - 1} 个显示器")
+                self._monitors = monitors
+                self._assignments = OrderedDict()
+                self.layout_version += 1
+        return self._monitors
+
+    def locate(self, x1: int, y1: int, x2: int, y2: int) -> Tuple[int, bool]:
+        """
+        确定矩形（规范化坐标）所在的显示器
+        返回: (重叠面积最大的显示器序号, 是否跨越多个显示器)；不在任何显示器上时序号为0
+        """
+        monitors = self.get_monitors()
+        key = (x1, y1, x2, y2)
+        with self._assignments_lock:
+            cached = self._assignments.get(key)
+            if cached is not None:
+                self._assignments.move_to_end(key)
+                return cached
+
+        best_index, best_area, overlapped = 0, 0, 0
+        for index, m in enumerate(monitors[1:], start=1):
+            w = min(x2, m["left"] + m["width"]) - max(x1, m["left"])
+            h = min(y2, m["top"] + m["height"]) - max(y1, m["top"])
+            if w > 0 and h > 0:
+                overlapped += 1
+                if w * h > best_area:
+                    best_index, best_area = index, w * h
+        result = (best_index, overlapped > 1 or (overlapped == 1 and best_area < (x2 - x1) * (y2 - y1)))
+        with self._assignments_lock:
+            self._assignments[key] = result
+            if len(self._assignments) > ASSIGNMENT_CACHE_SIZE:
+                self._assignments.popitem(last=False)
+        return result
+
+    def get_monitor(self, index: int) -> Optional[Dict[str, int]]:
+        """按序号获取显示器（0为虚拟屏幕）"""
+        monitors = self.get_monitors()
+        if 0 <= index < len(monitors):
+            return monitors[index]
+        return None
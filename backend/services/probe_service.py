@@ -0,0 +1,189 @@
+"""
+选区探测服务：探测模式（mode=probe）的选区不保存图片，只按各自的间隔计算统计值
+- 到期的选区合并为一次截图（截图计划 + 按显示器批量截取）；不经过单飞合并，每条记录都来自一次新的截图，
+  探测间隔可以小于 singleflight_window_ms
+- 统计值用NumPy在原始像素上向量化计算：平均颜色、颜色中位数、直方图、采样像素、颜色范围内的像素比例
+- 每个选区在内存中保留最近 probe_history_size 条记录，开启 probe_log 时追加写入 {output_dir}/probes/{选区名}.jsonl
+"""
+import json
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, TYPE_CHECKING
+
+from backend.models import ProbeSpec, Region
+from backend.services.config_service import ConfigService
+from backend.services.region_service import RegionService
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def compute_probe(frame: 'np.ndarray', spec: ProbeSpec) -> dict:
+    """计算一帧 (高, 宽, 通道) 的统计值"""
+    import numpy as np
+    channels = frame.shape[2]
+    pixels = frame.reshape(-1, channels)
+    record = {
+        "mean": np.round(pixels.mean(axis=0), 2).tolist(),
+        "median": np.median(pixels, axis=0).tolist()
+    }
+    if spec.histogram_bins > 0:
+        bins = min(spec.histogram_bins, 256)
+        # 各通道的分组序号错开后一次 bincount
+        index = (pixels.astype(np.uint16) * bins >> 8) + np.arange(channels, dtype=np.uint16) * bins
+        record["histogram"] = np.bincount(index.ravel(), minlength=bins * channels).reshape(channels, bins).tolist()
+    if spec.samples:
+        points = np.array(spec.samples, dtype=np.int64).reshape(-1, 2)
+        xs = np.clip(points[:, 0], 0, frame.shape[1] - 1)
+        ys = np.clip(points[:, 1], 0, frame.shape[0] - 1)
+        record["samples"] = frame[ys, xs].tolist()
+    if spec.color_ranges:
+        lower = np.array([r.lower[:channels] for r in spec.color_ranges], dtype=np.int16)
+        upper = np.array([r.upper[:channels] for r in spec.color_ranges], dtype=np.int16)
+        values = pixels.astype(np.int16)[:, None, :]
+        inside = ((values >= lower) & (values <= upper)).all(axis=2).mean(axis=0)
+        record["ranges"] = {r.name: round(float(f), 4) for r, f in zip(spec.color_ranges, inside)}
+    return record
+
+
+class ProbeService:
+    """选区探测服务单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ProbeService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self.region_service = RegionService()
+        self._lock = threading.Lock()
+        self._series: Dict[str, Deque[dict]] = {}  # 选区ID -> 最近的记录
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"ticks": 0, "records": 0, "errors": 0}
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动探测线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止探测线程"""
+        self._running = False
+
+    def _worker(self):
+        """探测工作线程：每轮把到期的选区合并为一次截图"""
+        from backend.services.screenshot_service import ScreenshotService
+        screenshot_service = ScreenshotService()
+        next_run: Dict[str, float] = {}  # 选区ID -> 下次探测时间
+        while self._running:
+            try:
+                self.region_service.load_regions()
+            except Exception as e:
+                print(f"[探测] 重新加载选区失败: {e}")
+            regions = {region.id: region for region in self.region_service.get_probe_regions()}
+            for region_id in list(next_run):
+                if region_id not in regions:
+                    del next_run[region_id]
+
+            now = time.monotonic()
+            due = [region for region_id, region in regions.items() if now >= next_run.setdefault(region_id, now)]
+            if due:
+                try:
+                    self.probe(due, screenshot_service)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[探测] ✗ 探测失败: {e}")
+                for region in due:
+                    next_run[region.id] = now + max(self._spec(region).interval_ms, 10) / 1000
+
+            # 睡到最近一个选区到期（没有探测选区时每秒检查一次）
+            wait = min([t - time.monotonic() for t in next_run.values()] + [1.0])
+            time.sleep(max(wait, 0.005))
+
+    # ---------- 探测 ----------
+
+    @staticmethod
+    def _spec(region: Region) -> ProbeSpec:
+        return region.probe or ProbeSpec()
+
+    def probe(self, regions: List[Region], screenshot_service=None) -> List[Optional[dict]]:
+        """对选区截图一次并计算统计值，记录并返回各选区的记录（截图失败为None，时间 t 为截图时间）"""
+        import numpy as np
+        if screenshot_service is None:
+            from backend.services.screenshot_service import ScreenshotService
+            screenshot_service = ScreenshotService()
+        plan = screenshot_service.get_plan(regions)
+        # 直接执行截图计划：单飞合并会在 singleflight_window_ms 内复用上一次的截图
+        timestamp = time.time()
+        images = screenshot_service.execute_plan(plan)
+        records: List[Optional[dict]] = []
+        for region, img in zip(regions, images):
+            if img is None:
+                records.append(None)
+                continue
+            # 截图在调用者之间共享，只读访问
+            record = compute_probe(np.asarray(img), self._spec(region))
+            record["t"] = round(timestamp, 3)
+            records.append(record)
+        self._store(regions, records)
+        return records
+
+    def _store(self, regions: List[Region], records: List[Optional[dict]]):
+        config = self.config_service.get_config()
+        with self._lock:
+            self.stats["ticks"] += 1
+            for region, record in zip(regions, records):
+                if record is None:
+                    continue
+                series = self._series.get(region.id)
+                if series is None or series.maxlen != config.probe_history_size:
+                    series = self._series[region.id] = deque(series or (), maxlen=max(config.probe_history_size, 1))
+                series.append(record)
+                self.stats["records"] += 1
+        if config.probe_log:
+            self._write_log(config.output_dir, regions, records)
+
+    def _write_log(self, output_dir: str, regions: List[Region], records: List[Optional[dict]]):
+        """追加写入 {output_dir}/probes/{选区名}.jsonl"""
+        try:
+            directory = Path(output_dir) / "probes"
+            directory.mkdir(parents=True, exist_ok=True)
+            for region, record in zip(regions, records):
+                if record is not None:
+                    with open(directory / f"{region.name}.jsonl", "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"[探测] ⚠ 写入探测记录失败: {e}")
+
+    # ---------- 查询 ----------
+
+    def get_series(self, region_id: str, since: Optional[float] = None, limit: int = 1000) -> List[dict]:
+        """选区的探测记录（按时间顺序，since 为起始时间戳，最多返回最近 limit 条）"""
+        with self._lock:
+            series = list(self._series.get(region_id, ()))
+        if since is not None:
+            series = [record for record in series if record["t"] >= since]
+        return series[-limit:] if limit > 0 else []
+
+    def get_latest(self) -> Dict[str, dict]:
+        """各选区最新的探测记录"""
+        with self._lock:
+            return {region_id: series[-1] for region_id, series in self._series.items() if series}
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, running=self._running, regions=len(self._series))
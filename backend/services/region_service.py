@@ -2,26 +2,48 @@
 选区服务：负责选区的CRUD操作
 """
 import json
+import threading
 import uuid
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from backend.models import Region, RegionCreate, RegionUpdate
 
 REGIONS_FILE = "regions.json"
 
 
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """文件签名 (修改时间ns, 大小)，文件不存在时为None"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 class RegionService:
     """选区服务"""
+    # 所有实例共享的选区文件解析结果：文件签名未变化时跳过重新解析
+    _loaded_signature: Optional[Tuple[int, int]] = None
+    _loaded_regions: List[Region] = []
+    # 选区存储版本：文件内容变化或保存时递增（截图计划据此判断是否需要重新编译）
+    version = 0
+    _lock = threading.Lock()
     
     def __init__(self):
         self.regions: List[Region] = []
         self.load_regions()
 
     def load_regions(self):
-        """从文件加载选区"""
+        """从文件加载选区（文件未变化时直接复用上次的解析结果）"""
+        cls = RegionService
         regions_path = Path(REGIONS_FILE)
-        if regions_path.exists():
+        signature = _file_signature(regions_path)
+        with cls._lock:
+            if signature is not None and signature == cls._loaded_signature:
+                self.regions = list(cls._loaded_regions)
+                return
+        if signature is not None:
             try:
                 with open(regions_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -29,8 +51,19 @@ class RegionService:
             except Exception as e:
                 print(f"加载选区失败: {e}")
                 self.regions = []
+                signature = None
         else:
             self.regions = []
+        self._remember(signature)
+
+    def _remember(self, signature: Optional[Tuple[int, int]]):
+        """记录当前选区为共享解析结果，内容变化时递增版本"""
+        cls = RegionService
+        with cls._lock:
+            if signature is None or signature != cls._loaded_signature:
+                cls.version += 1
+            cls._loaded_signature = signature
+            cls._loaded_regions = list(self.regions)
 
     def save_regions(self) -> bool:
         """保存选区到文件"""
@@ -38,6 +71,7 @@ class RegionService:
             with open(REGIONS_FILE, 'w', encoding='utf-8') as f:
                 data = [region.to_dict() for region in self.regions]
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            self._remember(_file_signature(Path(REGIONS_FILE)))
             return True
         except Exception as e:
             print(f"保存选区失败: {e}")
@@ -47,6 +81,14 @@ class RegionService:
         """获取所有选区"""
         return self.regions
 
+    def get_image_regions(self) -> List[Region]:
+        """截图模式的选区（截取所有选区、定时截图时使用）"""
+        return [region for region in self.regions if region.mode != "probe"]
+
+    def get_probe_regions(self) -> List[Region]:
+        """探测模式的选区"""
+        return [region for region in self.regions if region.mode == "probe"]
+
     def get_region_by_id(self, region_id: str) -> Optional[Region]:
         """根据ID获取选区"""
         for region in self.regions:
@@ -63,6 +105,11 @@ class RegionService:
             y1=region_data.y1,
             x2=region_data.x2,
             y2=region_data.y2,
+            hotkey=region_data.hotkey or None,
+            mode=region_data.mode,
+            probe=region_data.probe,
+            transforms=region_data.transforms,
+            encoding=region_data.encoding,
             created_at=datetime.now().isoformat()
         )
         # 规范化坐标
@@ -88,12 +135,27 @@ class RegionService:
             region.x2 = region_data.x2
         if region_data.y2 is not None:
             region.y2 = region_data.y2
+        if region_data.hotkey is not None:
+            region.hotkey = region_data.hotkey or None
+        if region_data.mode is not None:
+            region.mode = region_data.mode
+        if region_data.probe is not None:
+            region.probe = region_data.probe
+        if region_data.transforms is not None:
+            region.transforms = region_data.transforms
+        if region_data.encoding is not None:
+            region.encoding = region_data.encoding
         
         # 规范化坐标
         region = region.normalize()
         self.save_regions()
         return region
 
+    def replace_regions(self, regions: List[Region]) -> bool:
+        """替换全部选区（如代理模式下由协调器下发）"""
+        self.regions = [region.normalize() for region in regions]
+        return self.save_regions()
+
     def delete_region(self, region_id: str) -> bool:
         """删除选区"""
         region = self.get_region_by_id(region_id)
@@ -102,5 +164,8 @@ class RegionService:
         
         self.regions.remove(region)
         self.save_regions()
+        if region.anchor is not None:
+            # 删除锚点参考图
+            Path(region.anchor.template).unlink(missing_ok=True)
         return True
 
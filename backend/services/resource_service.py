@@ -0,0 +1,192 @@
+"""
+进程资源统计：常驻内存、打开的文件描述符（Windows 为句柄数）、线程、截图后端实例，以及 tracemalloc 内存分配追踪
+- 安装了 psutil 时用 psutil 获取内存、句柄数和CPU时间，否则在 Linux 上读取 /proc
+- tracemalloc 默认关闭（开启后分配内存变慢），开启后可以查看分配最多的代码位置，保存快照并与之后的状态比较
+"""
+import gc
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+# 保留的 tracemalloc 快照数
+MAX_SNAPSHOTS = 8
+# 统计时排除 tracemalloc 和导入机制自身的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _psutil_process():
+    try:
+        import psutil
+        return psutil.Process()
+    except Exception:
+        return None
+
+
+def rss_bytes() -> Optional[int]:
+    """当前常驻内存（字节），无法获取时为None"""
+    process = _psutil_process()
+    if process is not None:
+        return process.memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def open_handles() -> Optional[int]:
+    """打开的文件描述符数（Windows 为句柄数），无法获取时为None"""
+    process = _psutil_process()
+    if process is not None:
+        return process.num_handles() if sys.platform == "win32" else process.num_fds()
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def cpu_seconds() -> float:
+    """本进程及其子进程（如编码进程池）累计使用的CPU时间（秒）；未安装 psutil 且不是 Linux 时不含子进程"""
+    process = _psutil_process()
+    if process is not None:
+        total = sum(process.cpu_times()[:2])
+        for child in process.children(recursive=True):
+            try:
+                total += sum(child.cpu_times()[:2])
+            except Exception:
+                pass
+        return total
+    total = time.process_time()
+    import multiprocessing
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/stat", "r") as f:
+                # 进程名可能含空格，从最后一个右括号之后按字段分割（utime、stime 为第14、15个字段）
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError, AttributeError):
+            pass
+    return total
+
+
+def _top_stats(stats, limit: int) -> List[dict]:
+    result = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        item = {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            item["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+            item["count_diff"] = stat.count_diff
+        result.append(item)
+    return result
+
+
+class ResourceService:
+    """进程资源统计单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResourceService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._lock = threading.Lock()
+        self._snapshots: 'OrderedDict[int, tuple]' = OrderedDict()  # 快照ID -> (时间, 快照)
+        self._next_snapshot = 1
+
+    def get_usage(self, top: int = 0) -> dict:
+        """资源使用情况；tracemalloc 已开启且 top 大于0时附带分配最多的 top 个代码位置"""
+        from backend.services.screenshot_service import ScreenshotService
+        rss = rss_bytes()
+        threads = threading.enumerate()
+        # 线程名去掉末尾的序号后分组（如 ThreadPoolExecutor-0_3 -> ThreadPoolExecutor）
+        names = Counter(re.sub(r"[-_]?\d+(_\d+)?$", "", t.name) or t.name for t in threads)
+        usage = {
+            "time": time.time(),
+            "pid": os.getpid(),
+            "rss_bytes": rss,
+            "rss_mb": None if rss is None else round(rss / 1024 / 1024, 1),
+            "open_handles": open_handles(),
+            "threads": len(threads),
+            "thread_names": dict(names.most_common()),
+            "mss": ScreenshotService().get_mss_stats() if ScreenshotService._instance is not None else None,
+            "gc": {"counts": list(gc.get_count()), "garbage": len(gc.garbage)},
+            "tracemalloc": self._tracemalloc_status()
+        }
+        if top > 0 and tracemalloc.is_tracing():
+            usage["top_allocations"] = self.top_allocations(top)
+        return usage
+
+    # ---------- tracemalloc ----------
+
+    def _tracemalloc_status(self) -> dict:
+        status = {"tracing": tracemalloc.is_tracing(), "snapshots": list(self._snapshots)}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            status.update(frames=tracemalloc.get_traceback_limit(), traced_mb=round(current / 1024 / 1024, 2),
+                          peak_mb=round(peak / 1024 / 1024, 2))
+        return status
+
+    def start_tracing(self, frames: int = 1) -> dict:
+        """开启 tracemalloc（frames 为每次分配记录的调用栈深度）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(frames, 1))
+        return self._tracemalloc_status()
+
+    def stop_tracing(self) -> dict:
+        """关闭 tracemalloc 并丢弃全部快照"""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return self._tracemalloc_status()
+
+    def _take(self) -> 'tracemalloc.Snapshot':
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc 未开启")
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def top_allocations(self, limit: int = 10) -> List[dict]:
+        """当前分配内存最多的代码位置"""
+        return _top_stats(self._take().statistics("lineno"), limit)
+
+    def take_snapshot(self, limit: int = 10) -> dict:
+        """保存快照（最多保留 MAX_SNAPSHOTS 个），返回快照ID和分配最多的代码位置"""
+        snapshot = self._take()
+        with self._lock:
+            snapshot_id = self._next_snapshot
+            self._next_snapshot += 1
+            self._snapshots[snapshot_id] = (time.time(), snapshot)
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return {"id": snapshot_id, "top": _top_stats(snapshot.statistics("lineno"), limit)}
+
+    def diff_snapshot(self, base_id: int, limit: int = 10) -> Optional[dict]:
+        """当前状态与快照 base_id 的差异（按增长量排序），快照不存在时返回None"""
+        with self._lock:
+            base = self._snapshots.get(base_id)
+        if base is None:
+            return None
+        taken_at, snapshot = base
+        stats = self._take().compare_to(snapshot, "lineno")
+        return {
+            "base_id": base_id,
+            "seconds": round(time.time() - taken_at, 1),
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": _top_stats(stats, limit)
+        }
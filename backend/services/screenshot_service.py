@@ -1,124 +1,666 @@
 """
 截图服务：负责屏幕截图功能
+mss / PIL 在首次截图（或启动预热）时才导入，避免拖慢后端启动
 """
-import mss
-from PIL import Image
+import math
+import statistics
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
-from backend.models import Region
+from typing import Callable, Hashable, List, Optional, Tuple, TYPE_CHECKING
+from backend.models import ImageTransform, Region
+from backend.services.adaptive_encoder import AdaptiveEncoderService, EncodingSetting
+from backend.services.capture_plan import CapturePlan, compile_capture_plan, scale_box
+from backend.services.image_transform import apply_transforms
+from backend.services.anchor_service import AnchorService
 from backend.services.config_service import ConfigService
+from backend.services.encoder_service import FORMAT_EXTENSIONS, EncoderService
+from backend.services.frame_cache import FrameCache
+from backend.services.monitor_service import MonitorService
+from backend.services.region_service import RegionService
+from backend.services.session_service import SessionService
+from backend.services.sink_service import SinkService
+from backend.utils.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# 缓存的截图计划数量（全部选区、各分组、单个选区等）
+PLAN_CACHE_SIZE = 64
+# 按时长连拍时，每次分配的缓冲区至少容纳的帧数
+BURST_CHUNK_FRAMES = 16
 
 
 class ScreenshotService:
-    """截图服务"""
+    """截图服务单例（各路由、定时器、热键共享同一实例，以便合并并发截图请求）"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ScreenshotService, cls).__new__(cls)
+        return cls._instance
     
     def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
         self.config_service = ConfigService()
-        # mss实例不能跨线程使用，每次使用时创建新实例
+        self.monitor_service = MonitorService()
+        self.anchor_service = AnchorService()
+        self.sink_service = SinkService()
+        self.encoder_service = EncoderService()
+        self.adaptive_encoder = AdaptiveEncoderService()
+        self.session_service = SessionService()
+        # 相同选区集合的并发截图只截取一次
+        self.singleflight = SingleFlight()
+        # 最近生成的文件名（用于避免同名覆盖）
+        self._path_lock = threading.Lock()
+        self._issued_paths: 'OrderedDict[str, int]' = OrderedDict()
+        # 已编译的截图计划（LRU）
+        self._plan_lock = threading.Lock()
+        self._plans: 'OrderedDict[Hashable, CapturePlan]' = OrderedDict()
+        self.plan_stats = {"compiled": 0, "hits": 0}
+        # 最近截取的画面（预览等请求在画面足够新时直接裁剪，不重新截屏）
+        self.frame_cache = FrameCache(self.config_service.get_config().frame_cache_size)
+        self._frame_cache_layout = self.monitor_service.layout_version
+        # 截图保存完成的监听器（如代理上报），参数为本次保存成功的截图记录列表
+        self._capture_listeners: List[Callable[[List[dict]], None]] = []
+        # mss实例不能跨线程使用，每个线程一个实例（弱引用集合用于统计仍存活的实例）
         self._mss_instance = None
+        self._mss_handles: 'weakref.WeakSet' = weakref.WeakSet()
+        self.mss_stats = {"created": 0, "closed": 0}
     
     def _get_mss_instance(self):
-        """获取mss实例（线程安全）"""
-        # 每个线程使用独立的mss实例
-        import threading
-        if not hasattr(threading.current_thread(), '_mss_instance'):
-            threading.current_thread()._mss_instance = mss.mss()
-        return threading.current_thread()._mss_instance
-
-    def capture_region(self, region: Region) -> Optional[Image.Image]:
-        """截取指定区域"""
+        """获取截图后端实例（线程安全，capture_backend 为 synthetic 时为合成画面）"""
+        # 每个线程使用独立的实例（mss实例不能跨线程使用）
+        config = self.config_service.get_config()
+        thread = threading.current_thread()
+        key = (config.capture_backend, config.agent_name)
+        if getattr(thread, '_mss_key', None) != key:
+            from backend.services.capture_backend import create_capture
+            previous = getattr(thread, '_mss_instance', None)
+            if previous is not None and hasattr(previous, 'close'):
+                # 截图后端或代理名称变化：关闭该线程原来的实例
+                try:
+                    previous.close()
+                    self.mss_stats["closed"] += 1
+                except Exception:
+                    pass
+            thread._mss_instance = create_capture(config.capture_backend, seed=config.agent_name)
+            thread._mss_key = key
+            self._mss_handles.add(thread._mss_instance)
+            self.mss_stats["created"] += 1
+        return thread._mss_instance
+
+    def get_mss_stats(self) -> dict:
+        """截图后端实例统计：累计创建/关闭数，仍存活的实例数，持有实例的存活线程数"""
+        return dict(self.mss_stats, live=len(self._mss_handles),
+                    threads=sum(1 for t in threading.enumerate() if getattr(t, '_mss_instance', None) is not None))
+
+    def warm_up(self) -> bool:
+        """
+        预热截图组件：导入PIL/NumPy/mss并枚举显示器（填充显示器布局缓存）
+        不在当前线程创建截图句柄：句柄按线程创建，预热线程结束后留下的句柄不会被截图线程使用
+        """
         try:
-            # 规范化坐标
-            normalized = region.normalize()
-            # mss使用(left, top, width, height)
-            left = normalized.x1
-            top = normalized.y1
-            width = normalized.x2 - normalized.x1
-            height = normalized.y2 - normalized.y1
-            
-            if width <= 0 or height <= 0:
-                return None
-            
-            monitor = {
-                "left": left,
-                "top": top,
-                "width": width,
-                "height": height
-            }
-            
-            # 使用线程安全的mss实例
-            mss_instance = self._get_mss_instance()
-            screenshot = mss_instance.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            return img
+            import numpy  # noqa: F401
+            from PIL import Image  # noqa: F401
+            # 枚举使用临时的mss实例，用完即关闭
+            monitors = self.monitor_service.get_monitors(force_refresh=True)
+            print(f"[截图服务] ✓ 预热完成，显示器数量: {len(monitors) - 1}")
+            return True
+        except Exception as e:
+            print(f"[截图服务] ✗ 预热失败: {e}")
+            return False
+
+    def _grab_raw(self, left: int, top: int, width: int, height: int):
+        """截取屏幕矩形区域（虚拟屏幕坐标），返回mss的原始截图（BGRA）"""
+        # mss使用(left, top, width, height)
+        monitor = {
+            "left": left,
+            "top": top,
+            "width": width,
+            "height": height
+        }
+        # 使用线程安全的mss实例
+        mss_instance = self._get_mss_instance()
+        return mss_instance.grab(monitor)
+
+    def _grab(self, left: int, top: int, width: int, height: int) -> 'Image.Image':
+        """截取屏幕矩形区域（虚拟屏幕坐标）"""
+        screenshot = self._grab_raw(left, top, width, height)
+        from PIL import Image
+        return Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+
+    def capture_region(self, region: Region, max_age: Optional[float] = None) -> Optional['Image.Image']:
+        """截取指定区域；指定 max_age（秒）时优先使用该时间内截取过的画面（不保证是最新画面，不用于保存）"""
+        try:
+            if max_age:
+                img = self._cached_frame(self.anchor_service.resolve([region])[0], max_age)
+                if img is not None:
+                    return img
+            return self._capture_shared(self.get_plan([region]))[0]
         except Exception as e:
             print(f"截图失败: {e}")
             import traceback
             traceback.print_exc()
             return None
 
-    def capture_full_screen(self) -> Optional[Image.Image]:
-        """截取全屏"""
+    def capture_full_screen(self, monitor_index: int = 1) -> Optional['Image.Image']:
+        """截取整个显示器（默认主显示器，0为所有显示器组成的虚拟屏幕）"""
         try:
-            # 使用线程安全的mss实例
-            mss_instance = self._get_mss_instance()
-            monitor = mss_instance.monitors[1]  # 主显示器
-            screenshot = mss_instance.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            return img
+            monitor = self.monitor_service.get_monitor(monitor_index)
+            if monitor is None:
+                print(f"全屏截图失败: 显示器 {monitor_index} 不存在")
+                return None
+            return self._grab(monitor["left"], monitor["top"], monitor["width"], monitor["height"])
         except Exception as e:
             print(f"全屏截图失败: {e}")
             import traceback
             traceback.print_exc()
             return None
 
-    def save_screenshot(self, img: Image.Image, region_name: str) -> Optional[str]:
-        """保存截图到文件"""
+    def default_output_dir(self) -> str:
+        """默认输出目录：录制会话进行中时为会话目录，否则为配置的输出目录"""
+        return self.session_service.output_dir or self.config_service.get_config().output_dir
+
+    def _output_path(self, region_name: str, output_dir: Optional[str] = None,
+                     captured_at: Optional[datetime] = None, suffix: str = "") -> Path:
+        """生成截图文件路径 {output_dir}/{name}_{timestamp}{suffix}.png（目录不存在时创建）"""
+        output_dir = Path(output_dir or self.default_output_dir())
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return self._issue_path(str(output_dir / region_name), captured_at, suffix)
+
+    def _issue_path(self, prefix: str, captured_at: Optional[datetime] = None, suffix: str = "",
+                    extension: str = ".png") -> Path:
+        """按路径前缀 {output_dir}/{name} 生成文件路径（不检查目录）"""
+        timestamp = (captured_at or datetime.now()).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        base = f"{prefix}_{timestamp}{suffix}"
+        # 同一毫秒内同名的截图（如并发请求）追加序号，避免互相覆盖
+        with self._path_lock:
+            count = self._issued_paths.get(base, 0)
+            self._issued_paths[base] = count + 1
+            self._issued_paths.move_to_end(base)
+            if len(self._issued_paths) > 4096:
+                self._issued_paths.popitem(last=False)
+        if count:
+            base = f"{base}_{count}"
+        return Path(f"{base}{extension}")
+
+    def _submit_save(self, img: 'Image.Image', prefix: str, captured_at: Optional[datetime] = None,
+                     suffix: str = "", region_id: Optional[str] = None,
+                     encoding: Optional[EncodingSetting] = None) -> Future:
+        """
+        按路径前缀提交保存，返回Future（结果为文件路径）
+        storage_mode 为 delta 时追加到选区的差分分段文件，结果为帧引用（带后缀的连拍帧仍保存为PNG）
+        encoding 为自适应编码给出的编码参数（格式、压缩级别、质量），为空时按配置保存为PNG
+        开启 hash_index_enabled 时，保存成功的截图（连拍帧除外）加入感知哈希索引
+        """
+        config = self.config_service.get_config()
         try:
-            config = self.config_service.get_config()
-            output_dir = Path(config.output_dir)
+            if not suffix and config.storage_mode == "delta":
+                from backend.services.delta_store import DeltaStore
+                future = Future()
+                future.set_result(DeltaStore().append(img, prefix, captured_at))
+            elif encoding is not None:
+                path = self._issue_path(prefix, captured_at, suffix, FORMAT_EXTENSIONS[encoding.image_format])
+                future = self.encoder_service.encode_image(img, str(path), encoding.image_format,
+                                                           encoding.compress_level, encoding.quality)
+            else:
+                future = self.encoder_service.encode_png(img, str(self._issue_path(prefix, captured_at, suffix)))
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        if not suffix and config.hash_index_enabled:
+            future.add_done_callback(lambda f: self._index_saved(f, img, region_id, Path(prefix).name, captured_at))
+        return future
+
+    def _index_saved(self, future: Future, img: 'Image.Image', region_id: Optional[str], region_name: str,
+                     captured_at: Optional[datetime]):
+        """保存完成后提交感知哈希计算（在此缩小为小灰度图，哈希在后台线程中计算）"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        from backend.services.hash_index import HashIndexService
+        HashIndexService().submit(img, region_id, region_name, future.result(), captured_at)
+
+    def save_screenshot_async(self, img: 'Image.Image', region_name: str, output_dir: Optional[str] = None,
+                              captured_at: Optional[datetime] = None, suffix: str = "") -> Future:
+        """
+        提交截图保存，返回Future（结果为文件路径）
+        编码方式由 encoder_mode 决定：inline 在当前线程编码，process 交给进程池编码
+        """
+        try:
+            output_dir = Path(output_dir or self.default_output_dir())
             output_dir.mkdir(parents=True, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-            filename = f"{region_name}_{timestamp}.png"
-            file_path = output_dir / filename
-            
-            img.save(file_path, "PNG")
-            return str(file_path)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        return self._submit_save(img, str(output_dir / region_name), captured_at, suffix)
+
+    def _wait_saved(self, future: Future) -> Optional[str]:
+        """等待保存完成，失败时返回None"""
+        try:
+            return future.result()
         except Exception as e:
             print(f"保存截图失败: {e}")
             return None
 
+    def save_screenshot(self, img: 'Image.Image', region_name: str, output_dir: Optional[str] = None,
+                        captured_at: Optional[datetime] = None, suffix: str = "") -> Optional[str]:
+        """
+        保存截图到文件
+        output_dir为空时使用默认输出目录（录制会话进行中时为会话目录）；captured_at为截取时间（默认当前时间）；
+        suffix追加在时间戳之后（如连拍帧序号）
+        """
+        return self._wait_saved(self.save_screenshot_async(img, region_name, output_dir, captured_at, suffix))
+
     def capture_and_save_region(self, region: Region) -> Tuple[bool, str, Optional[str]]:
         """截取并保存区域"""
         try:
-            img = self.capture_region(region)
+            _, success, message, file_path = self.capture_and_save_regions([region])[0]
+            return success, message, file_path
+        except Exception as e:
+            print(f"[截图服务] ✗ 异常: {region.name} - {e}")
+            import traceback
+            traceback.print_exc()
+            return False, f"异常: {str(e)}", None
+
+    def get_plan(self, regions: List[Region], output_dir: Optional[str] = None) -> CapturePlan:
+        """
+        获取选区集合的截图计划
+        计划按 (选区ID, 选区版本, 配置版本, 显示器布局版本, 锚点版本, 输出目录) 缓存，
+        只有选区存储、配置、显示器布局或锚点位移变化时才重新编译；没有ID的临时选区每次重新编译
+        开启 monitor_batching 时按所在显示器分批截取，跨显示器的选区单独截取
+        设置了锚点的选区先定位锚点，按锚点的位移平移
+        output_dir 为空时使用默认输出目录（录制会话进行中时为会话目录）
+        """
+        regions = self.anchor_service.resolve(regions)
+        config = self.config_service.get_config()
+        output_dir = output_dir or self.default_output_dir()
+        monitors = []
+        if config.monitor_batching and len(regions) > 1:
+            try:
+                monitors = self.monitor_service.get_monitors()
+            except Exception as e:
+                print(f"获取显示器布局失败，逐个截取选区: {e}")
+
+        ids = tuple(region.id for region in regions)
+        key = None
+        if None not in ids:
+            key = (ids, RegionService.version, ConfigService.version, self.monitor_service.layout_version,
+                   AnchorService.version, output_dir)
+            with self._plan_lock:
+                plan = self._plans.get(key)
+                if plan is not None:
+                    self._plans.move_to_end(key)
+                    self.plan_stats["hits"] += 1
+                    return plan
+
+        plan = compile_capture_plan(key, regions, monitors, config.monitor_batching, output_dir)
+        with self._plan_lock:
+            self.plan_stats["compiled"] += 1
+            if key is not None:
+                self._plans[key] = plan
+                if len(self._plans) > PLAN_CACHE_SIZE:
+                    self._plans.popitem(last=False)
+        return plan
+
+    def get_plan_stats(self) -> dict:
+        """获取截图计划缓存统计"""
+        with self._plan_lock:
+            return dict(self.plan_stats, cached=len(self._plans))
+
+    def _sync_frame_cache(self) -> bool:
+        """按配置调整最近截图缓存，显示器布局变化时清空；返回缓存是否启用"""
+        config = self.config_service.get_config()
+        self.frame_cache.size = max(config.frame_cache_size, 1)
+        if self._frame_cache_layout != self.monitor_service.layout_version:
+            self._frame_cache_layout = self.monitor_service.layout_version
+            self.frame_cache.clear()
+        return config.frame_cache_max_age_ms > 0 and config.frame_cache_size > 0
+
+    def _cached_frame(self, region: Region, max_age: float) -> Optional['Image.Image']:
+        """从最近截图缓存裁剪选区（没有覆盖选区且足够新的画面时返回None）"""
+        if not self._sync_frame_cache():
+            return None
+        x1, x2 = sorted((region.x1, region.x2))
+        y1, y2 = sorted((region.y1, region.y2))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return self.frame_cache.get((x1, y1, x2, y2), max_age)
+
+    def execute_plan(self, plan: CapturePlan) -> List[Optional['Image.Image']]:
+        """
+        执行截图计划：逐批截取后裁剪，按计划中的选区顺序返回图片（失败为None）
+        HiDPI显示器上截图的像素尺寸大于逻辑尺寸，裁剪框按两者之比换算（与逐个截取选区的结果一致）
+        """
+        images: List[Optional['Image.Image']] = [None] * len(plan)
+        if not plan.batches:
+            return images
+        from PIL import Image
+        try:
+            mss_instance = self._get_mss_instance()
+        except Exception as e:
+            # 截图后端不可用（如无法连接显示服务）：全部选区截图失败，由调用者按失败处理
+            print(f"截图失败: 无法创建截图后端实例: {e}")
+            return images
+        cache_frames = self._sync_frame_cache()
+        for batch in plan.batches:
+            try:
+                shot = mss_instance.grab(batch.monitor)
+                full = Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+            except Exception as e:
+                print(f"截图失败: {e}")
+                import traceback
+                traceback.print_exc()
+                continue
+            if cache_frames:
+                monitor, spans = self.monitor_service.locate(
+                    batch.left, batch.top, batch.left + batch.width, batch.top + batch.height)
+                self.frame_cache.put(0 if spans else monitor, batch.left, batch.top, batch.width, batch.height, full)
+            scale_x, scale_y = full.width / batch.width, full.height / batch.height
+            for position, box in batch.members:
+                box = scale_box(box, scale_x, scale_y)
+                images[position] = full if box == (0, 0, full.width, full.height) else full.crop(box)
+        return images
+
+    def _capture_shared(self, plan: CapturePlan) -> List[Optional['Image.Image']]:
+        """
+        单飞截图：截取内容相同的并发请求（以及完成后 singleflight_window_ms 内的请求）共享同一次截图
+        返回的图片在调用者之间共享，调用者不得原地修改
+        """
+        window = self.config_service.get_config().singleflight_window_ms / 1000
+        return self.singleflight.do(("grab", plan.grab_key), lambda: self.execute_plan(plan), window)
+
+    def capture_regions(self, regions: List[Region]) -> List[Tuple[Region, Optional['Image.Image']]]:
+        """截取多个选区（按显示器批量截取，并发的相同请求合并），按输入顺序返回"""
+        return list(zip(regions, self._capture_shared(self.get_plan(regions))))
+
+    def capture_and_save_regions(self, regions: List[Region], output_dir: Optional[str] = None,
+                                 progress: Optional[Callable[[int, int], None]] = None) -> List[Tuple[Region, bool, str, Optional[str]]]:
+        """
+        截取并保存多个选区（按显示器批量截取），返回 (选区, 是否成功, 消息, 文件路径) 列表
+        开启 singleflight_share_encode 时，相同选区集合的并发请求还共享同一次编码保存（返回相同文件）
+        progress(已完成数, 总数) 在每个选区保存完成后调用；抛出的异常（如取消任务）在已提交的保存全部完成、
+        并通知截图监听器之后再抛出（已提交的截图仍会写入文件，录制会话等需要记录这些文件）
+        """
+        config = self.config_service.get_config()
+        plan = self.get_plan(regions, output_dir)
+        if not config.singleflight_share_encode:
+            return self._capture_and_save_direct(regions, plan, progress)
+
+        shared = self.singleflight.do(
+            ("save", plan.grab_key, plan.prefixes),
+            lambda: [result[1:] for result in self._capture_and_save_direct(regions, plan)],
+            config.singleflight_window_ms / 1000
+        )
+        if progress is not None:
+            progress(len(regions), len(regions))
+        return [(region, *result) for region, result in zip(regions, shared)]
+
+    def _capture_and_save_direct(self, regions: List[Region], plan: CapturePlan,
+                                 progress: Optional[Callable[[int, int], None]] = None) -> List[Tuple[Region, bool, str, Optional[str]]]:
+        """按计划截取并保存多个选区（不共享编码）"""
+        return self._save_plan_images(regions, plan, self._capture_shared(plan), progress)
+
+    def save_region_images(self, regions: List[Region], images: List[Optional['Image.Image']],
+                           output_dir: Optional[str] = None) -> List[Tuple[Region, bool, str, Optional[str]]]:
+        """
+        保存已截取的选区图片（与截图保存相同的变换、输出和保存流程）
+        用于先截图判断、再决定是否保存的调用者（如命令行的变化触发模式）
+        """
+        return self._save_plan_images(regions, self.get_plan(regions, output_dir), images)
+
+    def _save_plan_images(self, regions: List[Region], plan: CapturePlan, images: List[Optional['Image.Image']],
+                          progress: Optional[Callable[[int, int], None]] = None) -> List[Tuple[Region, bool, str, Optional[str]]]:
+        """
+        按计划保存各选区的截图（None表示截图失败）
+        配置了 output_sinks 时同时把截图分发到各输出；关闭 save_files 时不保存文件，结果的文件路径为None
+        开启自适应编码时，保存的文件按各选区当前的编码参数编码（可能缩小），并记录编码耗时供调节
+        """
+        config = self.config_service.get_config()
+        if config.save_files:
+            try:
+                Path(plan.output_dir).mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                print(f"[截图服务] ✗ 创建输出目录失败: {e}")
+
+        captured_at = datetime.now()
+        images = [None if img is None else apply_transforms(img, transforms)
+                  for img, transforms in zip(images, plan.transforms)]
+        if config.output_sinks:
+            self.sink_service.publish([(region_id, name, img) for region_id, name, img
+                                       in zip(plan.region_ids, plan.names, images) if img is not None], captured_at)
+
+        adaptive = self.adaptive_encoder if self.adaptive_encoder.active(config) else None
+        encodings = [None if adaptive is None or img is None else adaptive.setting_for(region, config)
+                     for region, img in zip(regions, images)]
+
+        # 先提交全部保存任务（process模式下并行编码），再依次等待结果
+        save_start = time.perf_counter()
+        futures = []
+        for img, prefix, region_id, encoding in zip(images, plan.prefixes, plan.region_ids, encodings):
+            if img is None or not config.save_files:
+                futures.append(None)
+                continue
+            if encoding is not None and encoding.downscale > 1 and img.mode not in ("P", "1"):
+                img = apply_transforms(img, (ImageTransform(op="downscale", factor=encoding.downscale),))
+            start = time.perf_counter()
+            future = self._submit_save(img, prefix, captured_at, region_id=region_id, encoding=encoding)
+            if encoding is not None and region_id is not None:
+                future.add_done_callback(lambda _, region_id=region_id, start=start: adaptive.record_encode(
+                    region_id, time.perf_counter() - start))
+            futures.append(future)
+        pending = self.encoder_service.pending
+
+        results = []
+        interrupted: Optional[BaseException] = None
+        for region, img, future in zip(regions, images, futures):
+            file_path = None if future is None else self._wait_saved(future)
             if img is None:
                 print(f"[截图服务] ✗ 截图失败: {region.name}")
-                return False, "截图失败", None
-            
-            file_path = self.save_screenshot(img, region.name)
-            if file_path is None:
+                results.append((region, False, "截图失败", None))
+            elif future is None:
+                results.append((region, True, "截图成功（未保存文件）", None))
+            elif file_path is None:
                 print(f"[截图服务] ✗ 保存失败: {region.name}")
-                return False, "保存失败", None
-            
-            print(f"[截图服务] ✓ 成功: {region.name} -> {file_path}")
-            return True, "截图成功", file_path
+                results.append((region, False, "保存失败", None))
+            else:
+                print(f"[截图服务] ✓ 成功: {region.name} -> {file_path}")
+                results.append((region, True, "截图成功", file_path))
+            if progress is not None and interrupted is None:
+                try:
+                    progress(len(results), len(regions))
+                except BaseException as e:
+                    # 不再调用 progress，但继续等待已提交的保存，通知监听器后再抛出
+                    interrupted = e
+        if adaptive is not None and any(future is not None for future in futures):
+            adaptive.record_frame(time.perf_counter() - save_start, pending)
+
+        if self._capture_listeners:
+            self._notify_saved([
+                {"region_id": region.id, "region_name": region.name, "file_path": file_path,
+                 "captured_at": captured_at.isoformat()}
+                for region, success, _, file_path in results if success and file_path
+            ])
+        if interrupted is not None:
+            raise interrupted
+        return results
+
+    def add_capture_listener(self, listener: Callable[[List[dict]], None]):
+        """注册截图保存完成的监听器"""
+        if listener not in self._capture_listeners:
+            self._capture_listeners.append(listener)
+
+    def remove_capture_listener(self, listener: Callable[[List[dict]], None]):
+        """注销截图保存完成的监听器"""
+        if listener in self._capture_listeners:
+            self._capture_listeners.remove(listener)
+
+    def _notify_saved(self, records: List[dict]):
+        """通知监听器（监听器的异常不影响截图）"""
+        if not records:
+            return
+        for listener in list(self._capture_listeners):
+            try:
+                listener(records)
+            except Exception as e:
+                print(f"[截图服务] ⚠ 截图监听器出错: {e}")
+
+    def capture_burst(self, regions: List[Region], frames: int = 0, duration: float = 0,
+                      output_dir: Optional[str] = None, stop_event: Optional[threading.Event] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        连拍：以最快速度截取 frames 帧（或持续 duration 秒）到预分配的内存中，
+        结束后再统一编码保存，返回实际帧率和帧间隔统计
+        frames 和 duration 同时设置时以先达到者为准；帧数受 burst_max_memory_mb 限制
+        每帧的字节数取自第一帧的实际截图（HiDPI显示器上大于逻辑尺寸）；只按时长连拍时按第一帧的耗时估计帧数，
+        缓冲区按块分配，不足时再追加一块，避免短时间的连拍也分配到内存上限
+        stop_event 被设置时提前结束截取；progress(已编码帧数, 总帧数) 在编码阶段每帧调用，
+        抛出的异常在已提交的帧保存完成、通知截图监听器之后再抛出
+        保存成功的帧（带各自的截取时间）通知截图监听器（如录制会话的帧索引）
+        """
+        config = self.config_service.get_config()
+        plan = self.get_plan(regions)
+        if not plan.batches:
+            return {"success": False, "message": "没有可用的选区"}
+
+        grab_targets = [batch.monitor for batch in plan.batches]
+        times: List[float] = []
+
+        try:
+            mss_instance = self._get_mss_instance()
+            wall_start = time.time()
+            start = time.perf_counter()
+            shots = [mss_instance.grab(monitor) for monitor in grab_targets]
+            grab_seconds = time.perf_counter() - start
+            frame_sizes = [len(shot.raw) for shot in shots]
+            shot_sizes = [shot.size for shot in shots]
+            max_frames = max(1, config.burst_max_memory_mb * 1024 * 1024 // sum(frame_sizes))
+            target = min(frames if frames > 0 else max_frames, max_frames)
+            if frames <= 0 and duration <= 0:
+                target = min(config.burst_frames, max_frames)
+            chunk = target
+            if frames <= 0 and duration > 0:
+                chunk = min(target, max(BURST_CHUNK_FRAMES, math.ceil(duration / max(grab_seconds, 1e-4))))
+
+            # 各批次的缓冲区块（除最后一块外每块 chunk 帧），截取过程中只做内存拷贝
+            buffers: List[List[memoryview]] = [[] for _ in frame_sizes]
+            capacity = 0
+            deadline = start + duration if duration > 0 else None
+            count = 0
+            t = start
+            while True:
+                if count == capacity:
+                    grow = min(chunk, target - capacity)
+                    for k, size in enumerate(frame_sizes):
+                        buffers[k].append(memoryview(bytearray(size * grow)))
+                    capacity += grow
+                offset = count % chunk
+                for k, shot in enumerate(shots):
+                    size = frame_sizes[k]
+                    buffers[k][count // chunk][offset * size:(offset + 1) * size] = shot.raw
+                times.append(t)
+                count += 1
+                if count >= target:
+                    break
+                t = time.perf_counter()
+                if (deadline is not None and t >= deadline) or (stop_event is not None and stop_event.is_set()):
+                    break
+                shots = [mss_instance.grab(monitor) for monitor in grab_targets]
+            capture_seconds = time.perf_counter() - start
         except Exception as e:
-            print(f"[截图服务] ✗ 异常: {region.name} - {e}")
+            print(f"[连拍] ✗ 截图失败: {e}")
             import traceback
             traceback.print_exc()
-            return False, f"异常: {str(e)}", None
+            return {"success": False, "message": f"截图失败: {e}"}
+
+        # 截取结束后再编码保存
+        from PIL import Image
+        encode_start = time.perf_counter()
+        burst_dir = Path(output_dir or self.default_output_dir()) / datetime.fromtimestamp(wall_start).strftime("burst_%Y%m%d_%H%M%S_%f")[:-3]
+        burst_dir.mkdir(parents=True, exist_ok=True)
+        prefixes = [str(burst_dir / name) for name in plan.names]
+        futures = []  # (选区位置, 截取时间, Future)
+        interrupted: Optional[BaseException] = None
+        for i in range(count):
+            captured_at = datetime.fromtimestamp(wall_start + (times[i] - start))
+            offset = i % chunk
+            for k, batch in enumerate(plan.batches):
+                size = frame_sizes[k]
+                frame = Image.frombuffer("RGB", shot_sizes[k], buffers[k][i // chunk][offset * size:(offset + 1) * size],
+                                         "raw", "BGRX", 0, 1)
+                scale_x, scale_y = frame.width / batch.width, frame.height / batch.height
+                for position, box in batch.members:
+                    box = scale_box(box, scale_x, scale_y)
+                    img = frame if box == (0, 0, frame.width, frame.height) else frame.crop(box)
+                    img = apply_transforms(img, plan.transforms[position])
+                    futures.append((position, captured_at,
+                                    self._submit_save(img, prefixes[position], captured_at, f"_{i:04d}")))
+            if progress is not None:
+                try:
+                    progress(i + 1, count)
+                except BaseException as e:
+                    # 不再提交后续帧，已提交的帧仍会写入文件
+                    interrupted = e
+                    break
+        paths = [self._wait_saved(future) for _, _, future in futures]
+        if self._capture_listeners:
+            self._notify_saved([
+                {"region_id": plan.region_ids[position], "region_name": plan.names[position], "file_path": path,
+                 "captured_at": captured_at.isoformat()}
+                for (position, captured_at, _), path in zip(futures, paths) if path
+            ])
+        if interrupted is not None:
+            raise interrupted
+        saved = sum(1 for path in paths if path)
+        failed = len(futures) - saved
+        encode_seconds = time.perf_counter() - encode_start
+
+        intervals = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+        interval_stats = None
+        if intervals:
+            ordered = sorted(intervals)
+            interval_stats = {
+                "min": round(ordered[0], 3),
+                "mean": round(statistics.fmean(intervals), 3),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max": round(ordered[-1], 3),
+                "stdev": round(statistics.pstdev(intervals), 3)
+            }
+        fps = (count - 1) / (times[-1] - times[0]) if count > 1 and times[-1] > times[0] else None
+        print(f"[连拍] 完成: {count} 帧，{capture_seconds:.3f}s，fps={fps and round(fps, 1)}，保存 {saved} 个文件")
+        return {
+            "success": failed == 0 and count > 0,
+            "message": "连拍完成" if failed == 0 else f"{failed} 个文件保存失败",
+            "frames": count,
+            "grabs_per_frame": len(plan.batches),
+            "capture_seconds": round(capture_seconds, 4),
+            "encode_seconds": round(encode_seconds, 4),
+            "fps": round(fps, 2) if fps else None,
+            "interval_ms": interval_stats,
+            "files_saved": saved,
+            "output_dir": str(burst_dir)
+        }
 
     def get_region_preview(self, region: Region, max_size: Tuple[int, int] = (200, 200)) -> Optional[bytes]:
-        """获取选区预览图（缩略图）"""
-        img = self.capture_region(region)
+        """获取选区预览图（缩略图），最近 frame_cache_max_age_ms 内截取过覆盖该选区的画面时直接裁剪"""
+        img = self.capture_region(region, max_age=self.config_service.get_config().frame_cache_max_age_ms / 1000)
         if img is None:
             return None
         
-        # 生成缩略图
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        # 生成缩略图（截图可能与其他请求共享，不能原地修改）
+        from PIL import Image, ImageOps
+        if img.width > max_size[0] or img.height > max_size[1]:
+            img = ImageOps.contain(img, max_size, Image.Resampling.LANCZOS)
         
         # 转换为bytes
         from io import BytesIO
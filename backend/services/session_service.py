@@ -0,0 +1,314 @@
+"""
+录制会话：会话进行中时，保存到默认输出目录的截图（定时截图、热键、API截图）改为保存到 {output_dir}/sessions/{会话ID}/
+- manifest.jsonl 逐行追加：会话开始（配置、选区快照）、选区变化后的选区快照、每帧的索引记录（会话序号、选区序号、时间、文件）、
+  结束时的汇总统计。文件在会话期间保持打开并缓冲写入，每 MANIFEST_FLUSH_INTERVAL 秒刷新一次，追加一帧只需格式化一行JSON
+- summary.json：结束时的汇总统计（帧数、各选区的帧数、帧率和帧间隔、文件总大小）
+- 同一时间只有一个进行中的会话；进程异常退出时 manifest 中没有汇总记录，会话列表中状态为 incomplete
+指定了输出目录的截图（如设置了输出目录的分组）仍保存到原目录，但同样记入会话的 manifest
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from backend.services.config_service import ConfigService
+from backend.services.region_service import RegionService
+
+SESSIONS_DIR = "sessions"
+MANIFEST_FILE = "manifest.jsonl"
+SUMMARY_FILE = "summary.json"
+# manifest 缓冲写入的刷新间隔（秒）
+MANIFEST_FLUSH_INTERVAL = 1.0
+# 会话名称：字母、数字、汉字、下划线、连字符、点和空格
+_NAME_PATTERN = re.compile(r"^[\w\-. ]{1,64}$")
+
+
+def _dump(entry: dict) -> str:
+    return json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+class RecordingSession:
+    """一个进行中的录制会话"""
+
+    def __init__(self, session_id: str, name: str, note: str, directory: str):
+        self.id = session_id
+        self.name = name
+        self.note = note
+        self.directory = directory
+        self.started_at = datetime.now()
+        self.seq = 0  # 会话内的帧序号
+        self.regions: Dict[str, dict] = {}  # 选区ID（或名称） -> 帧数、首帧和末帧时间、最大帧间隔
+        self._lock = threading.Lock()
+        self._region_version = RegionService.version
+        self._last_flush = time.monotonic()
+        self._last_time = (None, None)  # 上一帧的 (ISO时间, 时间戳)，同一次截图的各选区时间相同，避免重复解析
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self._file = open(Path(directory) / MANIFEST_FILE, "a", encoding="utf-8")
+
+    def header(self) -> dict:
+        """会话开始记录：配置和选区快照"""
+        config = ConfigService().get_config()
+        return {
+            "type": "session",
+            "id": self.id,
+            "name": self.name,
+            "note": self.note,
+            "started_at": self.started_at.isoformat(),
+            "directory": self.directory,
+            "config": config.dict() if hasattr(config, 'dict') else config.model_dump(),
+            "regions": self._regions_snapshot()
+        }
+
+    @staticmethod
+    def _regions_snapshot() -> List[dict]:
+        return [region.to_dict() for region in RegionService().get_all_regions()]
+
+    def open(self):
+        """写入会话开始记录"""
+        with self._lock:
+            self._file.write(_dump(self.header()))
+            self._file.flush()
+
+    def _timestamp(self, captured_at: str) -> float:
+        if self._last_time[0] != captured_at:
+            self._last_time = (captured_at, datetime.fromisoformat(captured_at).timestamp())
+        return self._last_time[1]
+
+    def append(self, records: List[dict]):
+        """追加截图记录（截图服务的保存监听器）"""
+        prefix = self.directory + os.sep
+        with self._lock:
+            if self._file.closed:
+                return
+            if RegionService.version != self._region_version:
+                # 会话期间选区发生变化：追加新的选区快照
+                self._region_version = RegionService.version
+                self._file.write(_dump({"type": "regions", "at": datetime.now().isoformat(),
+                                        "regions": self._regions_snapshot()}))
+            for record in records:
+                timestamp = self._timestamp(record["captured_at"])
+                key = record["region_id"] or record["region_name"]
+                stats = self.regions.get(key)
+                if stats is None:
+                    stats = self.regions[key] = {"region_id": record["region_id"], "region_name": record["region_name"],
+                                                 "frames": 0, "first": timestamp, "last": timestamp, "max_gap": 0.0}
+                else:
+                    stats["max_gap"] = max(stats["max_gap"], timestamp - stats["last"])
+                    stats["last"] = timestamp
+                stats["frames"] += 1
+                self.seq += 1
+                file_path = record["file_path"]
+                self._file.write(_dump({
+                    "type": "frame",
+                    "seq": self.seq,
+                    "region_seq": stats["frames"],
+                    "region_id": record["region_id"],
+                    "region_name": record["region_name"],
+                    "captured_at": record["captured_at"],
+                    "ts": round(timestamp, 3),
+                    "file": file_path[len(prefix):] if file_path.startswith(prefix) else file_path
+                }))
+            if time.monotonic() - self._last_flush >= MANIFEST_FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def stats(self) -> dict:
+        """当前的汇总统计"""
+        now = datetime.now()
+        with self._lock:
+            regions = []
+            for stats in self.regions.values():
+                span = stats["last"] - stats["first"]
+                regions.append({
+                    "region_id": stats["region_id"],
+                    "region_name": stats["region_name"],
+                    "frames": stats["frames"],
+                    "first": datetime.fromtimestamp(stats["first"]).isoformat(),
+                    "last": datetime.fromtimestamp(stats["last"]).isoformat(),
+                    "fps": round((stats["frames"] - 1) / span, 3) if span > 0 else None,
+                    "mean_interval_s": round(span / (stats["frames"] - 1), 3) if stats["frames"] > 1 else None,
+                    "max_interval_s": round(stats["max_gap"], 3) if stats["frames"] > 1 else None
+                })
+            return {
+                "id": self.id,
+                "name": self.name,
+                "started_at": self.started_at.isoformat(),
+                "duration_s": round((now - self.started_at).total_seconds(), 3),
+                "frames": self.seq,
+                "regions": regions
+            }
+
+    def close(self, reason: str) -> dict:
+        """结束会话：追加汇总记录并写入 summary.json，返回汇总统计"""
+        summary = dict(self.stats(), stopped_at=datetime.now().isoformat(), reason=reason)
+        # 文件总大小（包括会话目录中的连拍子目录）
+        total_bytes, files = 0, 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name in (MANIFEST_FILE, SUMMARY_FILE):
+                    continue
+                try:
+                    total_bytes += os.path.getsize(os.path.join(root, name))
+                    files += 1
+                except OSError:
+                    pass
+        summary.update(files=files, bytes=total_bytes)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(_dump(dict(summary, type="summary")))
+                self._file.close()
+        with open(Path(self.directory) / SUMMARY_FILE, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+class SessionService:
+    """录制会话单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SessionService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self.active: Optional[RecordingSession] = None
+
+    @property
+    def output_dir(self) -> Optional[str]:
+        """进行中的会话目录（没有进行中的会话时为None）"""
+        session = self.active
+        return None if session is None else session.directory
+
+    def _root(self) -> Path:
+        return Path(self.config_service.get_config().output_dir) / SESSIONS_DIR
+
+    def start(self, name: str = "", note: str = "") -> dict:
+        """开始会话（名称为空时按时间生成），返回会话开始记录；已有进行中的会话时抛出RuntimeError"""
+        from backend.services.screenshot_service import ScreenshotService
+        name = name.strip() or datetime.now().strftime("session_%Y%m%d_%H%M%S")
+        if not _NAME_PATTERN.match(name):
+            raise ValueError("会话名称只能包含字母、数字、汉字、下划线、连字符、点和空格（最多64个字符）")
+        with self._lock:
+            if self.active is not None:
+                raise RuntimeError(f"已有进行中的录制会话: {self.active.name}")
+            session_id = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            directory = self._root() / session_id
+            suffix = 1
+            while directory.exists():
+                suffix += 1
+                directory = self._root() / f"{session_id}_{suffix}"
+            session = RecordingSession(directory.name, name, note, str(directory))
+            session.open()
+            self.active = session
+        ScreenshotService().add_capture_listener(session.append)
+        print(f"[录制会话] ▶ 开始: {session.name} -> {session.directory}")
+        return session.header()
+
+    def stop(self, reason: str = "stopped") -> Optional[dict]:
+        """结束进行中的会话，返回汇总统计（没有进行中的会话时返回None）"""
+        from backend.services.screenshot_service import ScreenshotService
+        with self._lock:
+            session, self.active = self.active, None
+        if session is None:
+            return None
+        ScreenshotService().remove_capture_listener(session.append)
+        summary = session.close(reason)
+        print(f"[录制会话] ■ 结束: {session.name}，{summary['frames']} 帧，{summary['duration_s']}s")
+        return summary
+
+    def get_active(self) -> Optional[dict]:
+        """进行中的会话的当前统计"""
+        session = self.active
+        return None if session is None else dict(session.stats(), directory=session.directory, note=session.note)
+
+    def _session_dir(self, session_id: str) -> Optional[Path]:
+        if not session_id or session_id in (".", "..") or "/" in session_id or "\\" in session_id:
+            return None
+        directory = self._root() / session_id
+        return directory if (directory / MANIFEST_FILE).is_file() else None
+
+    def _describe(self, directory: Path) -> Optional[dict]:
+        """会话概要：开始记录（不含配置）、状态和汇总统计"""
+        try:
+            with open(directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+        info = {key: header.get(key) for key in ("id", "name", "note", "started_at", "directory")}
+        info["region_count"] = len(header.get("regions") or [])
+        session = self.active
+        if session is not None and session.id == directory.name:
+            info.update(status="active", summary=session.stats())
+        elif (directory / SUMMARY_FILE).is_file():
+            with open(directory / SUMMARY_FILE, "r", encoding="utf-8") as f:
+                info.update(status="completed", summary=json.load(f))
+        else:
+            info.update(status="incomplete", summary=None)
+        return info
+
+    def list_sessions(self) -> List[dict]:
+        """输出目录中的全部会话（最新的在前）"""
+        root = self._root()
+        if not root.is_dir():
+            return []
+        sessions = [self._describe(path) for path in root.iterdir() if (path / MANIFEST_FILE).is_file()]
+        return sorted([s for s in sessions if s is not None], key=lambda s: s["started_at"] or "", reverse=True)
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """会话详情（含开始时的配置和选区快照），会话不存在时返回None"""
+        directory = self._session_dir(session_id)
+        if directory is None:
+            return None
+        info = self._describe(directory)
+        if info is None:
+            return None
+        with open(directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+        info.update(config=header.get("config"), regions=header.get("regions"))
+        return info
+
+    def get_frames(self, session_id: str, region: Optional[str] = None, offset: int = 0,
+                   limit: int = 100) -> Optional[List[dict]]:
+        """按顺序读取会话的帧索引（region 为选区ID或名称），会话不存在时返回None"""
+        directory = self._session_dir(session_id)
+        if directory is None:
+            return None
+        session = self.active
+        if session is not None and session.id == session_id:
+            session.flush()
+        frames = []
+        skipped = 0
+        with open(directory / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                # 只解析帧记录（开始记录包含完整配置，较大）
+                if not line.startswith('{"type": "frame"'):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 异常退出时最后一行可能不完整
+                    break
+                if region and region not in (entry["region_id"], entry["region_name"]):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                frames.append(entry)
+                if len(frames) >= limit:
+                    break
+        return frames
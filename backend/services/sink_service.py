@@ -0,0 +1,415 @@
+"""
+截图输出：截图除写入输出目录外，按 output_sinks 配置直接发送给下游消费者，不必再从磁盘读取
+- filesystem：写入指定目录（PNG，与输出目录的保存方式相同）
+- memory：保存在内存队列中，由 GET /api/sinks/{name}/frames 取出
+- socket：以帧流写入 Unix socket（消费者监听，断开后自动重连）
+- http：每批一个 POST 请求发送到本机地址
+每个输出有独立的待发送队列和发送线程：按 batch_size / batch_ms 凑批发送，失败时按指数退避重试，
+队列满时按 overflow 处理（drop_oldest 丢弃最旧的帧 / drop_new 丢弃新帧 / block 阻塞截图最多 block_ms）
+
+socket 和 http 的帧格式（小端）:
+    每帧: 帧头 <4sII（b"LXF1"、元数据长度、数据长度） + 元数据(JSON) + 数据
+    元数据: seq, region_id, region_name, captured_at, format(png/raw), mode, width, height
+    raw 格式的数据为原始像素（按 mode 排列），省去PNG编码
+"""
+import io
+import json
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from backend.models import SinkConfig
+from backend.services.config_service import ConfigService
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+SINK_TYPES = ("filesystem", "memory", "socket", "http")
+SINK_FORMATS = ("png", "raw")
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new", "block")
+FRAME_MAGIC = b"LXF1"
+FRAME_HEADER = struct.Struct("<4sII")
+
+
+class SinkFrame(NamedTuple):
+    """待发送的一帧（图片在调用者之间共享，不得原地修改）"""
+    seq: int
+    region_id: Optional[str]
+    region_name: str
+    captured_at: datetime
+    image: 'Image.Image'
+
+
+def encode_frame(frame: SinkFrame, fmt: str, compress_level: int = 6) -> Tuple[dict, bytes]:
+    """编码一帧，返回 (元数据, 数据)"""
+    img = frame.image
+    if fmt == "raw":
+        data = img.tobytes()
+    else:
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG", compress_level=compress_level)
+        data = buffer.getvalue()
+    meta = {
+        "seq": frame.seq,
+        "region_id": frame.region_id,
+        "region_name": frame.region_name,
+        "captured_at": frame.captured_at.isoformat(),
+        "format": fmt,
+        "mode": img.mode,
+        "width": img.width,
+        "height": img.height
+    }
+    return meta, data
+
+
+def pack_frame(meta: dict, data: bytes) -> bytes:
+    """按帧格式打包"""
+    header = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(header), len(data)) + header + data
+
+
+def unpack_frames(payload: bytes) -> List[Tuple[dict, bytes]]:
+    """解析帧流（供消费者使用）"""
+    frames, offset = [], 0
+    while offset + FRAME_HEADER.size <= len(payload):
+        magic, header_size, data_size = FRAME_HEADER.unpack_from(payload, offset)
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"无效的帧头: {magic!r}")
+        offset += FRAME_HEADER.size
+        meta = json.loads(payload[offset:offset + header_size])
+        offset += header_size
+        frames.append((meta, payload[offset:offset + data_size]))
+        offset += data_size
+    return frames
+
+
+class Sink:
+    """输出基类：待发送队列 + 发送线程，子类实现 write_batch"""
+
+    def __init__(self, config: SinkConfig):
+        self.config = config
+        self.name = config.name
+        self._pending: Deque[SinkFrame] = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._drain = False
+        self.stats = {"queued": 0, "sent": 0, "batches": 0, "dropped": 0, "retries": 0, "failed": 0,
+                      "bytes": 0, "last_error": None}
+        self._thread = threading.Thread(target=self._worker, daemon=True, name=f"sink-{self.name}")
+        self._thread.start()
+
+    # ---------- 入队（截图线程） ----------
+
+    def offer(self, frames: List[SinkFrame]):
+        """提交待发送的帧，队列满时按 overflow 处理"""
+        limit = max(self.config.queue_size, 1)
+        with self._cond:
+            for frame in frames:
+                if len(self._pending) >= limit:
+                    if self.config.overflow == "block":
+                        deadline = time.monotonic() + self.config.block_ms / 1000
+                        while len(self._pending) >= limit and self._running:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            self._cond.wait(remaining)
+                    if len(self._pending) >= limit:
+                        # block 超时后与 drop_new 相同，丢弃新帧
+                        self.stats["dropped"] += 1
+                        if self.config.overflow != "drop_oldest":
+                            continue
+                        self._pending.popleft()
+                self._pending.append(frame)
+                self.stats["queued"] += 1
+            self._cond.notify_all()
+
+    # ---------- 发送（发送线程） ----------
+
+    def _next_batch(self) -> List[SinkFrame]:
+        """等待第一帧后最多再等 batch_ms 凑满一批"""
+        batch_size = max(self.config.batch_size, 1)
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait(0.5)
+            deadline = time.monotonic() + self.config.batch_ms / 1000
+            while self._running and len(self._pending) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(batch_size, len(self._pending)))]
+            self._cond.notify_all()
+        return batch
+
+    def _worker(self):
+        while self._running:
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+        # 停止时按需发送剩余的帧（每批只尝试一次）
+        while self._drain and self._pending:
+            self._send(self._next_batch())
+        self.close()
+
+    def _send(self, batch: List[SinkFrame]):
+        """发送一批，失败时按 retry_backoff_ms * 2^n 退避重试，超过 retries 次后丢弃该批"""
+        for attempt in range(max(self.config.retries, 0) + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                time.sleep(self.config.retry_backoff_ms / 1000 * 2 ** (attempt - 1))
+            try:
+                self.stats["bytes"] += self.write_batch(batch)
+                self.stats["sent"] += len(batch)
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                if not self._running:
+                    break
+        self.stats["failed"] += len(batch)
+        print(f"[输出] ✗ {self.name}: 发送 {len(batch)} 帧失败: {self.stats['last_error']}")
+
+    def _encode_batch(self, batch: List[SinkFrame]) -> List[Tuple[dict, bytes]]:
+        compress_level = ConfigService().get_config().png_compress_level
+        return [encode_frame(frame, self.config.format, compress_level) for frame in batch]
+
+    def write_batch(self, batch: List[SinkFrame]) -> int:
+        """发送一批帧，返回发送的字节数；失败时抛出异常"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放连接等资源"""
+
+    def stop(self, drain: bool = False):
+        """停止发送线程（drain 为True时先发送剩余的帧）"""
+        with self._cond:
+            self._running = False
+            self._drain = drain
+            self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None):
+        """等待发送线程结束"""
+        self._thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return dict(self.stats, name=self.name, type=self.config.type, pending=len(self._pending))
+
+
+class FilesystemSink(Sink):
+    """写入指定目录：{path}/{选区名}_{时间戳}.png"""
+
+    def write_batch(self, batch: List[SinkFrame]) -> int:
+        directory = Path(self.config.path)
+        directory.mkdir(parents=True, exist_ok=True)
+        compress_level = ConfigService().get_config().png_compress_level
+        written = 0
+        for frame in batch:
+            base = directory / f"{frame.region_name}_{frame.captured_at.strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+            path = Path(f"{base}.png")
+            if path.exists():
+                path = Path(f"{base}_{frame.seq}.png")
+            frame.image.save(path, "PNG", compress_level=compress_level)
+            written += path.stat().st_size
+        return written
+
+
+class MemorySink(Sink):
+    """内存队列：已编码的帧保存在内存中等待取出，满 queue_size 帧后停止接收（反压到待发送队列）"""
+
+    def __init__(self, config: SinkConfig):
+        self._buffer: Deque[Tuple[dict, bytes]] = deque()
+        self._buffer_cond = threading.Condition()
+        super().__init__(config)
+
+    def _next_batch(self) -> List[SinkFrame]:
+        """内存队列放不下一批时不取帧，帧留在待发送队列中，由 offer 按 overflow 处理"""
+        limit = max(self.config.queue_size, 1)
+        room = min(max(self.config.batch_size, 1), limit)
+        with self._buffer_cond:
+            while self._running and len(self._buffer) + room > limit:
+                self._buffer_cond.wait(0.5)
+        return super()._next_batch()
+
+    def write_batch(self, batch: List[SinkFrame]) -> int:
+        encoded = self._encode_batch(batch)
+        with self._buffer_cond:
+            self._buffer.extend(encoded)
+            self._buffer_cond.notify_all()
+        return sum(len(data) for _, data in encoded)
+
+    def drain(self, limit: int = 10, wait: float = 0) -> List[Tuple[dict, bytes]]:
+        """取出最多 limit 帧，队列为空时最多等待 wait 秒"""
+        with self._buffer_cond:
+            if not self._buffer and wait > 0:
+                self._buffer_cond.wait_for(lambda: self._buffer, wait)
+            frames = [self._buffer.popleft() for _ in range(min(max(limit, 0), len(self._buffer)))]
+            if frames:
+                self._buffer_cond.notify_all()
+            return frames
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        with self._buffer_cond:
+            stats["buffered"] = len(self._buffer)
+        return stats
+
+
+class SocketSink(Sink):
+    """Unix socket 帧流（连接断开时丢弃连接，重试时重新连接）"""
+
+    def __init__(self, config: SinkConfig):
+        self._sock: Optional[socket.socket] = None
+        super().__init__(config)
+
+    def write_batch(self, batch: List[SinkFrame]) -> int:
+        payload = b"".join(pack_frame(meta, data) for meta, data in self._encode_batch(batch))
+        try:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.config.timeout)
+                sock.connect(self.config.path)
+                self._sock = sock
+            self._sock.sendall(payload)
+        except OSError:
+            self.close()
+            raise
+        return len(payload)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+class HttpSink(Sink):
+    """每批一个 POST 请求（application/octet-stream，帧流格式，X-Frame-Count 为帧数）"""
+
+    def write_batch(self, batch: List[SinkFrame]) -> int:
+        payload = b"".join(pack_frame(meta, data) for meta, data in self._encode_batch(batch))
+        request = urllib.request.Request(self.config.url, data=payload, method="POST", headers={
+            "Content-Type": "application/octet-stream",
+            "X-Frame-Count": str(len(batch))
+        })
+        with urllib.request.urlopen(request, timeout=self.config.timeout) as response:
+            response.read()
+        return len(payload)
+
+
+_SINK_CLASSES = {"filesystem": FilesystemSink, "memory": MemorySink, "socket": SocketSink, "http": HttpSink}
+
+
+def validate_sink(config: SinkConfig) -> Optional[str]:
+    """检查输出配置，返回错误信息（合法时返回None）"""
+    if not config.name:
+        return "输出名称不能为空"
+    if config.type not in SINK_TYPES:
+        return f"输出 {config.name} 的类型必须是 {' / '.join(SINK_TYPES)}"
+    if config.format not in SINK_FORMATS:
+        return f"输出 {config.name} 的格式必须是 {' / '.join(SINK_FORMATS)}"
+    if config.overflow not in OVERFLOW_POLICIES:
+        return f"输出 {config.name} 的 overflow 必须是 {' / '.join(OVERFLOW_POLICIES)}"
+    if config.type == "filesystem" and not config.path:
+        return f"输出 {config.name} 需要指定输出目录（path）"
+    if config.type == "socket" and not config.path:
+        return f"输出 {config.name} 需要指定 Unix socket 路径（path）"
+    if config.type == "http":
+        host = urllib.parse.urlsplit(config.url).hostname
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            return f"输出 {config.name} 的 url 必须是本机地址"
+    return None
+
+
+class SinkService:
+    """截图输出单例：按配置创建输出，截图保存时把帧分发到各输出"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SinkService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.Lock()
+        self._sinks: Dict[str, Sink] = {}
+        self._configs: Dict[str, dict] = {}  # 输出名称 -> 创建时的配置
+        self._config_version = -1
+        self._seq = 0
+
+    def _sync(self) -> Dict[str, Sink]:
+        """配置变化时增删输出（配置未变的输出保持运行，不丢失待发送的帧）"""
+        if self._config_version == ConfigService.version:
+            return self._sinks
+        with self._lock:
+            if self._config_version == ConfigService.version:
+                return self._sinks
+            wanted = {}
+            for config in self.config_service.get_config().output_sinks:
+                error = validate_sink(config)
+                if error:
+                    print(f"[输出] ⚠ 忽略无效的输出配置: {error}")
+                elif config.enabled:
+                    wanted[config.name] = config
+            sinks = dict(self._sinks)
+            wanted_data = {name: config.dict() if hasattr(config, 'dict') else config.model_dump()
+                           for name, config in wanted.items()}
+            for name in list(sinks):
+                if wanted_data.get(name) != self._configs.get(name):
+                    sinks.pop(name).stop()
+                    self._configs.pop(name, None)
+            for name, config in wanted.items():
+                if name not in sinks:
+                    sinks[name] = _SINK_CLASSES[config.type](config)
+                    self._configs[name] = wanted_data[name]
+                    print(f"[输出] 已启用输出: {name} ({config.type})")
+            self._sinks = sinks
+            self._config_version = ConfigService.version
+        return self._sinks
+
+    def publish(self, items: List[Tuple[Optional[str], str, 'Image.Image']], captured_at: Optional[datetime] = None):
+        """把一次截图的各选区 (选区ID, 选区名称, 图片) 分发到全部输出"""
+        sinks = self._sync()
+        if not sinks or not items:
+            return
+        captured_at = captured_at or datetime.now()
+        with self._lock:
+            start = self._seq
+            self._seq += len(items)
+        frames = [SinkFrame(start + i, region_id, name, captured_at, img)
+                  for i, (region_id, name, img) in enumerate(items)]
+        for sink in list(sinks.values()):
+            sink.offer(frames)
+
+    def get_sink(self, name: str) -> Optional[Sink]:
+        return self._sync().get(name)
+
+    def get_stats(self) -> List[dict]:
+        return [sink.get_stats() for sink in self._sync().values()]
+
+    def stop(self, timeout: float = 0):
+        """停止全部输出；timeout 大于0时先发送各输出剩余的帧，最多等待 timeout 秒"""
+        with self._lock:
+            sinks, self._sinks = self._sinks, {}
+            self._configs.clear()
+            self._config_version = -1
+        for sink in sinks.values():
+            sink.stop(drain=timeout > 0)
+        deadline = time.monotonic() + timeout
+        for sink in sinks.values():
+            if timeout > 0:
+                sink.join(max(deadline - time.monotonic(), 0))
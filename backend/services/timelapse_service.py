@@ -0,0 +1,356 @@
+"""
+延时拼图：按选区和时间段把保存的截图拼成缩略图网格（例如每分钟一格、每小时一张），一天的截图只需查看几张图片
+- 拼图保存在 {output_dir}/timelapse/{选区名}/{开始时间}.png，格子与截图的对应关系保存在同名 .json 中
+- 截图保存后由后台线程增量追加：每个格子只取落在该时间段内的第一张截图，格子已有截图时不读取文件；
+  最近使用的拼图保留在内存中，修改后每 FLUSH_INTERVAL 秒写回文件（先写临时文件再替换，读取时不会读到一半）
+- 已有的拼图在重启后继续追加（按文件中记录的布局），修改 timelapse_* 配置只影响新的拼图
+- 已有的截图可以通过 timelapse 任务补充到拼图中（差分存储的分段文件除外）
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, TYPE_CHECKING
+from backend.models import AppConfig
+from backend.services.config_service import ConfigService
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+TIMELAPSE_DIR = "timelapse"
+# 修改过的拼图写回文件的间隔（秒）
+FLUSH_INTERVAL = 10.0
+# 保留在内存中的拼图数
+OPEN_SHEETS = 8
+# 待处理的截图记录上限（超出时丢弃，不阻塞截图）
+QUEUE_MAX = 10000
+# 每张拼图的格子数上限
+MAX_TILES = 4096
+# 空白格子的颜色
+BACKGROUND = (24, 24, 24)
+# 截图文件名 {选区名}_{日期}_{时间}_{毫秒}[_{序号}]
+_FILE_PATTERN = re.compile(r"^(?P<name>.+)_(?P<time>\d{8}_\d{6}_\d{3})(?:_\d+)?$")
+
+
+def validate_timelapse(config: AppConfig) -> Optional[str]:
+    """检查延时拼图配置，返回错误信息（合法时返回None）"""
+    tile, sheet = config.timelapse_tile_seconds, config.timelapse_sheet_seconds
+    if tile < 1 or sheet < tile or sheet > 86400:
+        return "timelapse_tile_seconds 至少为1，timelapse_sheet_seconds 在 timelapse_tile_seconds 和 86400 之间"
+    if sheet % tile:
+        return "timelapse_sheet_seconds 必须是 timelapse_tile_seconds 的整数倍"
+    if sheet // tile > MAX_TILES:
+        return f"每张拼图最多 {MAX_TILES} 格"
+    if not 16 <= config.timelapse_tile_width <= 1024 or config.timelapse_columns < 1:
+        return "timelapse_tile_width 必须在 16 到 1024 之间，timelapse_columns 至少为1"
+    return None
+
+
+def parse_capture_name(path: Path) -> Optional[tuple]:
+    """从截图文件名解析 (选区名, 截取时间)，不是截图文件名时返回None"""
+    match = _FILE_PATTERN.match(path.stem)
+    if match is None:
+        return None
+    try:
+        return match.group("name"), datetime.strptime(match.group("time") + "000", "%Y%m%d_%H%M%S_%f")
+    except ValueError:
+        return None
+
+
+def _safe_part(name: str) -> bool:
+    return bool(name) and name not in (".", "..") and "/" not in name and "\\" not in name
+
+
+class _Sheet:
+    """一张拼图（图片和格子索引）"""
+
+    def __init__(self, path: Path, meta: dict, image: 'Image.Image'):
+        self.path = path
+        self.meta = meta
+        self.image = image
+        self.start = datetime.fromisoformat(meta["start"])
+        self.dirty = False
+
+    def slot(self, captured_at: datetime) -> Optional[int]:
+        slot = int((captured_at - self.start).total_seconds() // self.meta["tile_seconds"])
+        return slot if 0 <= slot < self.meta["columns"] * self.meta["rows"] else None
+
+    def paste(self, slot: int, img: 'Image.Image', captured_at: datetime, file_path: str):
+        """把截图缩小后放入格子（居中，保持宽高比）"""
+        from PIL import Image, ImageOps
+        width, height = self.meta["tile_width"], self.meta["tile_height"]
+        # 先按整数倍快速缩小，再精确缩放
+        factor = max(1, min(img.width // width, img.height // height))
+        tile = ImageOps.contain((img.reduce(factor) if factor > 1 else img).convert("RGB"), (width, height),
+                                Image.Resampling.BILINEAR)
+        column, row = slot % self.meta["columns"], slot // self.meta["columns"]
+        self.image.paste(tile, (column * width + (width - tile.width) // 2, row * height + (height - tile.height) // 2))
+        self.meta["tiles"][str(slot)] = {"captured_at": captured_at.isoformat(), "file": file_path}
+        self.dirty = True
+
+    def flush(self, compress_level: int):
+        """写回图片和索引"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        image_tmp = self.path.with_name(self.path.name + ".tmp")
+        self.image.save(image_tmp, "PNG", compress_level=compress_level)
+        os.replace(image_tmp, self.path)
+        index_path = self.path.with_suffix(".json")
+        index_tmp = index_path.with_name(index_path.name + ".tmp")
+        with open(index_tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(index_tmp, index_path)
+        self.dirty = False
+
+
+class TimelapseService:
+    """延时拼图单例"""
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TimelapseService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.config_service = ConfigService()
+        self._lock = threading.RLock()
+        self._sheets: 'OrderedDict[Path, _Sheet]' = OrderedDict()
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_MAX)
+        self._thread: Optional[threading.Thread] = None
+        self._last_flush = time.monotonic()
+        self.stats = {"tiles": 0, "skipped": 0, "dropped": 0, "errors": 0, "sheets_created": 0}
+
+    def _root(self) -> Path:
+        return Path(self.config_service.get_config().output_dir) / TIMELAPSE_DIR
+
+    # ---------- 追加截图 ----------
+
+    def on_saved(self, records: List[dict]):
+        """截图服务的保存监听器：开启 timelapse_enabled 时把截图记录交给后台线程"""
+        if not self.config_service.get_config().timelapse_enabled:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, daemon=True, name="timelapse")
+                    self._thread.start()
+        for record in records:
+            try:
+                self._queue.put_nowait((record["region_name"], datetime.fromisoformat(record["captured_at"]),
+                                        record["file_path"]))
+            except queue.Full:
+                self.stats["dropped"] += 1
+
+    def _worker(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                try:
+                    self.add_frame(*item)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[延时拼图] ✗ 追加截图失败: {e}")
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self.flush()
+
+    def _sheet_start(self, captured_at: datetime, sheet_seconds: int) -> datetime:
+        """截图所在拼图的开始时间（从当天零点起按 sheet_seconds 对齐）"""
+        day = captured_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        offset = int((captured_at - day).total_seconds()) // sheet_seconds * sheet_seconds
+        return day + timedelta(seconds=offset)
+
+    def _get_sheet(self, region_name: str, captured_at: datetime, first_frame: Optional['Image.Image'] = None,
+                   create: bool = False) -> Optional[_Sheet]:
+        """获取截图所在的拼图（需持有锁）：优先内存，其次文件；都没有且 create 为 True 时按截图尺寸新建"""
+        config = self.config_service.get_config()
+        start = self._sheet_start(captured_at, config.timelapse_sheet_seconds)
+        path = self._root() / region_name / f"{start.strftime('%Y%m%d_%H%M%S')}.png"
+        sheet = self._sheets.get(path)
+        if sheet is not None:
+            self._sheets.move_to_end(path)
+            return sheet
+        from PIL import Image
+        index_path = path.with_suffix(".json")
+        if path.is_file() and index_path.is_file():
+            with open(index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with Image.open(path) as img:
+                sheet = _Sheet(path, meta, img.convert("RGB"))
+        elif create and first_frame is not None:
+            slots = config.timelapse_sheet_seconds // config.timelapse_tile_seconds
+            columns = min(config.timelapse_columns, slots)
+            width = config.timelapse_tile_width
+            height = max(1, round(width * first_frame.height / max(first_frame.width, 1)))
+            meta = {
+                "region_name": region_name,
+                "sheet_id": path.stem,
+                "start": start.isoformat(),
+                "end": (start + timedelta(seconds=config.timelapse_sheet_seconds)).isoformat(),
+                "tile_seconds": config.timelapse_tile_seconds,
+                "columns": columns,
+                "rows": -(-slots // columns),
+                "tile_width": width,
+                "tile_height": height,
+                "tiles": {}
+            }
+            sheet = _Sheet(path, meta, Image.new("RGB", (columns * width, meta["rows"] * height), BACKGROUND))
+            sheet.dirty = True
+            self.stats["sheets_created"] += 1
+        else:
+            return None
+        self._sheets[path] = sheet
+        while len(self._sheets) > OPEN_SHEETS:
+            _, evicted = self._sheets.popitem(last=False)
+            if evicted.dirty:
+                evicted.flush(config.png_compress_level)
+        return sheet
+
+    def _slot_taken(self, region_name: str, captured_at: datetime) -> bool:
+        """截图所在的格子是否已有截图（需持有锁；拼图尚不存在时为False）"""
+        sheet = self._get_sheet(region_name, captured_at)
+        if sheet is None:
+            return False
+        slot = sheet.slot(captured_at)
+        return slot is None or str(slot) in sheet.meta["tiles"]
+
+    def add_frame(self, region_name: str, captured_at: datetime, file_path: str) -> bool:
+        """把一张截图放入所在拼图的格子（格子已有截图时跳过，不读取文件），返回是否放入"""
+        if not _safe_part(region_name):
+            return False
+        with self._lock:
+            if self._slot_taken(region_name, captured_at):
+                self.stats["skipped"] += 1
+                return False
+        # 在锁外读取截图（每格只读取一次）
+        img = self._load(file_path)
+        with self._lock:
+            sheet = self._get_sheet(region_name, captured_at, img, create=True)
+            slot = sheet.slot(captured_at)
+            if slot is None or str(slot) in sheet.meta["tiles"]:
+                self.stats["skipped"] += 1
+                return False
+            sheet.paste(slot, img, captured_at, file_path)
+            self.stats["tiles"] += 1
+            return True
+
+    def _load(self, file_path: str) -> 'Image.Image':
+        from backend.services.delta_store import is_frame_ref, read_frame_ref
+        if is_frame_ref(file_path):
+            return read_frame_ref(file_path)
+        from PIL import Image
+        with Image.open(file_path) as img:
+            # JPEG 可以在解码时直接缩小
+            img.draft("RGB", (self.config_service.get_config().timelapse_tile_width, 1))
+            return img.convert("RGB")
+
+    def flush(self):
+        """把修改过的拼图写回文件"""
+        compress_level = self.config_service.get_config().png_compress_level
+        with self._lock:
+            for sheet in self._sheets.values():
+                if sheet.dirty:
+                    try:
+                        sheet.flush(compress_level)
+                    except OSError as e:
+                        self.stats["errors"] += 1
+                        print(f"[延时拼图] ✗ 写入拼图失败: {sheet.path}: {e}")
+            self._last_flush = time.monotonic()
+
+    def stop(self):
+        """处理完已提交的截图记录并写回全部拼图"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.add_frame(*item)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[延时拼图] ✗ 追加截图失败: {e}")
+        self.flush()
+
+    def backfill(self, source_dir: Optional[str] = None, region_name: Optional[str] = None,
+                 since: Optional[float] = None, until: Optional[float] = None, progress=None) -> dict:
+        """把目录中已有的截图补充到拼图中（按修改时间顺序；选区名和截取时间取自文件名；progress 抛出异常时中止）"""
+        from backend.services.export_service import find_screenshots
+        source_dir = source_dir or self.config_service.get_config().output_dir
+        files = [path for path in find_screenshots(source_dir, region_name, since, until)
+                 if path.suffix != ".lxd"]
+        added = 0
+        try:
+            for i, path in enumerate(files, start=1):
+                parsed = parse_capture_name(path)
+                if parsed is not None and self.add_frame(parsed[0], parsed[1], str(path)):
+                    added += 1
+                if progress is not None:
+                    progress(i, len(files))
+        finally:
+            self.flush()
+        return {"scanned": len(files), "tiles_added": added}
+
+    # ---------- 查询 ----------
+
+    def _sheet_path(self, region_name: str, sheet_id: str) -> Optional[Path]:
+        if not _safe_part(region_name) or not _safe_part(sheet_id):
+            return None
+        path = self._root() / region_name / f"{sheet_id}.png"
+        with self._lock:
+            sheet = self._sheets.get(path)
+            if sheet is not None and sheet.dirty:
+                sheet.flush(self.config_service.get_config().png_compress_level)
+        return path if path.is_file() else None
+
+    def list_sheets(self, region_name: Optional[str] = None) -> List[dict]:
+        """拼图列表（按选区名、开始时间排序，不含格子索引）"""
+        self.flush()
+        root = self._root()
+        if not root.is_dir():
+            return []
+        sheets = []
+        for directory in sorted(root.iterdir()):
+            if not directory.is_dir() or (region_name and directory.name != region_name):
+                continue
+            for index_path in sorted(directory.glob("*.json")):
+                try:
+                    with open(index_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                tiles = meta.pop("tiles", {})
+                meta["tile_count"] = len(tiles)
+                sheets.append(meta)
+        return sheets
+
+    def read_sheet(self, region_name: str, sheet_id: str) -> Optional[bytes]:
+        """拼图图片（PNG），不存在时返回None"""
+        path = self._sheet_path(region_name, sheet_id)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def get_index(self, region_name: str, sheet_id: str) -> Optional[dict]:
+        """拼图的布局和格子索引（格子序号 -> 截取时间、截图文件），不存在时返回None"""
+        path = self._sheet_path(region_name, sheet_id)
+        if path is None:
+            return None
+        with open(path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, queued=self._queue.qsize(), open_sheets=len(self._sheets),
+                        dirty_sheets=sum(1 for sheet in self._sheets.values() if sheet.dirty))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+API压力测试：多个并发客户端按前端的实际调用方式（frontend/src/services/api.js）请求API，
+统计各接口的吞吐量、p50/p95/p99延迟，以及事件循环被阻塞的时间
+
+默认在本进程中启动应用（uvicorn 运行在后台线程，使用合成画面和临时工作目录，不注册全局热键），
+指定 --url 时改为测试已在运行的服务（此时无法统计事件循环阻塞）
+
+场景（--clients 场景=客户端数，逗号分隔）:
+    dashboard  选区列表页：获取选区列表，再逐个加载选区预览（RegionList.jsx），间隔2秒刷新
+    capture    截图按钮：直接截取所有选区（POST /api/screenshot/all），间隔1秒
+    job        截图按钮（任务方式）：提交截图任务，每500ms轮询任务状态直到结束（ScreenshotControl.jsx）
+    coords     新建选区时的坐标采集：清除坐标，每300ms轮询已采集的坐标（RegionForm.jsx）
+    config     配置面板：获取配置和分组，间隔5秒
+
+用法:
+    python backend/test/loadtest.py --duration 20 --clients dashboard=4,capture=2,coords=3
+    python backend/test/loadtest.py --url http://127.0.0.1:8021 --clients capture=8 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 作为脚本运行时把项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+DEFAULT_CLIENTS = "dashboard=4,capture=2,job=1,coords=3,config=1"
+
+
+class Recorder:
+    """记录各接口的请求延迟（接口按路径模板归类，如 /api/regions/{id}/preview）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class Client:
+    """一个模拟的前端客户端（保持长连接，请求失败时重新连接）"""
+
+    def __init__(self, base_url: str, recorder: Recorder, stop_event: threading.Event):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, endpoint: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        start = time.perf_counter()
+        status, payload = 0, b""
+        # 空闲的长连接可能已被服务端关闭（uvicorn 默认5秒），此时与浏览器一样重新连接后重试一次
+        for reused in (self._conn is not None, False):
+            try:
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                self._conn.request(method, path, body=data, headers=headers)
+                response = self._conn.getresponse()
+                payload = response.read()
+                status = response.status
+                break
+            except (OSError, http.client.HTTPException):
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = None
+                if not reused:
+                    break
+        self.recorder.add(endpoint, time.perf_counter() - start, 200 <= status < 300)
+        return status, payload
+
+    def get_json(self, path: str, endpoint: str):
+        status, payload = self.request("GET", path, endpoint)
+        return json.loads(payload) if status == 200 else None
+
+    def sleep(self, seconds: float) -> bool:
+        """等待，收到停止信号时返回False"""
+        return not self.stop_event.wait(seconds)
+
+    # ---------- 场景 ----------
+
+    def dashboard(self):
+        while not self.stop_event.is_set():
+            regions = self.get_json("/api/regions", "GET /api/regions") or []
+            for region in regions:
+                if self.stop_event.is_set():
+                    return
+                self.request("GET", f"/api/regions/{region['id']}/preview", "GET /api/regions/{id}/preview")
+            if not self.sleep(2):
+                return
+
+    def capture(self):
+        while not self.stop_event.is_set():
+            self.request("POST", "/api/screenshot/all", "POST /api/screenshot/all")
+            if not self.sleep(1):
+                return
+
+    def job(self):
+        while not self.stop_event.is_set():
+            status, payload = self.request("POST", "/api/jobs", "POST /api/jobs", {"kind": "capture"})
+            if status == 202:
+                job_id = json.loads(payload)["id"]
+                while self.sleep(0.5):
+                    job = self.get_json(f"/api/jobs/{job_id}", "GET /api/jobs/{id}")
+                    if job is None or job["status"] in ("succeeded", "failed", "cancelled"):
+                        break
+            if not self.sleep(1):
+                return
+
+    def coords(self):
+        while not self.stop_event.is_set():
+            self.request("POST", "/api/mouse/clear-coords", "POST /api/mouse/clear-coords")
+            # 每轮采集持续约10秒
+            for _ in range(33):
+                if not self.sleep(0.3):
+                    return
+                self.request("GET", "/api/mouse/captured-coords", "GET /api/mouse/captured-coords")
+
+    def config(self):
+        while not self.stop_event.is_set():
+            self.request("GET", "/api/config", "GET /api/config")
+            self.request("GET", "/api/groups", "GET /api/groups")
+            if not self.sleep(5):
+                return
+
+
+SCENARIOS = ("dashboard", "capture", "job", "coords", "config")
+
+
+class LoopMonitor:
+    """事件循环阻塞监测：每 interval 秒唤醒一次，实际唤醒时间超出预期的部分即为循环被阻塞的时间"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._running = True
+
+    async def run(self):
+        while self._running:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append((time.perf_counter() - start - self.interval) * 1000)
+
+    def stop(self):
+        self._running = False
+
+    def summary(self) -> dict:
+        lags = sorted(self.lags) or [0.0]
+        return {
+            "samples": len(self.lags),
+            "p50_ms": round(percentile(lags, 50), 2),
+            "p99_ms": round(percentile(lags, 99), 2),
+            "max_ms": round(lags[-1], 2),
+            # 超过50ms的唤醒延迟视为阻塞
+            "blocked_ms": round(sum(lag for lag in lags if lag > 50), 1),
+            "blocked_count": sum(1 for lag in lags if lag > 50)
+        }
+
+
+def percentile(values: List[float], p: float) -> float:
+    """已排序列表的百分位数（线性插值）"""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def start_in_process(region_count: int) -> Tuple[str, LoopMonitor, Callable[[], None]]:
+    """在临时工作目录中启动应用（合成画面、不打开浏览器、不注册热键），返回 (地址, 循环监测, 停止函数)"""
+    workdir = tempfile.mkdtemp(prefix="lx_loadtest_")
+    os.chdir(workdir)
+    regions = [{"id": f"load-{i}", "name": f"load{i}", "x1": 100 * i, "y1": 50, "x2": 100 * i + 320, "y2": 290}
+               for i in range(region_count)]
+    with open("regions.json", "w", encoding="utf-8") as f:
+        json.dump(regions, f)
+
+    import socket
+    import uvicorn
+    from backend.services.config_service import ConfigService
+    ConfigService().update_config(capture_backend="synthetic", open_browser=False, screenshot_interval=0,
+                                  output_dir=os.path.join(workdir, "screenshots"))
+    from backend.services.capture_engine import CaptureEngine
+    CaptureEngine().setup_hotkeys = lambda: True  # 压测时不注册全局热键
+    from backend.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    monitor = LoopMonitor()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.create_task(monitor.run())
+        loop.run_until_complete(server.serve())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    print(f"[压测] 应用已在本进程中启动: http://127.0.0.1:{port}（工作目录 {workdir}）", file=sys.stderr)
+
+    def stop():
+        monitor.stop()
+        server.should_exit = True
+        thread.join(10)
+
+    return f"http://127.0.0.1:{port}", monitor, stop
+
+
+def parse_clients(text: str) -> Dict[str, int]:
+    clients = {}
+    for item in text.split(","):
+        name, _, count = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"未知的场景: {name}（可选 {' / '.join(SCENARIOS)}）")
+        clients[name] = int(count or 1)
+    return clients
+
+
+def build_report(recorder: Recorder, seconds: float, loop: Optional[dict]) -> dict:
+    endpoints = {}
+    total = 0
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        total += len(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(endpoint, 0),
+            "rps": round(len(values) / seconds, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2),
+            "mean_ms": round(statistics.fmean(values), 2)
+        }
+    return {"duration_s": round(seconds, 2), "requests": total, "rps": round(total / seconds, 2),
+            "endpoints": endpoints, "event_loop": loop}
+
+
+def print_report(report: dict):
+    print(f"\n持续 {report['duration_s']}s，共 {report['requests']} 个请求，{report['rps']} 请求/秒\n")
+    header = f"{'接口':<36}{'请求':>7}{'错误':>6}{'请求/秒':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * 96)
+    for endpoint, s in report["endpoints"].items():
+        print(f"{endpoint:<38}{s['requests']:>7}{s['errors']:>6}{s['rps']:>11}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}")
+    loop = report["event_loop"]
+    if loop:
+        print(f"\n事件循环: 唤醒延迟 p50 {loop['p50_ms']}ms / p99 {loop['p99_ms']}ms / 最大 {loop['max_ms']}ms，"
+              f"阻塞（>50ms） {loop['blocked_count']} 次共 {loop['blocked_ms']}ms")
+    else:
+        print("\n事件循环: 测试外部服务时不统计")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LX Multi Capture API 压力测试")
+    parser.add_argument("--url", help="已在运行的服务地址（默认在本进程中启动应用）")
+    parser.add_argument("--clients", default=DEFAULT_CLIENTS, help=f"场景=客户端数（默认 {DEFAULT_CLIENTS}）")
+    parser.add_argument("--duration", type=float, default=20, help="持续时间（秒）")
+    parser.add_argument("--regions", type=int, default=6, help="本进程启动时创建的选区数")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+
+    try:
+        clients = parse_clients(args.clients)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # 应用的日志输出到标准错误，标准输出只有测试结果
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args, clients)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+def run(args, clients: Dict[str, int]) -> dict:
+    monitor, stop = None, None
+    base_url = args.url
+    if base_url is None:
+        base_url, monitor, stop = start_in_process(args.regions)
+
+    recorder = Recorder()
+    stop_event = threading.Event()
+    threads = []
+    for scenario, count in clients.items():
+        for i in range(count):
+            client = Client(base_url, recorder, stop_event)
+            threads.append(threading.Thread(target=getattr(client, scenario), daemon=True, name=f"{scenario}-{i}"))
+    print(f"[压测] {len(threads)} 个客户端 {clients}，持续 {args.duration}s", file=sys.stderr)
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        stop_event.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop_event.set()
+    for thread in threads:
+        thread.join(60)
+    seconds = time.perf_counter() - start
+    if stop is not None:
+        stop()
+
+    return build_report(recorder, seconds, monitor.summary() if monitor else None)
+
+
+if __name__ == "__main__":
+    main()
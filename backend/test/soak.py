@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+长时间运行测试：在本进程中运行截图引擎（合成画面、临时工作目录、不注册热键），高频截图数小时，
+定期记录资源使用情况，预热结束后检查常驻内存、句柄、线程和截图后端实例是否保持平稳
+
+负载:
+    - 引擎自身的定时截图（screenshot_interval=1，配置允许的最小间隔）
+    - 按 --rate 调用与定时截图相同的截图保存路径（截取所有选区）
+    - 按 --preview-rate 在新建的短生命周期线程中预览选区（检查每线程的截图后端实例是否随线程释放）
+输出目录中的截图每次采样时清理，避免占满磁盘；感知哈希索引与正常使用一样默认开启（--no-hash-index 关闭）
+
+判定（预热结束时的采样为基准）:
+    - 常驻内存的线性增长率不超过 --max-rss-growth（MB/小时），且最终增长不超过 --max-rss-delta（MB）
+      （预热后的采样跨度短于 --min-slope-span 时增长率受噪声影响大，只检查增长率乘跨度不超过 --max-rss-delta）
+    - 打开的句柄、线程数、存活的截图后端实例数不超过基准 + 容差
+不满足时退出码为1（开启 --tracemalloc 时同时输出与预热结束时相比增长最多的代码位置）
+
+用法:
+    python backend/test/soak.py --hours 4 --rate 20
+    python backend/test/soak.py --minutes 5 --rate 50 --sample 10 --tracemalloc
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+# 作为脚本运行时把项目根目录加入模块搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def emit(event: str, **fields):
+    """输出一行JSON"""
+    sys.__stdout__.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+    sys.__stdout__.flush()
+
+
+def slope_per_hour(times: List[float], values: List[float]) -> float:
+    """最小二乘线性增长率（每小时）"""
+    if len(times) < 2:
+        return 0.0
+    mean_t, mean_v = sum(times) / len(times), sum(values) / len(values)
+    var = sum((t - mean_t) ** 2 for t in times)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / var * 3600
+
+
+class Load:
+    """按固定频率调用一个函数的后台线程"""
+
+    def __init__(self, name: str, rate: float, fn, stop_event: threading.Event):
+        self.name, self.rate, self.fn, self.stop_event = name, rate, fn, stop_event
+        self.calls = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"soak-{name}")
+
+    def _run(self):
+        interval = 1 / self.rate
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.fn()
+            except Exception as e:
+                self.errors += 1
+                if self.errors <= 5:
+                    print(f"[长稳测试] ✗ {self.name} 出错: {e}", file=sys.stderr)
+            self.calls += 1
+            next_time = max(next_time + interval, time.monotonic())
+            self.stop_event.wait(max(next_time - time.monotonic(), 0))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LX Multi Capture 长时间运行资源测试")
+    parser.add_argument("--hours", type=float, default=0, help="运行时长（小时）")
+    parser.add_argument("--minutes", type=float, default=0, help="运行时长（分钟，与 --hours 相加，默认共60分钟）")
+    parser.add_argument("--rate", type=float, default=20, help="截取所有选区的频率（次/秒）")
+    parser.add_argument("--preview-rate", type=float, default=5, help="在新线程中预览选区的频率（次/秒）")
+    parser.add_argument("--regions", type=int, default=6, help="选区数")
+    parser.add_argument("--sample", type=float, default=30, help="采样间隔（秒）")
+    parser.add_argument("--warmup", type=float, default=0.1, help="预热时间占总时长的比例（至少一次采样间隔）")
+    parser.add_argument("--max-rss-growth", type=float, default=20, help="常驻内存增长率上限（MB/小时）")
+    parser.add_argument("--max-rss-delta", type=float, default=50, help="常驻内存最终增长上限（MB）")
+    parser.add_argument("--min-slope-span", type=float, default=1800,
+                        help="按增长率判定所需的最短采样跨度（秒），更短时改为检查增长率乘跨度")
+    parser.add_argument("--handle-tolerance", type=int, default=8, help="句柄数容差")
+    parser.add_argument("--thread-tolerance", type=int, default=4, help="线程数容差")
+    parser.add_argument("--no-hash-index", action="store_true", help="关闭感知哈希索引")
+    parser.add_argument("--tracemalloc", action="store_true", help="开启 tracemalloc，失败时输出增长最多的代码位置")
+    args = parser.parse_args()
+
+    duration = args.hours * 3600 + args.minutes * 60 or 3600
+    warmup = max(duration * args.warmup, args.sample)
+
+    workdir = tempfile.mkdtemp(prefix="lx_soak_")
+    os.chdir(workdir)
+    regions = [{"id": f"soak-{i}", "name": f"soak{i}", "x1": 150 * i, "y1": 100, "x2": 150 * i + 320, "y2": 340}
+               for i in range(args.regions)]
+    with open("regions.json", "w", encoding="utf-8") as f:
+        json.dump(regions, f)
+
+    # 服务中的日志输出到标准错误，标准输出只有采样记录
+    sys.stdout = sys.stderr
+    from backend.services.capture_engine import CaptureEngine
+    from backend.services.config_service import ConfigService
+    from backend.services.resource_service import ResourceService
+    output_dir = os.path.join(workdir, "screenshots")
+    ConfigService().update_config(capture_backend="synthetic", open_browser=False, screenshot_interval=1,
+                                  output_dir=output_dir, hash_index_enabled=not args.no_hash_index)
+    engine = CaptureEngine()
+    engine.start(hotkeys=False)
+    resources = ResourceService()
+    if args.tracemalloc:
+        resources.start_tracing()
+
+    stop_event = threading.Event()
+
+    def preview_in_new_thread():
+        # 每次在新线程中截图：线程结束后其截图后端实例应随之释放
+        region_id = regions[loads[1].calls % len(regions)]["id"]
+        thread = threading.Thread(target=engine.preview_region, args=(region_id,))
+        thread.start()
+        thread.join()
+
+    loads = [Load("capture_all", args.rate, engine.capture_all, stop_event),
+             Load("preview", args.preview_rate, preview_in_new_thread, stop_event)]
+    for load in loads:
+        load.thread.start()
+    emit("start", workdir=workdir, duration_s=duration, warmup_s=warmup, rate=args.rate,
+         preview_rate=args.preview_rate, regions=args.regions)
+
+    start = time.monotonic()
+    samples, baseline, snapshot_id = [], None, None
+    try:
+        while not stop_event.wait(args.sample):
+            elapsed = time.monotonic() - start
+            for path in glob.glob(os.path.join(output_dir, "*.png")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            usage = resources.get_usage()
+            sample = {"t": round(elapsed, 1), "rss_mb": usage["rss_mb"], "open_handles": usage["open_handles"],
+                      "threads": usage["threads"], "mss_live": usage["mss"]["live"] if usage["mss"] else None,
+                      "calls": {load.name: load.calls for load in loads},
+                      "errors": {load.name: load.errors for load in loads}}
+            emit("sample", **sample)
+            if baseline is None and elapsed >= warmup:
+                baseline = sample
+                if args.tracemalloc:
+                    snapshot_id = resources.take_snapshot(0)["id"]
+            if baseline is not None:
+                samples.append(sample)
+            if elapsed >= duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    stop_event.set()
+    for load in loads:
+        load.thread.join(10)
+
+    if baseline is None or len(samples) < 2:
+        emit("result", passed=False, reason="运行时间不足，预热结束后的采样少于2次")
+        engine.stop()
+        return 1
+
+    last = samples[-1]
+    growth = slope_per_hour([s["t"] for s in samples], [s["rss_mb"] for s in samples])
+    span = last["t"] - baseline["t"]
+    if span >= args.min_slope_span:
+        growth_ok = growth <= args.max_rss_growth
+    else:
+        # 跨度太短时几MB的抖动就会得到很大的增长率，改为检查按该增长率在跨度内的增长量
+        growth_ok = growth * span / 3600 <= args.max_rss_delta
+    checks = {
+        "rss_growth_mb_per_hour": (round(growth, 2), growth_ok),
+        "rss_delta_mb": (round(last["rss_mb"] - baseline["rss_mb"], 2),
+                         last["rss_mb"] - baseline["rss_mb"] <= args.max_rss_delta),
+        "max_open_handles": (max(s["open_handles"] or 0 for s in samples),
+                             max(s["open_handles"] or 0 for s in samples)
+                             <= (baseline["open_handles"] or 0) + args.handle_tolerance),
+        "max_threads": (max(s["threads"] for s in samples),
+                        max(s["threads"] for s in samples) <= baseline["threads"] + args.thread_tolerance),
+        "max_mss_live": (max(s["mss_live"] or 0 for s in samples),
+                         max(s["mss_live"] or 0 for s in samples) <= (baseline["mss_live"] or 0) + args.thread_tolerance)
+    }
+    passed = all(ok for _, ok in checks.values())
+    result = {"passed": passed, "baseline": baseline, "last": last, "slope_span_s": round(span, 1),
+              "checks": {name: {"value": value, "ok": ok} for name, (value, ok) in checks.items()}}
+    if not passed and snapshot_id is not None:
+        result["top_growth"] = resources.diff_snapshot(snapshot_id, 15)["top"]
+    emit("result", **result)
+    engine.stop()
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+热键解析：keyboard / win32 / pynput 三种实现共用的热键字符串解析和组合键匹配
+"""
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Hashable, NamedTuple, Optional, Tuple
+
+# 修饰键别名 -> 规范名称
+MODIFIER_ALIASES = {
+    'ctrl': 'ctrl',
+    'control': 'ctrl',
+    'alt': 'alt',
+    'shift': 'shift',
+    'win': 'win',
+    'cmd': 'win',
+    'super': 'win',
+}
+
+# 规范化后修饰键的输出顺序
+MODIFIER_ORDER = ('ctrl', 'alt', 'shift', 'win')
+
+# 主键别名 -> 规范名称（与pynput的Key名称保持一致）
+KEY_ALIASES = {
+    'escape': 'esc',
+    'return': 'enter',
+    'del': 'delete',
+    'spacebar': 'space',
+}
+
+
+class Chord(NamedTuple):
+    """解析后的组合键：修饰键集合 + 主键"""
+    modifiers: FrozenSet[str]
+    key: Optional[str]
+
+    @property
+    def normalized(self) -> str:
+        """规范化的热键字符串，如 'ctrl+alt+s'"""
+        parts = [m for m in MODIFIER_ORDER if m in self.modifiers]
+        if self.key:
+            parts.append(self.key)
+        return '+'.join(parts)
+
+
+@lru_cache(maxsize=256)
+def parse_hotkey(hotkey_str: str) -> Chord:
+    """
+    解析热键字符串（结果缓存，注册时解析一次即可）
+    例如 'Ctrl+Alt+S' -> Chord(modifiers={'ctrl', 'alt'}, key='s')
+    多个主键时以最后一个为准；缺少主键时key为None，由调用方判断是否可用
+    """
+    modifiers = set()
+    key = None
+    for part in hotkey_str.lower().split('+'):
+        part = part.strip()
+        if not part:
+            continue
+        if part in MODIFIER_ALIASES:
+            modifiers.add(MODIFIER_ALIASES[part])
+        else:
+            key = KEY_ALIASES.get(part, part)
+    return Chord(frozenset(modifiers), key)
+
+
+class ChordMatcher:
+    """
+    组合键匹配器：按按键的原始标识（虚拟键码等）记录当前按下的键及按下时的键名，
+    主键按下时用 (修饰键集合, 主键) 做一次字典查找得到回调，与注册的热键数量无关
+    按原始标识记录是因为同一个键在按下和释放时解析出的键名可能不同（如先松开Ctrl时字符从控制字符变回字母）
+    """
+
+    def __init__(self):
+        self._chords: Dict[Tuple[FrozenSet[str], str], Callable] = {}
+        self._down: Dict[Hashable, str] = {}  # 原始标识 -> 按下时的键名
+
+    def register(self, chord: Chord, callback: Callable):
+        """注册组合键（同一组合键重复注册时覆盖）"""
+        self._chords[(chord.modifiers, chord.key)] = callback
+
+    def unregister(self, chord: Chord):
+        """注销组合键"""
+        self._chords.pop((chord.modifiers, chord.key), None)
+
+    def press(self, code: Hashable, name: Optional[str]) -> Optional[Callable]:
+        """处理按键按下（code 为原始标识，name 为解析出的键名），命中时返回对应回调（长按的自动重复不会重复命中）"""
+        if name is None or code in self._down:
+            return None
+        self._down[code] = name
+        if name in MODIFIER_ORDER:
+            return None
+        modifiers = frozenset(n for n in self._down.values() if n in MODIFIER_ORDER)
+        return self._chords.get((modifiers, name))
+
+    def release(self, code: Hashable):
+        """处理按键释放"""
+        self._down.pop(code, None)
+
+    def reset(self):
+        """清空按键状态（监听器重启时调用）"""
+        self._down.clear()
+
+    def __len__(self) -> int:
+        return len(self._chords)
@@ -1,35 +1,43 @@
 """
 平台工具：跨平台的鼠标位置和热键支持
+第三方库（pyautogui / win32api）在首次使用时才导入，并缓存检测结果，
+避免拖慢后端启动
 """
 import platform
 import sys
+from functools import lru_cache
 
 # 平台检测
 IS_WINDOWS = platform.system() == 'Windows'
 IS_LINUX = platform.system() == 'Linux'
 IS_MAC = platform.system() == 'Darwin'
 
-# 尝试导入库（优先pyautogui，因为它最可靠）
-WIN32_AVAILABLE = False
-PYAUTOGUI_AVAILABLE = False
 
-# 优先尝试pyautogui（跨平台，最可靠）
-try:
-    import pyautogui
-    PYAUTOGUI_AVAILABLE = True
-    print("[平台工具] ✓ pyautogui 可用")
-except ImportError:
-    print("[平台工具] ✗ pyautogui 不可用，请安装: pip install pyautogui")
+@lru_cache(maxsize=None)
+def is_pyautogui_available() -> bool:
+    """检测pyautogui是否可用（跨平台，最可靠；首次调用时导入并缓存结果）"""
+    try:
+        import pyautogui  # noqa: F401
+        print("[平台工具] ✓ pyautogui 可用")
+        return True
+    except Exception as e:
+        print(f"[平台工具] ✗ pyautogui 不可用，请安装: pip install pyautogui ({e})")
+        return False
 
-# Windows专用：win32api
-if IS_WINDOWS:
+
+@lru_cache(maxsize=None)
+def is_win32_available() -> bool:
+    """检测win32api是否可用（仅Windows；首次调用时导入并缓存结果）"""
+    if not IS_WINDOWS:
+        return False
     try:
-        import win32api
-        import win32con
-        WIN32_AVAILABLE = True
+        import win32api  # noqa: F401
+        import win32con  # noqa: F401
         print("[平台工具] ✓ Windows: win32api 可用")
+        return True
     except ImportError:
         print("[平台工具] ✗ Windows: win32api 不可用，请安装: pip install pywin32")
+        return False
 
 
 def get_mouse_position():
@@ -39,7 +47,7 @@ def get_mouse_position():
     返回: (x, y) 元组
     """
     # 优先使用pyautogui（最可靠）
-    if PYAUTOGUI_AVAILABLE:
+    if is_pyautogui_available():
         try:
             import pyautogui
             pos = pyautogui.position()
@@ -52,7 +60,7 @@ def get_mouse_position():
             traceback.print_exc()
     
     # Windows备选：win32api
-    if IS_WINDOWS and WIN32_AVAILABLE:
+    if IS_WINDOWS and is_win32_available():
         try:
             import win32api
             pos = win32api.GetCursorPos()
@@ -83,10 +91,9 @@ def get_platform_info():
     """获取平台信息"""
     return {
         "platform": platform.system(),
-        "win32_available": WIN32_AVAILABLE,
-        "pyautogui_available": PYAUTOGUI_AVAILABLE,
+        "win32_available": is_win32_available(),
+        "pyautogui_available": is_pyautogui_available(),
         "is_windows": IS_WINDOWS,
         "is_linux": IS_LINUX,
         "is_mac": IS_MAC
     }
-
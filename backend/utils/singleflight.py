@@ -0,0 +1,76 @@
+"""
+单飞（single-flight）合并：相同key的并发调用只执行一次，其余调用等待并共享结果；
+执行完成后 window 秒内的相同调用直接复用结果
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """一次正在执行的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+
+
+class SingleFlight:
+    """单飞合并器（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (完成时间, 结果)
+        self.stats = {"calls": 0, "executions": 0, "joined": 0, "reused": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], window: float = 0) -> Any:
+        """执行fn（或共享进行中/刚完成的相同调用的结果），fn抛出的异常同样共享给等待者"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["calls"] += 1
+            recent = self._recent.get(key)
+            if recent is not None:
+                if now - recent[0] <= window:
+                    self.stats["reused"] += 1
+                    return recent[1]
+                del self._recent[key]
+
+            call = self._inflight.get(key)
+            if call is not None:
+                self.stats["joined"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._inflight[key] = call
+                self.stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and window > 0:
+                    done = time.monotonic()
+                    self._recent[key] = (done, call.result)
+                    # 顺带清理过期结果，避免长期占用内存
+                    for k in [k for k, (t, _) in self._recent.items() if done - t > window]:
+                        del self._recent[k]
+            call.event.set()
+        return call.result
+
+    def get_stats(self) -> dict:
+        """获取统计"""
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight), cached=len(self._recent))
@@ -1,13 +1,37 @@
-import React from 'react'
-import { screenshotAPI } from '../services/api'
+import React, { useState } from 'react'
+import { screenshotAPI, jobAPI } from '../services/api'
 import { useToast } from '../contexts/ToastContext'
 
 const ScreenshotControl = ({ regions, onScreenshot }) => {
   const toast = useToast()
+  const [job, setJob] = useState(null)
+
+  // 轮询任务直到结束
+  const waitJob = async (jobId) => {
+    while (true) {
+      const response = await jobAPI.get(jobId)
+      setJob(response.data)
+      if (['succeeded', 'failed', 'cancelled'].includes(response.data.status)) {
+        return response.data
+      }
+      await new Promise(resolve => setTimeout(resolve, 500))
+    }
+  }
+
   const handleCaptureAll = async () => {
     try {
-      const response = await screenshotAPI.captureAll()
-      const results = response.data
+      const submitted = await jobAPI.submit({ kind: 'capture' })
+      setJob(submitted.data)
+      const finished = await waitJob(submitted.data.id)
+      if (finished.status === 'cancelled') {
+        toast.warning('截图任务已取消')
+        return
+      }
+      if (finished.status === 'failed') {
+        toast.error(`截图失败: ${finished.error}`)
+        return
+      }
+      const results = finished.result
       const successCount = results.filter(r => r.success).length
       if (successCount === results.length) {
         toast.success(`截图完成！成功: ${successCount}/${results.length}`)
@@ -19,6 +43,17 @@ const ScreenshotControl = ({ regions, onScreenshot }) => {
       }
     } catch (error) {
       toast.error(`截图失败: ${error.response?.data?.detail || error.message}`)
+    } finally {
+      setJob(null)
+    }
+  }
+
+  const handleCancelJob = async () => {
+    if (!job) return
+    try {
+      await jobAPI.cancel(job.id)
+    } catch (error) {
+      toast.error(`取消失败: ${error.response?.data?.detail || error.message}`)
     }
   }
 
@@ -48,10 +83,19 @@ const ScreenshotControl = ({ regions, onScreenshot }) => {
       <div className="space-y-2">
         <button
           onClick={handleCaptureAll}
-          className="w-full px-4 py-2 bg-green-500 text-white rounded hover:bg-green-600"
+          disabled={!!job}
+          className="w-full px-4 py-2 bg-green-500 text-white rounded hover:bg-green-600 disabled:opacity-50"
         >
-          截取所有选区
+          {job ? `截图中 ${job.done}/${job.total || regions.length}` : '截取所有选区'}
         </button>
+        {job && (
+          <button
+            onClick={handleCancelJob}
+            className="w-full px-4 py-2 bg-gray-200 text-gray-700 rounded hover:bg-gray-300"
+          >
+            取消
+          </button>
+        )}
         <div className="text-sm text-gray-600 mt-2">
           <p>或使用热键 <kbd className="px-2 py-1 bg-gray-200 rounded">Ctrl+Alt+S</kbd> 手动截图</p>
         </div>
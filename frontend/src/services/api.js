@@ -29,6 +29,24 @@ export const screenshotAPI = {
   captureAll: () => api.post('/screenshot/all')
 }
 
+// 分组API
+export const groupAPI = {
+  getAll: () => api.get('/groups'),
+  getById: (id) => api.get(`/groups/${id}`),
+  create: (data) => api.post('/groups', data),
+  update: (id, data) => api.put(`/groups/${id}`, data),
+  delete: (id) => api.delete(`/groups/${id}`),
+  capture: (id) => api.post(`/groups/${id}/capture`)
+}
+
+// 任务API
+export const jobAPI = {
+  submit: (data) => api.post('/jobs', data),
+  get: (id) => api.get(`/jobs/${id}`),
+  list: (params) => api.get('/jobs', { params }),
+  cancel: (id) => api.post(`/jobs/${id}/cancel`)
+}
+
 // 鼠标API
 export const mouseAPI = {
   getPosition: () => api.get('/mouse/position'),